@@ -1,8 +1,8 @@
 """
     Yaesu Gate Main Program
 """
-from IGaten import Ygate
+from IGaten import Ygate, parse_options
 
 if __name__ == "__main__":
-    YGATE = Ygate()
+    YGATE = Ygate(options=parse_options())
     YGATE.start()
@@ -0,0 +1,118 @@
+"""
+    APRS-IS inbound stream processing
+    Reads the server stream in bulk and splits it into lines
+"""
+import re
+import time
+import datetime
+from collections import deque
+
+# Keep alive comment from aprsc/javAPRSSrvr, e.g.
+# "# aprsc 2.1.10 19 Oct 2026 10:22:31 GMT T2TEST 1.2.3.4:14580"
+SERVER_TIME = re.compile(rb"(\d{1,2} [A-Z][a-z]{2} \d{4} \d\d:\d\d:\d\d) GMT")
+
+
+def server_lag(line: bytes, now: float = None) -> float:
+    """
+    Calculates how far behind real time a server keep alive line is
+    :param line: comment line from APRS-IS starting with '#'
+    :param now: current time stamp (default time.time())
+    :return: lag in seconds, None if line has no time stamp
+    """
+    m_t = SERVER_TIME.search(line)
+    if not m_t:
+        return None
+    try:
+        s_time = datetime.datetime.strptime(
+            m_t.group(1).decode("ascii"), "%d %b %Y %H:%M:%S"
+        ).replace(tzinfo=datetime.timezone.utc)
+    except ValueError:
+        return None
+    now = time.time() if now is None else now
+    return round(now - s_time.timestamp(), 3)
+
+
+class LineStream:
+    """
+    Splits the byte stream of a socket into lines.
+    Each fill() drains whatever the socket has buffered (up to CHUNK bytes)
+    with a single recv call instead of reading line by line.
+    """
+
+    CHUNK = 65536
+
+    def __init__(self, sck):
+        """
+        :param sck: connected socket
+        """
+        self.sck = sck
+        self.rest = b""  # incomplete last line
+        self.lines = deque()  # complete lines, without line end
+
+    def fill(self) -> int:
+        """
+        Receives one chunk from the socket and splits it into lines
+        :return: number of bytes received, 0 if connection closed
+        """
+        data = self.sck.recv(self.CHUNK)
+        if not data:
+            return 0
+        parts = (self.rest + data).split(b"\n")
+        self.rest = parts.pop()
+        self.lines.extend(part.rstrip(b"\r") for part in parts)
+        return len(data)
+
+    def readline(self) -> bytes:
+        """
+        Returns the next complete line, blocks until available
+        :return: line without line end, b"" if connection closed
+        """
+        while not self.lines:
+            if self.fill() == 0:
+                return b""
+        return self.lines.popleft()
+
+    def pop_lines(self) -> list:
+        """
+        Returns all complete lines received so far
+        :return: list of byte strings
+        """
+        lines = list(self.lines)
+        self.lines.clear()
+        return lines
+
+
+class IsStats:
+    """
+    Counters and lag metrics for frames received from APRS-IS
+    """
+
+    def __init__(self):
+        self.lines = 0  # frames received
+        self.bytes = 0  # bytes received
+        self.invalid = 0  # frames with non ascii bytes
+        self.types = {}  # count per APRS data type
+        self.server_lag = 0.0  # s behind server keep alive time stamp
+        self.proc_lag = 0.0  # s between recv and display, last chunk
+        self.max_lag = 0.0  # s max. proc_lag
+        self.max_chunk = 0  # max. number of lines in one chunk
+
+    def count(self, d_type: str):
+        """
+        Counts one frame of data type d_type
+        :param d_type: APRS data type
+        """
+        self.lines += 1
+        self.types[d_type] = self.types.get(d_type, 0) + 1
+
+    def summary(self) -> str:
+        """
+        :return: one line summary of counters and lag
+        """
+        types = " ".join(f"{k.strip()}:{v}" for k, v in sorted(self.types.items()))
+        return (
+            f"{self.lines} IS frames, {self.bytes} bytes, "
+            f"{self.invalid} invalid, server lag {self.server_lag} s, "
+            f"processing lag {round(self.proc_lag, 3)} s "
+            f"(max {round(self.max_lag, 3)} s), {types}"
+        )
@@ -0,0 +1,256 @@
+"""
+    Binary capture of raw serial frames
+
+    File layout (all integers big endian):
+    header  b"YGCAP1\\n\\x00"
+    record  b"R" ts:double len:uint16 frame bytes
+    index   b"I" prev:uint64 count:uint32 t_first:double t_last:double
+            count * (offset:uint64 ts:double call:uint32)
+            b"YIDX" own offset:uint64
+    An index block is appended every INDEX_EVERY records and on close.
+    Index blocks are chained backwards, so a reader finds all of them
+    from the end of the file without touching the records.
+"""
+import sys
+import os
+import mmap
+import time
+import zlib
+import struct
+
+MAGIC = b"YGCAP1\n\x00"
+REC = struct.Struct(">cdH")
+IDX = struct.Struct(">cQIdd")
+ENTRY = struct.Struct(">QdI")
+TRAILER = struct.Struct(">4sQ")
+TRAILER_MAGIC = b"YIDX"
+
+
+def frame_call(frame: bytes) -> bytes:
+    """
+    Source call sign of a raw frame (text up to '>')
+    :param frame: raw frame bytes
+    :return: call sign or b""
+    """
+    end = frame.find(b">", 0, 16)
+    return frame[:end].strip() if end > 0 else b""
+
+
+def call_hash(call) -> int:
+    """
+    :param call: call sign as str or bytes
+    :return: 32 bit hash used in the index
+    """
+    if isinstance(call, str):
+        call = call.encode("ascii", "replace")
+    return zlib.crc32(call.upper())
+
+
+class CaptureWriter:
+    """
+    Appends time stamped raw frames to a capture file
+    """
+
+    INDEX_EVERY = 256  # records per index block
+
+    def __init__(self, path: str):
+        """
+        :param path: capture file, appended to if it exists
+        """
+        self.prev = 0  # offset of last index block
+        self.entries = []  # (offset, ts, call hash) since last index
+        self.records = 0
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # continue the index chain, re-index records of an unclean close
+            reader = CaptureReader(path)
+            self.prev, self.entries = reader.last_index, reader.tail
+            reader.close()
+            self.file = open(path, "r+b")
+            self.file.truncate(reader.end)  # drop a partly written record
+            self.file.seek(0, os.SEEK_END)
+        else:
+            self.file = open(path, "wb")
+            self.file.write(MAGIC)
+
+    def write(self, frame: bytes, t_s: float = None, call: str = None):
+        """
+        Appends one frame
+        :param frame: raw bytes as received
+        :param t_s: time stamp (default time.time())
+        :param call: source call for the index, default text up to ">"
+        """
+        t_s = time.time() if t_s is None else t_s
+        frame = frame[:0xFFFF]
+        offset = self.file.tell()
+        self.file.write(REC.pack(b"R", t_s, len(frame)))
+        self.file.write(frame)
+        self.entries.append(
+            (offset, t_s, call_hash(frame_call(frame) if call is None else call))
+        )
+        self.records += 1
+        if len(self.entries) >= self.INDEX_EVERY:
+            self.write_index()
+
+    def write_index(self):
+        """
+        Appends an index block for all records since the last one
+        """
+        if not self.entries:
+            return
+        offset = self.file.tell()
+        block = [IDX.pack(
+            b"I", self.prev, len(self.entries),
+            self.entries[0][1], self.entries[-1][1]
+        )]
+        block.extend(ENTRY.pack(*entry) for entry in self.entries)
+        block.append(TRAILER.pack(TRAILER_MAGIC, offset))
+        self.file.write(b"".join(block))
+        self.file.flush()
+        self.prev = offset
+        self.entries = []
+
+    def close(self):
+        """
+        Writes the final index block and closes the file
+        """
+        if self.file.closed:
+            return
+        self.write_index()
+        self.file.close()
+
+
+class CaptureReader:
+    """
+    Memory mapped random access to a capture file
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: capture file
+        """
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a capture file")
+        self.blocks = []  # (t_first, t_last, [entries]) in file order
+        self.last_index = 0  # offset of last index block
+        self.tail = []  # entries of records after the last index block
+        self.end = len(MAGIC)  # end of last complete record or index
+        self._load_index()
+
+    def _load_index(self):
+        """
+        Follows the index chain from the end of the file.
+        Records after the last index block (no clean close) are
+        indexed by hopping over their length prefixes.
+        """
+        end = len(self.map)
+        tail = len(MAGIC)
+        offset = 0
+        if end >= tail + TRAILER.size:
+            magic, offset = TRAILER.unpack_from(self.map, end - TRAILER.size)
+            if magic != TRAILER_MAGIC:
+                offset = self._last_trailer()
+        self.last_index = offset
+        while offset:
+            _, prev, count, t_first, t_last = IDX.unpack_from(self.map, offset)
+            entries = [
+                ENTRY.unpack_from(self.map, offset + IDX.size + i * ENTRY.size)
+                for i in range(count)
+            ]
+            self.blocks.insert(0, (t_first, t_last, entries))
+            if tail == len(MAGIC):
+                tail = offset + IDX.size + count * ENTRY.size + TRAILER.size
+            offset = prev
+        self.end = tail
+        self.tail = list(self._scan(tail))
+        if self.tail:
+            self.blocks.append((self.tail[0][1], self.tail[-1][1], self.tail))
+
+    def _last_trailer(self) -> int:
+        """
+        :return: offset of the last complete index block, found by a scan
+        """
+        last = 0
+        pos = len(MAGIC)
+        while pos < len(self.map):
+            tag = self.map[pos:pos + 1]
+            if tag == b"R" and pos + REC.size <= len(self.map):
+                pos += REC.size + REC.unpack_from(self.map, pos)[2]
+            elif tag == b"I" and pos + IDX.size <= len(self.map):
+                count = IDX.unpack_from(self.map, pos)[2]
+                nxt = pos + IDX.size + count * ENTRY.size + TRAILER.size
+                if nxt > len(self.map):
+                    break
+                last, pos = pos, nxt
+            else:
+                break
+        return last
+
+    def _scan(self, pos: int):
+        """
+        Yields index entries of records from pos to the end of file
+        """
+        while pos + REC.size <= len(self.map):
+            tag, t_s, length = REC.unpack_from(self.map, pos)
+            if tag != b"R" or pos + REC.size + length > len(self.map):
+                break
+            frame = self.map[pos + REC.size:pos + REC.size + length]
+            yield pos, t_s, call_hash(frame_call(frame))
+            pos += REC.size + length
+            self.end = pos
+
+    def __len__(self) -> int:
+        return sum(len(block[2]) for block in self.blocks)
+
+    def record(self, offset: int) -> tuple:
+        """
+        :param offset: file offset of a record
+        :return: time stamp, frame bytes
+        """
+        _, t_s, length = REC.unpack_from(self.map, offset)
+        return t_s, self.map[offset + REC.size:offset + REC.size + length]
+
+    def frames(self, start: float = None, end: float = None, call: str = None):
+        """
+        Yields (time stamp, frame) in file order, optionally filtered.
+        Index blocks outside the time range are skipped unread.
+        Binary (KISS) frames are matched by the index hash only.
+        :param start: earliest time stamp
+        :param end: latest time stamp
+        :param call: source call sign incl. SSID, e.g. "DU1KG-1"
+        """
+        c_hash = call_hash(call) if call else None
+        for t_first, t_last, entries in self.blocks:
+            if (start is not None and t_last < start) or \
+                    (end is not None and t_first > end):
+                continue
+            for offset, t_s, e_hash in entries:
+                if start is not None and t_s < start:
+                    continue
+                if end is not None and t_s > end:
+                    continue
+                if c_hash is not None and e_hash != c_hash:
+                    continue
+                t_s, frame = self.record(offset)
+                f_call = frame_call(frame)
+                if c_hash is not None and f_call and \
+                        f_call.upper() != call.upper().encode("ascii"):
+                    continue
+                yield t_s, frame
+
+    def close(self):
+        """
+        Unmaps and closes the file
+        """
+        self.map.close()
+        self.file.close()
+
+
+if __name__ == "__main__":
+    # python -m IGaten.capture file [call]  prints captured frames
+    READER = CaptureReader(sys.argv[1])
+    for TS, FRAME in READER.frames(call=sys.argv[2] if len(sys.argv) > 2 else None):
+        print(time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(TS)), FRAME)
+    READER.close()
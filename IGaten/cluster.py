@@ -0,0 +1,308 @@
+"""
+    Coordinated multi IGate mode
+    Nodes with overlapping coverage exchange packet digests over UDP
+    (multicast on the LAN or a list of unicast peers), so only one
+    node uplinks a frame within the dupe window.
+
+    Nodes are ranked by name among the live nodes. The first node gates
+    at once and announces a claim for the digest; a node of rank r holds
+    the frame for r * HOLD sec and drops it if a peer claimed it.
+    A node whose uplink fails leaves the ranking and does not claim
+    until a send succeeds again, so its peers gate the frames.
+    Every STATE sec each node sends its counters and recently heard
+    calls, which are merged into a cluster wide view.
+"""
+import json
+import time
+import socket
+import struct
+import hashlib
+import logging
+import threading
+from collections import deque
+
+MAGIC = b"YG"
+HEADER = struct.Struct(">2scB")  # magic, type, length of node name
+DIGEST = 8  # bytes
+
+
+def digest(pkt) -> bytes:
+    """
+    Digest as used for APRS-IS dupe checks: source, destination, payload
+    :param pkt: Packet
+    :return: 8 byte digest
+    """
+    src_dst = pkt.routing.split(",", 1)[0]
+    return hashlib.blake2b(
+        src_dst.encode("ascii", "replace") + b":" + pkt.raw.rstrip(b"\r\n"),
+        digest_size=DIGEST
+    ).digest()
+
+
+class Cluster:
+    """
+    One node of an IGate cluster
+    """
+
+    DUPE = 30.0  # s a claim is valid
+    HOLD = 0.3  # s hold per rank
+    STATE = 10.0  # s between state messages
+    MAX_HEARD = 5000  # calls kept per peer
+    HELD = "Cluster hold"  # start of the filter reason for held frames
+    DUPE_MSG = "Cluster dupe, not gated"
+
+    def __init__(
+            self,
+            node: str,
+            port: int = 14590,
+            peers: list = None,
+            group: str = "239.77.71.1",
+            clock=time.monotonic
+    ):
+        """
+        :param node: unique node name
+        :param port: UDP port to listen on
+        :param peers: list of (host, port) for unicast, None for multicast
+        :param group: multicast group if no peers are given
+        :param clock: time source in seconds
+        """
+        self.node = node
+        self.name = node.encode("utf-8")[:255]
+        self.clock = clock
+        self.sck = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sck.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if peers:
+            self.sck.bind(("", port))
+            self.dest = list(peers)
+        else:
+            if hasattr(socket, "SO_REUSEPORT"):  # several nodes on one host
+                self.sck.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+            self.sck.bind(("", port))
+            self.sck.setsockopt(
+                socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP,
+                socket.inet_aton(group) + socket.inet_aton("0.0.0.0")
+            )
+            self.sck.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 1)
+            self.sck.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            self.dest = [(group, port)]
+        self.sck.settimeout(0.05)
+        self.lock = threading.Lock()
+        self.claims = {}  # digest -> (time, node) of claims by any node
+        self.held = deque()  # (due time, digest, Packet)
+        self.peers = {}  # node -> {"last": time, counters, "heard": set}
+        self.heard = set()  # calls heard since last state message
+        self.counts = [0, 0, 0]  # own gated, not gated, invalid
+        self.uplink_ok = True  # False while sends to APRS-IS fail, see set_uplink()
+        self.release = None  # release(Packet) for held frames
+        self.discard = None  # discard(Packet) for held frames claimed by a peer
+        self.stat = {"claimed": 0, "dupes": 0, "held": 0, "released": 0}
+        self.running = False
+        self.last_state = 0.0
+
+    def start(self, release, discard=None):
+        """
+        Starts the receiver thread
+        :param release: called with the Packet of a released frame
+        :param discard: called with the Packet of a held frame claimed by a peer
+        """
+        self.release = release
+        self.discard = discard
+        self.running = True
+        threading.Thread(target=self.run, name="cluster", daemon=True).start()
+
+    def stop(self):
+        """
+        Stops the receiver thread
+        """
+        self.running = False
+
+    def send(self, m_type: bytes, body: bytes):
+        """
+        Sends a message to all peers
+        :param m_type: b"C" claim or b"S" state
+        :param body: message content
+        """
+        msg = HEADER.pack(MAGIC, m_type, len(self.name)) + self.name + body
+        for dest in self.dest:
+            try:
+                self.sck.sendto(msg, dest)
+            except OSError as err:
+                logging.debug("[CLU ] %s: %s", dest, err)
+
+    def live_nodes(self) -> list:
+        """
+        :return: sorted names of this node and peers seen recently
+        """
+        now = self.clock()
+        with self.lock:
+            nodes = [
+                n for n, p in self.peers.items()
+                if now - p["last"] < 3 * self.STATE and p.get("up", True)
+            ]
+        return sorted(nodes + [self.node] if self.uplink_ok else nodes)
+
+    def set_uplink(self, ok: bool):
+        """
+        Leaves or rejoins the ranking, peers learn it from the next state
+        message, which is sent at once on a change
+        :param ok: False if a send to APRS-IS failed, True if one succeeded
+        """
+        if ok != self.uplink_ok:
+            self.uplink_ok = ok
+            self.last_state = 0.0
+            logging.warning("[CLU ] Uplink %s, %s the ranking",
+                            "up" if ok else "down", "joining" if ok else "leaving")
+
+    def claimed(self, dgst: bytes) -> bool:
+        """
+        :param dgst: packet digest
+        :return: True if a node claimed dgst within DUPE sec
+        """
+        claim = self.claims.get(dgst)
+        return claim is not None and self.clock() - claim[0] < self.DUPE
+
+    def claim(self, dgst: bytes):
+        """
+        Records and announces own claim
+        :param dgst: packet digest
+        """
+        with self.lock:
+            self.claims[dgst] = (self.clock(), self.node)
+        self.stat["claimed"] += 1
+        self.send(b"C", dgst)
+
+    def filter(self, pkt) -> str:
+        """
+        Packet filter for Ygate.add_filter()
+        :param pkt: Packet
+        :return: "" to gate now, reason otherwise
+        """
+        dgst = digest(pkt)
+        if self.claimed(dgst):
+            self.stat["dupes"] += 1
+            return self.DUPE_MSG
+        if not self.uplink_ok:  # tries to gate without keeping peers from it
+            return ""
+        rank = self.live_nodes().index(self.node)
+        if rank == 0:
+            self.claim(dgst)
+            return ""
+        with self.lock:
+            self.held.append((self.clock() + rank * self.HOLD, dgst, pkt))
+        self.stat["held"] += 1
+        return f"{self.HELD} {rank * self.HOLD:.1f} s"
+
+    def sink(self, pkt):
+        """
+        Packet sink for Ygate.add_sink(), collects counters and heard calls;
+        held frames come when sent or discarded
+        :param pkt: Packet
+        """
+        with self.lock:  # called from the read loop, uplink and cluster threads
+            self.counts[2 if pkt.msg == "Invalid routing" else 0 if pkt.gated else 1] += 1
+        if pkt.msg == "Invalid routing":
+            return
+        if len(self.heard) < self.MAX_HEARD:
+            self.heard.add(pkt.call)
+
+    def handle(self, msg: bytes):
+        """
+        Processes a received message
+        :param msg: datagram
+        """
+        if len(msg) < HEADER.size:
+            return
+        magic, m_type, n_len = HEADER.unpack_from(msg)
+        node = msg[HEADER.size:HEADER.size + n_len].decode("utf-8", "replace")
+        body = msg[HEADER.size + n_len:]
+        if magic != MAGIC or node == self.node:
+            return
+        now = self.clock()
+        with self.lock:
+            peer = self.peers.setdefault(
+                node, {"last": now, "counts": [0, 0, 0], "heard": set()}
+            )
+            peer["last"] = now
+            if m_type == b"C":
+                for i in range(0, len(body) - DIGEST + 1, DIGEST):
+                    self.claims.setdefault(body[i:i + DIGEST], (now, node))
+            elif m_type == b"S":
+                try:
+                    state = json.loads(body)
+                    peer["counts"] = state["counts"]
+                    peer["up"] = state.get("up", True)
+                    if len(peer["heard"]) < self.MAX_HEARD:
+                        peer["heard"].update(state["heard"])
+                except (ValueError, KeyError, TypeError):
+                    logging.debug("[CLU ] Invalid state from %s", node)
+
+    def tick(self):
+        """
+        Releases or drops held frames, sends state, expires claims
+        """
+        now = self.clock()
+        while self.held and self.held[0][0] <= now:
+            with self.lock:
+                _, dgst, pkt = self.held.popleft()
+            if self.claimed(dgst):
+                self.stat["dupes"] += 1
+                if self.discard:
+                    self.discard(pkt)
+                continue
+            self.claim(dgst)
+            self.stat["released"] += 1
+            if self.release:
+                self.release(pkt)
+        if now - self.last_state >= self.STATE:
+            self.last_state = now
+            heard, self.heard = self.heard, set()
+            self.send(b"S", json.dumps(
+                {"counts": self.counts, "heard": sorted(heard)[:500], "up": self.uplink_ok}
+            ).encode("utf-8"))
+            with self.lock:
+                self.claims = {
+                    d: c for d, c in self.claims.items() if now - c[0] < self.DUPE
+                }
+
+    def run(self):
+        """
+        Receiver thread
+        """
+        while self.running:
+            try:
+                msg, _ = self.sck.recvfrom(2048)
+                self.handle(msg)
+            except socket.timeout:
+                pass
+            except OSError as err:
+                logging.debug("[CLU ] %s", err)
+                time.sleep(0.05)
+            self.tick()
+        self.sck.close()
+
+    def merged(self, heard: list = ()) -> tuple:
+        """
+        Cluster wide view
+        :param heard: calls heard by this node
+        :return: [gated, not gated, invalid] of all nodes, set of heard calls
+        """
+        counts = list(self.counts)
+        calls = set(heard) | self.heard
+        with self.lock:
+            for peer in self.peers.values():
+                counts = [a + b for a, b in zip(counts, peer["counts"])]
+                calls |= peer["heard"]
+        return counts, calls
+
+    def summary(self, heard: list = ()) -> str:
+        """
+        :param heard: calls heard by this node
+        :return: one line cluster status
+        """
+        counts, calls = self.merged(heard)
+        return (
+            f"Cluster {self.node}: nodes {', '.join(self.live_nodes())}; "
+            f"{counts[0]} gtd, {counts[1]} not gtd, {len(calls)} unique calls; "
+            f"claimed {self.stat['claimed']}, dupes {self.stat['dupes']}, "
+            f"held {self.stat['held']}, released {self.stat['released']}"
+        )
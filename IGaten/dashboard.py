@@ -0,0 +1,276 @@
+"""
+    Live web dashboard
+    Received frames go into a fixed size ring buffer (one append per
+    frame). Once per tick a single thread renders the new frames, the
+    counters and the heard stations into one server-sent events chunk,
+    which every connected browser gets as the same bytes.
+"""
+import time
+import json
+import logging
+import threading
+from itertools import islice
+from collections import deque, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PAGE = b"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Ygate-n</title>
+<style>
+body {font-family: monospace; background: #111; color: #ddd; margin: 1em}
+h1 {font-size: 1.2em} .ng {color: #dd4} td {padding-right: 1em}
+#frames {height: 60vh; overflow-y: scroll; white-space: pre}
+</style></head><body>
+<h1 id="title">Ygate-n</h1>
+<div id="stats"></div>
+<div id="rate"></div>
+<div id="aprsis"></div>
+<table id="heard"></table>
+<div id="frames"></div>
+<script>
+var frames = document.getElementById("frames");
+var src = new EventSource("/events");
+src.addEventListener("reset", function () { frames.textContent = ""; });
+src.addEventListener("frames", function (e) {
+  JSON.parse(e.data).forEach(function (f) {
+    var line = document.createElement("div");
+    line.textContent = f[0] + " [" + f[2] + "] " + (f[3] ? "" : f[4] + ": ") + f[5];
+    if (!f[3]) line.className = "ng";
+    frames.appendChild(line);
+    while (frames.childNodes.length > 500) frames.removeChild(frames.firstChild);
+  });
+  frames.scrollTop = frames.scrollHeight;
+});
+src.addEventListener("stats", function (e) {
+  var s = JSON.parse(e.data);
+  document.getElementById("title").textContent = s.call + " up " + s.up;
+  document.getElementById("stats").textContent = s.gated + " gated, " +
+    s.not_gated + " not gated, " + s.invalid + " invalid, " +
+    s.calls + " unique calls, " + s.viewers + " viewers";
+  document.getElementById("rate").textContent = s.rate || "";
+  document.getElementById("aprsis").textContent = s.aprsis ? "APRS-IS: " + s.aprsis : "";
+  var table = document.getElementById("heard");
+  table.textContent = "";
+  [["call", "last", "frames"]].concat(s.heard).forEach(function (h, i) {
+    var row = table.insertRow();
+    h.forEach(function (v) {  // text only, calls come from RF
+      var cell = document.createElement(i ? "td" : "th");
+      cell.textContent = v;
+      row.appendChild(cell);
+    });
+  });
+});
+</script></body></html>
+"""
+
+
+def sse(event: str, data) -> bytes:
+    """
+    :param event: event name
+    :param data: JSON serializable
+    :return: one server-sent event
+    """
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode()
+
+
+class Dashboard:
+    """
+    HTTP server for the dashboard page and the event stream.
+    The packet path only calls sink(); viewers only read the chunk
+    rendered by the tick thread.
+    """
+
+    RING = 500  # frames kept for new viewers
+    TICK = 1.0  # s between updates
+    MAX_STATIONS = 1000  # heard stations kept
+    TOP = 20  # heard stations shown
+    MAX_VIEWERS = 20
+    KEEPALIVE = 15.0  # s between comments to idle viewers
+
+    def __init__(self, port: int, call: str, stats, host: str = ""):
+        """
+        :param port: TCP port to listen on
+        :param call: IGate call sign with SSID
+        :param stats: stats() -> dict with gated, not_gated, invalid, calls, up, rate, aprsis
+        :param host: interface address, "" for all
+        """
+        self.call = call
+        self.stats = stats
+        self.ring = deque(maxlen=self.RING)  # (seq, Packet)
+        self.seq = 0  # frames appended
+        self.last = 0  # seq of the last rendered frame
+        self.heard = OrderedDict()  # call -> [last time, count], most recent last
+        self.lock = threading.Lock()  # heard, seq
+        self.cond = threading.Condition()
+        self.chunk = b""  # events of the last tick
+        self.version = 0  # incremented per rendered chunk
+        self.snapshot = b""  # all events for new viewers
+        self.state = b""  # JSON for /state.json
+        self.viewers = 0
+        self.rendered = 0  # ticks with new data
+        self.running = False
+        self.server = ThreadingHTTPServer((host, port), self.handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def handler(self):
+        """
+        :return: request handler class bound to this dashboard
+        """
+        dash = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, fmt, *args):
+                logging.debug("[WEB ] %s " + fmt, self.client_address[0], *args)
+
+            def do_GET(self):
+                if self.path == "/":
+                    self.reply(b"text/html; charset=utf-8", PAGE)
+                elif self.path == "/state.json":
+                    self.reply(b"application/json", dash.state)
+                elif self.path == "/events":
+                    dash.stream(self)
+                else:
+                    self.send_error(404)
+
+            def reply(self, c_type: bytes, body: bytes):
+                self.send_response(200)
+                self.send_header("Content-Type", c_type.decode())
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+    def start(self):
+        """
+        Starts the HTTP server and the tick thread
+        """
+        self.running = True
+        self.render()
+        threading.Thread(target=self.server.serve_forever, name="dashboard", daemon=True).start()
+        threading.Thread(target=self.run, name="dashboard tick", daemon=True).start()
+
+    def stop(self):
+        """
+        Stops serving, wakes all viewers
+        """
+        self.running = False
+        with self.cond:
+            self.cond.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def sink(self, pkt):
+        """
+        Packet sink for Ygate.add_sink(), O(1)
+        :param pkt: Packet
+        """
+        with self.lock:  # sinks run in the read loop, uplink and cluster threads
+            self.seq += 1
+            self.ring.append((self.seq, pkt))
+            if pkt.msg == "Invalid routing":
+                return
+            entry = self.heard.get(pkt.call)
+            if entry is None:
+                entry = self.heard[pkt.call] = [0., 0]
+                if len(self.heard) > self.MAX_STATIONS:
+                    self.heard.popitem(last=False)
+            else:
+                self.heard.move_to_end(pkt.call)
+            entry[0] = pkt.time
+            entry[1] += 1
+
+    @staticmethod
+    def frame(pkt) -> list:
+        """
+        :param pkt: Packet
+        :return: [time, call, data type, gated, reason, text] as sent to viewers
+        """
+        return [
+            time.strftime("%H:%M:%S", time.localtime(pkt.time)), pkt.call,
+            pkt.data_type, pkt.gated, pkt.msg, f"{pkt.routing}:{pkt.payload.rstrip()}"
+        ]
+
+    def render(self):
+        """
+        Renders new frames, counters and heard stations once for all viewers
+        """
+        ring = list(self.ring)  # the sink may append meanwhile
+        frames = [self.frame(pkt) for _, pkt in ring]
+        new = frames[len(frames) - sum(1 for seq, _ in ring if seq > self.last):]
+        with self.lock:
+            top = [(call, *ent) for call, ent in islice(reversed(self.heard.items()), self.TOP)]
+        heard = [
+            [call, time.strftime("%H:%M:%S", time.localtime(t_l)), cnt]
+            for call, t_l, cnt in top
+        ]
+        stats = dict(self.stats(), call=self.call, viewers=self.viewers, heard=heard)
+        chunk = (sse("frames", new) if new else b"") + sse("stats", stats)
+        snapshot = sse("reset", len(frames)) + sse("frames", frames) + sse("stats", stats)
+        state = json.dumps({"stats": stats, "frames": frames}).encode()
+        with self.cond:
+            self.chunk = chunk
+            self.snapshot = snapshot
+            self.state = state
+            self.version += 1
+            self.cond.notify_all()
+        self.rendered += 1
+        if ring:
+            self.last = ring[-1][0]
+
+    def run(self):
+        """
+        Tick thread, renders only if there is something new
+        """
+        last_stats = None
+        while self.running:
+            time.sleep(self.TICK)
+            stats = self.stats()
+            if self.seq != self.last or stats != last_stats:
+                last_stats = stats
+                self.render()
+
+    def stream(self, req):
+        """
+        Serves /events to one viewer until it disconnects
+        :param req: request handler
+        """
+        with self.cond:
+            if self.viewers >= self.MAX_VIEWERS:
+                req.send_error(503, "Too many viewers")
+                return
+            self.viewers += 1
+            version, data = self.version, self.snapshot
+        try:
+            req.send_response(200)
+            req.send_header("Content-Type", "text/event-stream")
+            req.send_header("Cache-Control", "no-cache")
+            req.end_headers()
+            req.wfile.write(data)
+            req.wfile.flush()
+            while self.running:
+                with self.cond:
+                    self.cond.wait_for(
+                        lambda: self.version != version or not self.running, self.KEEPALIVE
+                    )
+                    if self.version == version:
+                        data = b": keepalive\n\n"
+                    elif self.version == version + 1:
+                        data = self.chunk
+                    else:  # missed ticks, start over
+                        data = self.snapshot
+                    version = self.version
+                req.wfile.write(data)
+                req.wfile.flush()
+        except OSError as err:
+            logging.debug("[WEB ] viewer %s gone: %s", req.client_address[0], err)
+        finally:
+            with self.cond:
+                self.viewers -= 1
+
+    def summary(self) -> str:
+        """
+        :return: one line status
+        """
+        return f"Dashboard on port {self.port}: {self.viewers} viewers, " \
+               f"{self.seq} frames, {self.rendered} updates rendered"
@@ -0,0 +1,264 @@
+"""
+    Local fan-out server
+    Streams received RF frames in APRS-IS text format to TCP clients
+"""
+import time
+import socket
+import logging
+import selectors
+import threading
+from collections import deque
+
+
+class Client:
+    """
+    Connected client with a bounded send queue
+    """
+
+    def __init__(self, sck: socket.socket, addr: tuple, max_queue: int):
+        self.sck = sck
+        self.addr = addr
+        self.queue = deque(maxlen=max_queue)  # lines waiting to be sent
+        self.out = b""  # partly sent data
+        self.inp = b""  # partly received line
+        self.sent = 0  # lines sent
+        self.drops = 0  # lines dropped since last successful send
+        self.dropped = 0  # lines dropped in total
+
+    def __str__(self):
+        return f"{self.addr[0]}:{self.addr[1]}"
+
+
+class FanoutServer:
+    """
+    TCP server broadcasting frames to all connected clients.
+    broadcast() only appends to the client queues; one thread does
+    all socket I/O. A client that cannot keep up loses the oldest
+    lines and is disconnected after MAX_DROPS lines in a row.
+    """
+
+    MAX_QUEUE = 500  # lines buffered per client
+    MAX_DROPS = 2000  # disconnect a client after so many lines lost in a row
+    MAX_CLIENTS = 20
+    KEEPALIVE = 20.0  # s between "#" keep alive lines
+    CHUNK = 16384  # max. bytes per send
+    ALL = False  # False: only gated frames, as sent to APRS-IS
+    # True: also frames not gated (flood protection, cluster dupes and
+    # TCPIP, NOGATE, RFONLY or other frames dropped by the gating rules)
+
+    def __init__(self, port: int, call: str, host: str = ""):
+        """
+        :param port: TCP port to listen on
+        :param call: IGate call sign with SSID, used in q construct
+        :param host: interface address, "" for all
+        """
+        self.call = call
+        self.lsck = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.lsck.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.lsck.bind((host, port))
+        self.lsck.listen(5)
+        self.lsck.setblocking(False)
+        self.port = self.lsck.getsockname()[1]
+        self.clients = {}  # socket -> Client
+        self.lock = threading.Lock()
+        self.sel = selectors.DefaultSelector()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+        self.pending = False  # new lines since last wake up
+        self.running = False
+        self.disconnected = 0  # slow clients disconnected
+
+    def start(self):
+        """
+        Starts the I/O thread
+        """
+        self.sel.register(self.lsck, selectors.EVENT_READ, "accept")
+        self.sel.register(self.wake_r, selectors.EVENT_READ, "wake")
+        self.running = True
+        threading.Thread(target=self.run, name="fanout", daemon=True).start()
+
+    def stop(self):
+        """
+        Stops the I/O thread and closes all connections
+        """
+        self.running = False
+        self.wake()
+
+    def wake(self):
+        """
+        Wakes up the I/O thread
+        """
+        try:
+            self.wake_w.send(b"\0")
+        except (BlockingIOError, OSError):
+            pass  # already woken up
+
+    def sink(self, pkt):
+        """
+        Packet sink for Ygate.add_sink(), forwards frames with a valid
+        call, not gated frames only with ALL
+        :param pkt: Packet
+        """
+        if not pkt.call or pkt.msg == "Invalid routing":
+            return
+        if not (pkt.gated or self.ALL):
+            return
+        self.broadcast(
+            bytes(f"{pkt.routing},qAO,{self.call}:", "ascii", "replace")
+            + pkt.raw.rstrip(b"\r\n") + b"\r\n"
+        )
+
+    def broadcast(self, line: bytes):
+        """
+        Queues a line for all clients, never blocks on a client
+        :param line: line including "\\r\\n"
+        """
+        if not self.clients:
+            return
+        with self.lock:
+            for client in self.clients.values():
+                if len(client.queue) == client.queue.maxlen:
+                    client.drops += 1
+                    client.dropped += 1
+                client.queue.append(line)
+            wake = not self.pending
+            self.pending = True
+        if wake:
+            self.wake()
+
+    def run(self):
+        """
+        I/O thread: accepts clients, answers logins, sends queued lines
+        """
+        last_ka = time.time()
+        while self.running:
+            for key, events in self.sel.select(timeout=1.0):
+                if key.data == "accept":
+                    self.accept()
+                elif key.data == "wake":
+                    try:
+                        while self.wake_r.recv(4096):
+                            pass
+                    except (BlockingIOError, OSError):
+                        pass
+                else:
+                    if events & selectors.EVENT_READ:
+                        self.receive(key.data)
+                    if events & selectors.EVENT_WRITE and key.data.sck in self.clients:
+                        self.send(key.data)
+            if time.time() - last_ka > self.KEEPALIVE:
+                last_ka = time.time()
+                self.broadcast(bytes(time.strftime(
+                    "# Ygate-n %d %b %Y %H:%M:%S GMT\r\n", time.gmtime()), "ascii"))
+            with self.lock:
+                self.pending = False
+                busy = [c for c in self.clients.values() if c.queue or c.out]
+            for client in busy:
+                if client.drops > self.MAX_DROPS:
+                    logging.warning("[FAN ] Slow client %s disconnected", client)
+                    self.disconnected += 1
+                    self.close(client)
+                else:
+                    self.sel.modify(
+                        client.sck, selectors.EVENT_READ | selectors.EVENT_WRITE, client
+                    )
+        for client in list(self.clients.values()):
+            self.close(client)
+        self.sel.close()
+        self.lsck.close()
+
+    def accept(self):
+        """
+        Accepts a new client and sends the server banner
+        """
+        try:
+            sck, addr = self.lsck.accept()
+        except (BlockingIOError, OSError):
+            return
+        if len(self.clients) >= self.MAX_CLIENTS:
+            sck.close()
+            return
+        sck.setblocking(False)
+        client = Client(sck, addr, self.MAX_QUEUE)
+        client.out = b"# Ygate-n fan-out\r\n"
+        with self.lock:
+            self.clients[sck] = client
+        self.sel.register(sck, selectors.EVENT_READ | selectors.EVENT_WRITE, client)
+        logging.info("[FAN ] Client %s connected", client)
+
+    def receive(self, client: Client):
+        """
+        Reads from a client, answers "user ..." login lines
+        :param client: client
+        """
+        try:
+            data = client.sck.recv(1024)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.close(client)
+            return
+        lines = (client.inp + data).split(b"\n")
+        client.inp = lines.pop()[-1024:]
+        for line in lines:
+            if line.startswith(b"user "):
+                call = line.split()[1] if len(line.split()) > 1 else b"N0CALL"
+                client.out += b"# logresp " + call + b" unverified, server YGATE\r\n"
+
+    def send(self, client: Client):
+        """
+        Sends queued lines to a writable client
+        :param client: client
+        """
+        with self.lock:
+            lines = []
+            size = len(client.out)
+            while client.queue and size < self.CHUNK:
+                lines.append(client.queue.popleft())
+                size += len(lines[-1])
+        out = client.out + b"".join(lines)
+        try:
+            n_byt = client.sck.send(out)
+        except (BlockingIOError, InterruptedError):
+            n_byt = 0
+        except OSError:
+            self.close(client)
+            return
+        client.out = out[n_byt:]
+        client.sent += len(lines)
+        if n_byt > 0:
+            client.drops = 0
+        if not client.out and not client.queue:
+            self.sel.modify(client.sck, selectors.EVENT_READ, client)
+
+    def close(self, client: Client):
+        """
+        Disconnects a client
+        :param client: client
+        """
+        with self.lock:
+            self.clients.pop(client.sck, None)
+        try:
+            self.sel.unregister(client.sck)
+        except (KeyError, ValueError):
+            pass
+        client.sck.close()
+        logging.info(
+            "[FAN ] Client %s disconnected, %d lines sent, %d dropped",
+            client, client.sent, client.dropped
+        )
+
+    def summary(self) -> str:
+        """
+        :return: one line status
+        """
+        with self.lock:
+            clients = list(self.clients.values())
+        return (
+            f"Fan-out port {self.port}: {len(clients)} clients, "
+            f"{sum(c.dropped for c in clients)} lines dropped, "
+            f"{self.disconnected} slow clients disconnected"
+        )
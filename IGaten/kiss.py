@@ -0,0 +1,96 @@
+"""
+    KISS framed AX.25 input
+    Decodes UI frames from a KISS TNC into TNC2 routing and payload
+"""
+import re
+
+FEND = b"\xc0"  # frame end
+FESC = b"\xdb"  # frame escape
+TFEND = b"\xdc"  # transposed frame end
+TFESC = b"\xdd"  # transposed frame escape
+UI = 0x03  # AX.25 control field of an UI frame
+PID_NONE = 0xF0  # no layer 3 protocol
+VALID_CALL = re.compile(r"[A-Z\d]{1,6}$")
+
+
+def kiss_unescape(data: bytes) -> bytes:
+    """
+    Removes KISS escapes
+    :param data: frame content between FENDs
+    :return: unescaped bytes
+    """
+    if FESC not in data:
+        return data
+    return data.replace(FESC + TFEND, FEND).replace(FESC + TFESC, FESC)
+
+
+def kiss_escape(data: bytes) -> bytes:
+    """
+    Escapes FEND and FESC and adds the frame delimiters
+    :param data: port/command byte and AX.25 frame
+    :return: KISS frame
+    """
+    return FEND + data.replace(FESC, FESC + TFESC).replace(FEND, FESC + TFEND) + FEND
+
+
+def ax25_address(field: bytes) -> tuple:
+    """
+    Decodes one 7 byte AX.25 address field
+    :param field: shifted call sign and SSID byte
+    :return: call sign with SSID, H bit (has been repeated), last address
+    """
+    call = bytes(b >> 1 for b in field[:6]).decode("ascii").rstrip()
+    ssid = (field[6] >> 1) & 0x0F
+    if ssid:
+        call = f"{call}-{ssid}"
+    return call, bool(field[6] & 0x80), bool(field[6] & 0x01)
+
+
+def encode_address(call: str, last: bool = False, rep: bool = False) -> bytes:
+    """
+    Encodes a call sign into a 7 byte AX.25 address field
+    :param call: call sign with optional SSID
+    :param last: address extension bit, set on the last address
+    :param rep: H bit, has been repeated
+    :return: address field
+    """
+    base, _, ssid = call.partition("-")
+    field = bytes(ord(c) << 1 for c in base.ljust(6)[:6])
+    return field + bytes([
+        0x60 | (int(ssid or 0) & 0x0F) << 1 | (0x80 if rep else 0) | (1 if last else 0)
+    ])
+
+
+def decode_ax25(frame: bytes) -> tuple:
+    """
+    Decodes an AX.25 UI frame into the form used by Ygate.process_frame()
+    :param frame: AX.25 frame without KISS port byte and FCS
+    :return: invalid call signs, TNC2 routing "SRC>DEST,DIGI*", payload
+             ending with "\\r\\n"; None if not an APRS UI frame
+    :raises ValueError: truncated frame
+    """
+    addrs = []
+    pos = 0
+    while True:
+        if pos + 7 > len(frame) or len(addrs) > 9:
+            raise ValueError("AX.25 address field truncated")
+        addrs.append(ax25_address(frame[pos:pos + 7]))
+        pos += 7
+        if addrs[-1][2]:  # extension bit: last address
+            break
+    if len(addrs) < 2:
+        raise ValueError("AX.25 frame without source address")
+    if pos + 2 > len(frame) or frame[pos] & 0xEF != UI or frame[pos + 1] != PID_NONE:
+        return None
+    n_inv = sum(
+        1 for call, _, _ in addrs if not VALID_CALL.match(call.partition("-")[0])
+    )
+    path = [call for call, _, _ in addrs[2:]]
+    rep = [i for i, (_, h_bit, _) in enumerate(addrs[2:]) if h_bit]
+    if rep:  # mark the last digipeater that has repeated the frame
+        path[rep[-1]] += "*"
+    routing = ",".join([f"{addrs[1][0]}>{addrs[0][0]}"] + path)
+    payload = frame[pos + 2:]
+    end = min((i for i in (payload.find(b"\r"), payload.find(b"\n")) if i >= 0),
+              default=len(payload))
+    return n_inv, routing, payload[:end] + b"\r\n"
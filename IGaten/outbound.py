@@ -0,0 +1,188 @@
+"""
+    Priority scheduler for data sent to APRS-IS
+    One writer thread sends gated packets, query replies, status
+    bulletins and beacons in priority order.
+"""
+import time
+import logging
+import threading
+from collections import deque, namedtuple
+
+# prio: lower is sent first, size: max. queue length,
+# deadline: s after which a queued item is dropped,
+# replace: a new item replaces a queued one (stale beacons)
+OutClass = namedtuple("OutClass", ["prio", "size", "deadline", "replace"])
+
+CLASSES = {
+    "gated": OutClass(0, 500, 30.0, False),  # APRS-IS dupe window is 30 s
+    "reply": OutClass(1, 20, 60.0, False),
+    "status": OutClass(2, 1, 600.0, True),
+    "beacon": OutClass(3, 1, 600.0, True),
+}
+
+
+class ClassStat:
+    """
+    Counters of one outbound class
+    """
+
+    def __init__(self):
+        self.queued = 0
+        self.sent = 0
+        self.failed = 0  # send failed
+        self.dropped = 0  # queue full, oldest dropped
+        self.expired = 0  # deadline passed
+        self.replaced = 0  # replaced by a newer item
+        self.wait_max = 0.0  # s max. time in queue
+        self.wait_avg = 0.0  # s moving average of time in queue
+
+
+class Outbound:
+    """
+    Priority queues per class, served by one writer thread
+    """
+
+    def __init__(self, send, classes: dict = None, clock=time.monotonic, beat=None, done=None):
+        """
+        :param send: send(cls, data) -> bool, called by the writer thread
+        :param classes: {name: OutClass}, default CLASSES
+        :param clock: time source in seconds
+        :param beat: beat() heartbeat, called at least once per sec while running
+        :param done: done(cls, data, result, ref) for each item that leaves the queue,
+                     result "sent", "failed", "dropped", "expired" or "stopped",
+                     ref as given to put()
+        """
+        self.send = send
+        self.beat = beat or (lambda: None)
+        self.done = done or (lambda cls, data, result, ref: None)
+        self.classes = classes or CLASSES
+        self.order = sorted(self.classes, key=lambda c: self.classes[c].prio)
+        self.queues = {cls: deque() for cls in self.classes}  # (time, data, ref)
+        self.stat = {cls: ClassStat() for cls in self.classes}
+        self.clock = clock
+        self.cond = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        """
+        Starts the writer thread
+        """
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="outbound", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """
+        Stops the writer thread after the current item,
+        items still queued leave with result "stopped"
+        :param timeout: s to wait for the current item
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        if self.thread and self.thread is not threading.current_thread():
+            self.thread.join(timeout)
+        left = []
+        with self.cond:
+            for cls in self.order:
+                left += [(cls, *item[1:]) for item in self.queues[cls]]
+                self.queues[cls].clear()
+        for cls, data, ref in left:
+            self.done(cls, data, "stopped", ref)
+
+    def put(self, cls: str, data: bytes, ref=None) -> bool:
+        """
+        Queues data, never blocks
+        :param cls: outbound class, see CLASSES
+        :param data: bytes to send
+        :param ref: passed to done(), e.g. the Packet of a gated frame
+        :return: False if an older item had to be dropped
+        """
+        o_cls = self.classes[cls]
+        stat = self.stat[cls]
+        queue = self.queues[cls]
+        with self.cond:
+            room = True
+            if o_cls.replace and queue:
+                stat.replaced += len(queue)
+                queue.clear()
+            elif len(queue) >= o_cls.size:
+                dropped = queue.popleft()[1:]
+                stat.dropped += 1
+                room = False
+            queue.append((self.clock(), data, ref))
+            stat.queued += 1
+            self.cond.notify()
+        if not room:
+            self.done(cls, dropped[0], "dropped", dropped[1])
+        return room
+
+    def next_item(self) -> tuple:
+        """
+        Waits for the highest priority item within its deadline
+        :return: class, time queued, data, ref; None when stopped
+        """
+        expired = []
+        try:
+            with self.cond:
+                while self.running:
+                    self.beat()
+                    now = self.clock()
+                    for cls in self.order:
+                        queue = self.queues[cls]
+                        while queue and now - queue[0][0] > self.classes[cls].deadline:
+                            expired.append((cls, *queue.popleft()[1:]))
+                            self.stat[cls].expired += 1
+                        if queue:
+                            return (cls, *queue.popleft())
+                    self.cond.wait(1.0)
+            return None
+        finally:  # outside the lock
+            for cls, data, ref in expired:
+                self.done(cls, data, "expired", ref)
+
+    def run(self):
+        """
+        Writer thread
+        """
+        while True:
+            item = self.next_item()
+            if item is None:
+                return
+            cls, t_q, data, ref = item
+            stat = self.stat[cls]
+            wait = self.clock() - t_q
+            stat.wait_max = max(stat.wait_max, wait)
+            stat.wait_avg += (wait - stat.wait_avg) * 0.1
+            try:
+                sent = self.send(cls, data)
+            except Exception as err:  # keep the writer alive
+                logging.error("[OUT ] %s not sent: %s", cls, err)
+                sent = False
+            if sent:
+                stat.sent += 1
+            else:
+                stat.failed += 1
+            self.done(cls, data, "sent" if sent else "failed", ref)
+
+    def depth(self) -> dict:
+        """
+        :return: {class: items waiting}
+        """
+        return {cls: len(queue) for cls, queue in self.queues.items()}
+
+    def summary(self) -> str:
+        """
+        :return: one line per class with depth, counters and wait times
+        """
+        lines = []
+        for cls in self.order:
+            stat = self.stat[cls]
+            lines.append(
+                f"{cls:7} depth {len(self.queues[cls]):4d} sent {stat.sent} "
+                f"failed {stat.failed} dropped {stat.dropped} expired {stat.expired} "
+                f"replaced {stat.replaced} wait avg {stat.wait_avg:.3f} s "
+                f"max {stat.wait_max:.3f} s"
+            )
+        return "\n".join(lines)
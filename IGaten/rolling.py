@@ -0,0 +1,259 @@
+"""
+    Rolling window traffic statistics in fixed memory
+    Frames per data type are counted in ring buffers of time buckets
+    (e.g. 12 x 5 s for 1 min), stations in bounded Space-Saving sketches
+    (heavy hitters). Updates are O(1), memory does not grow with traffic.
+"""
+import time
+import threading
+
+# name: (window s, buckets)
+WINDOWS = {"1 min": (60, 12), "15 min": (900, 15), "24 h": (86400, 96)}
+
+
+class BucketRing:
+    """
+    Counts per key in the last `window` sec, in `buckets` time buckets
+    """
+
+    def __init__(self, window: float, buckets: int, keys: int):
+        """
+        :param window: s
+        :param buckets: number of buckets, resolution window / buckets
+        :param keys: number of keys (key indices 0 .. keys - 1)
+        """
+        self.width = window / buckets
+        self.ring = [[0] * keys for _ in range(buckets)]
+        self.sums = [0] * keys  # totals over the ring
+        self.cur = None  # absolute number of the current bucket
+
+    def advance(self, now: float):
+        """
+        Clears buckets that left the window
+        :param now: time stamp
+        """
+        b_now = int(now // self.width)
+        if self.cur is None:
+            self.cur = b_now
+            return
+        steps = min(b_now - self.cur, len(self.ring))
+        for step in range(1, steps + 1):
+            bucket = self.ring[(self.cur + step) % len(self.ring)]
+            for key, val in enumerate(bucket):
+                if val:
+                    self.sums[key] -= val
+                    bucket[key] = 0
+        self.cur = max(self.cur, b_now)
+
+    def add(self, key: int, now: float):
+        """
+        :param key: key index
+        :param now: time stamp
+        """
+        if self.cur is None or now >= (self.cur + 1) * self.width:
+            self.advance(now)
+        self.ring[self.cur % len(self.ring)][key] += 1
+        self.sums[key] += 1
+
+    def totals(self, now: float) -> list:
+        """
+        :param now: time stamp
+        :return: count per key in the window
+        """
+        self.advance(now)
+        return list(self.sums)
+
+
+class SpaceSaving:
+    """
+    Space-Saving heavy hitters sketch with `capacity` counters.
+    Counts of stations above total / capacity are never missed;
+    a count overestimates by at most its error.
+    Items are grouped by count, so updates and evictions are O(1).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.count = {}  # item -> count
+        self.error = {}  # item -> overestimate
+        self.groups = {}  # count -> set of items
+        self.min = 0  # smallest count
+        self.total = 0
+
+    def add(self, item: str):
+        """
+        :param item: e.g. call sign
+        """
+        self.total += 1
+        cnt = self.count.get(item)
+        if cnt is None:
+            if len(self.count) < self.capacity:
+                cnt = 0
+                self.error[item] = 0
+            else:  # take over the counter of an item with the smallest count
+                cnt = self.min
+                victim = self.groups[cnt].pop()
+                del self.count[victim], self.error[victim]
+                self.error[item] = cnt
+        if cnt:
+            group = self.groups[cnt]
+            group.discard(item)
+            if not group:
+                del self.groups[cnt]
+        self.count[item] = cnt + 1
+        self.groups.setdefault(cnt + 1, set()).add(item)
+        if cnt == 0:
+            self.min = 1
+        elif cnt == self.min and cnt not in self.groups:
+            self.min = cnt + 1
+
+    def clear(self):
+        """
+        Forgets all items
+        """
+        self.count.clear()
+        self.error.clear()
+        self.groups.clear()
+        self.min = 0
+        self.total = 0
+
+
+class RollingStats:
+    """
+    Frames per data type and top stations for each of WINDOWS
+    """
+
+    CAPACITY = 64  # counters per station sketch
+
+    def __init__(self, keys: list, windows: dict = None, clock=time.time):
+        """
+        :param keys: data types, e.g. sorted set of APRS_DATA_TYPE values
+        :param windows: {name: (window s, buckets)}, default WINDOWS
+        :param clock: time source in seconds
+        """
+        self.keys = list(keys)
+        self.index = {key: i for i, key in enumerate(self.keys)}
+        self.windows = windows or WINDOWS
+        self.clock = clock
+        self.lock = threading.Lock()  # add() runs in the read loop, reports elsewhere
+        self.rings = {
+            name: BucketRing(win, buckets, len(self.keys))
+            for name, (win, buckets) in self.windows.items()
+        }
+        # two epochs of one window length per window: previous, current
+        self.sketches = {
+            name: [SpaceSaving(self.CAPACITY), SpaceSaving(self.CAPACITY), 0]
+            for name in self.windows
+        }
+
+    def add(self, key: str, call: str = None, now: float = None):
+        """
+        Counts one frame, O(1)
+        :param key: data type, unknown keys are ignored
+        :param call: station call sign
+        :param now: time stamp
+        """
+        now = self.clock() if now is None else now
+        idx = self.index.get(key)
+        with self.lock:
+            if idx is not None:
+                for ring in self.rings.values():
+                    ring.add(idx, now)
+            if call:
+                for name, sketch in self.sketches.items():
+                    self.rotate(name, sketch, now).add(call)
+
+    def sink(self, pkt):
+        """
+        Sink for Ygate.add_sink(), frames with invalid routing count as "INV "
+        :param pkt: Packet
+        """
+        if pkt.msg == "Invalid routing":
+            self.add("INV ", now=pkt.time)
+        else:
+            self.add(pkt.data_type, pkt.call, pkt.time)
+
+    def rotate(self, name: str, sketch: list, now: float) -> SpaceSaving:
+        """
+        Starts a new epoch when the current one is one window old
+        :return: current sketch
+        """
+        win = self.windows[name][0]
+        epoch = int(now // win)
+        if epoch != sketch[2]:
+            prev, cur = sketch[0], sketch[1]
+            if epoch == sketch[2] + 1:  # current becomes previous
+                prev.clear()
+                sketch[0], sketch[1] = cur, prev
+            else:  # idle for more than one window
+                prev.clear()
+                cur.clear()
+            sketch[2] = epoch
+        return sketch[1]
+
+    def counts(self, name: str, now: float = None) -> dict:
+        """
+        :param name: window name
+        :param now: time stamp
+        :return: {data type: frames} in the window, without zeros
+        """
+        now = self.clock() if now is None else now
+        with self.lock:
+            totals = self.rings[name].totals(now)
+        return {key: cnt for key, cnt in zip(self.keys, totals) if cnt}
+
+    def top(self, name: str, num: int = 5, now: float = None) -> list:
+        """
+        Stations with most frames in about the last window: the current
+        epoch plus the previous one weighted by its part still in the window,
+        ranked by the guaranteed count (sketch count minus error)
+        :param name: window name
+        :param num: number of stations
+        :param now: time stamp
+        :return: [(call, estimated frames)] highest first
+        """
+        now = self.clock() if now is None else now
+        sketch = self.sketches[name]
+        win = self.windows[name][0]
+        weight = 1. - (now % win) / win
+        with self.lock:
+            cur = self.rotate(name, sketch, now)
+            prev = sketch[0]
+            est = {call: (cnt - prev.error[call]) * weight for call, cnt in prev.count.items()}
+            for call, cnt in cur.count.items():
+                est[call] = est.get(call, 0.) + cnt - cur.error[call]
+        ranked = sorted(est.items(), key=lambda item: (-item[1], item[0]))[:num]
+        return [(call, round(cnt)) for call, cnt in ranked if round(cnt) > 0]
+
+    def bulletin(self, name: str = "15 min", types: int = 3) -> str:
+        """
+        :param name: window name
+        :param types: number of data types shown
+        :return: short text for the status bulletin
+        """
+        counts = self.counts(name)
+        total = sum(counts.values())
+        if total == 0:
+            return f"{name}: 0 pkts"
+        top_types = sorted(counts.items(), key=lambda item: -item[1])[:types]
+        txt = f"{name}: {total} pkts " + " ".join(f"{k.strip()} {v}" for k, v in top_types)
+        top = self.top(name, 1)
+        if top:
+            txt += f", top {top[0][0]} {top[0][1]}"
+        return txt
+
+    def summary(self) -> str:
+        """
+        :return: one line per window with data types and top stations
+        """
+        lines = []
+        for name in self.windows:
+            counts = self.counts(name)
+            types = " ".join(
+                f"{k.strip()} {v}" for k, v in sorted(counts.items(), key=lambda i: -i[1])
+            )
+            stations = ", ".join(f"{call} {cnt}" for call, cnt in self.top(name))
+            lines.append(
+                f"{name:6} {sum(counts.values()):7d} frames  {types or '-'}; top {stations or '-'}"
+            )
+        return "\n".join(lines)
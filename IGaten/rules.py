@@ -0,0 +1,250 @@
+"""
+    Gating rules
+    One rule per line, evaluated in order, the first matching rule decides;
+    the built-in drops of TCP, RFONLY and NOGATE frames always come first:
+
+        drop FIELD OP VALUE [message]   do not gate
+        pass FIELD OP VALUE             gate, no further rules
+        special CALL ...                accept CALL (e.g. PSAT) as source call
+
+    FIELD: call (source call with SSID), route (TNC2 header), payload, type
+    OP:    is, prefix, contains, match (regular expression)
+    type only supports "is" with an APRS data type, e.g. drop type is WX
+    Quote values and messages with blanks, a backslash is kept as written
+
+    Rules are compiled into one matcher: dicts for "is" and "type", a prefix
+    trie per field and one regular expression per field for "contains" and
+    "match", factored on the literal prefixes. A frame that matches no rule
+    costs about the same for 5 or 5000 rules.
+"""
+import re
+import shlex
+from collections import namedtuple
+
+Rule = namedtuple("Rule", ["action", "field", "op", "value", "msg", "line"])
+
+FIELDS = ("call", "route", "payload", "type")
+OPS = ("is", "prefix", "contains", "match")
+ACTIONS = ("drop", "pass")
+
+LOOP_RULES = r"""
+# built-in rules, evaluated before RULES_FILE, a site pass rule
+# must never gate frames from the internet or not meant for it
+drop route   contains ,TCP          "TCP not gated"
+drop payload match    ^}.*,TCP.*:   "TCP not gated"
+drop route   contains RFONLY        "RFONLY, not gated"
+drop route   contains NOGATE        "NOGATE, not gated"
+"""
+
+DEFAULT_RULES = r"""
+# built-in rules, evaluated after RULES_FILE
+drop payload prefix   ?             "Query, not gated"
+special USNAP1 PSAT PCSAT AISAT
+"""
+
+NOT_FOUND = 1 << 30  # rule index if no rule matches
+
+
+def split_literal(pattern: str) -> tuple:
+    """
+    :param pattern: regular expression
+    :return: leading literal text, rest of pattern
+    """
+    lit = []
+    pos = 0
+    while pos < len(pattern):
+        char = pattern[pos]
+        if char == "\\" and pos + 1 < len(pattern) and not pattern[pos + 1].isalnum():
+            lit.append(pattern[pos + 1])
+            pos += 2
+        elif char in ".^$*+?{}[]|()\\":
+            break
+        else:
+            lit.append(char)
+            pos += 1
+    if pos < len(pattern) and pattern[pos] in "*+?{" and lit:  # quantified last char
+        pos -= 2 if pattern[pos - 2:pos - 1] == "\\" else 1
+        lit.pop()
+    if "|" in pattern:  # top level alternation, keep as is
+        return "", pattern
+    return "".join(lit), pattern[pos:]
+
+
+def trie_regex(items: list) -> str:
+    """
+    One regular expression matching any of the items, factored as a trie
+    on the literal prefixes (",XX1[0-9]", ",XX2[0-9]" -> ",XX(?:1[0-9]|2[0-9])"),
+    so a search costs about the same for few or many items
+    :param items: (literal prefix, regular expression after the prefix)
+    :return: pattern
+    """
+    trie = {}
+    for lit, tail in items:
+        node = trie
+        for char in lit:
+            node = node.setdefault(char, {})
+        node.setdefault(None, []).append(tail)
+
+    def emit(node: dict) -> str:
+        tails = node.get(None, [])
+        if "" in tails:  # this prefix matches already
+            return ""
+        alts = [f"(?:{tail})" for tail in tails]
+        alts += [re.escape(c) + emit(sub) for c, sub in node.items() if c is not None]
+        return alts[0] if len(alts) == 1 else f"(?:{'|'.join(alts)})"
+
+    return emit(trie)
+
+
+def unquote(word: str) -> str:
+    """
+    :param word: token, may be quoted
+    :return: word without enclosing quotes
+    """
+    if len(word) > 1 and word[0] == word[-1] and word[0] in "\"'":
+        return word[1:-1]
+    return word
+
+
+def parse(text: str, source: str = "rules", data_types: dict = None) -> tuple:
+    """
+    Parses rule text, backslashes are kept as written (regular expressions)
+    :param text: rules, see module doc
+    :param source: name used in error messages
+    :param data_types: {first payload char: data type}, type values are checked if given
+    :return: list of Rule, set of special calls
+    """
+    rules = []
+    special = set()
+    types = {d_type.strip() for d_type in (data_types or {}).values()}
+    for num, line in enumerate(text.splitlines(), 1):
+        try:
+            words = [unquote(word) for word in shlex.split(line, comments=True, posix=False)]
+        except ValueError as err:
+            raise ValueError(f"{source}:{num}: {err}") from None
+        if not words:
+            continue
+        if words[0] == "special" and len(words) > 1:
+            special.update(words[1:])
+            continue
+        if len(words) < 4 or words[0] not in ACTIONS:
+            raise ValueError(f"{source}:{num}: expected ACTION FIELD OP VALUE [message]")
+        action, field, op, value = words[:4]
+        if field not in FIELDS or op not in OPS or field == "type" and op != "is":
+            raise ValueError(f"{source}:{num}: invalid field or operator {field} {op}")
+        if field == "type" and data_types is not None and value.strip() not in types:
+            raise ValueError(f"{source}:{num}: invalid data type {value}")
+        if op == "match":
+            try:
+                re.compile(value)
+            except re.error as err:
+                raise ValueError(f"{source}:{num}: {err}") from None
+        msg = " ".join(words[4:]) or f"{source}:{num}, not gated"
+        rules.append(Rule(action, field, op, value, msg, f"{source}:{num}"))
+    return rules, special
+
+
+class Rules:
+    """
+    Compiled rule set with hit counters
+    """
+
+    def __init__(self, text: str = "", data_types: dict = None, source: str = "rules"):
+        """
+        :param text: site rules, evaluated after LOOP_RULES and before DEFAULT_RULES
+        :param data_types: {first payload char: data type}, for the type field
+        :param source: name of the site rules in messages
+        """
+        rules, special = parse(text, source, data_types)
+        loop, _ = parse(LOOP_RULES, "loop")
+        defaults, d_special = parse(DEFAULT_RULES, "default")
+        self.rules = loop + rules + defaults
+        self.special = frozenset(special | d_special)
+        self.hits = [0] * len(self.rules)
+        self.exact = {field: {} for field in FIELDS}  # value -> first rule
+        self.tries = {field: {} for field in FIELDS}  # char -> node, None -> first rule
+        regexes = {field: [] for field in FIELDS}
+        for idx, rule in enumerate(self.rules):
+            if rule.field == "type":
+                for char, d_type in (data_types or {}).items():
+                    if d_type.strip() == rule.value.strip():
+                        self.exact["type"].setdefault(char, idx)
+            elif rule.op == "is":
+                self.exact[rule.field].setdefault(rule.value, idx)
+            elif rule.op == "prefix":
+                node = self.tries[rule.field]
+                for char in rule.value:
+                    node = node.setdefault(char, {})
+                node.setdefault(None, idx)
+            else:
+                pattern = rule.value if rule.op == "match" else re.escape(rule.value)
+                regexes[rule.field].append((idx, re.compile(pattern)))
+        # one search with all patterns of a field rejects most frames,
+        # only on a hit the single patterns are tried in rule order
+        self.regexes = {}
+        for field, pats in regexes.items():
+            if not pats:
+                continue
+            if any(regex.groups for _, regex in pats):
+                # groups of a pattern are renumbered once joined, backreferences
+                # would point to the wrong group, try the patterns one by one
+                self.regexes[field] = (None, pats)
+                continue
+            try:
+                combined = re.compile(trie_regex([
+                    (rule.value, "") if rule.op == "contains" else split_literal(rule.value)
+                    for rule in (self.rules[idx] for idx, _ in pats)
+                ]))
+            except re.error:  # e.g. global inline flags, try the patterns one by one
+                combined = None
+            self.regexes[field] = (combined, pats)
+
+    def first(self, field: str, value: str) -> int:
+        """
+        :param field: rule field
+        :param value: field value of the frame
+        :return: index of the first rule on field matching value, NOT_FOUND if none
+        """
+        best = self.exact[field].get(value, NOT_FOUND)
+        node = self.tries[field]
+        for char in value:
+            node = node.get(char)
+            if node is None:
+                break
+            best = min(best, node.get(None, NOT_FOUND))
+        if field in self.regexes:
+            combined, pats = self.regexes[field]
+            if combined is None or combined.search(value):
+                for idx, regex in pats:
+                    if idx >= best:
+                        break
+                    if regex.search(value):
+                        best = idx
+                        break
+        return best
+
+    def match(self, route: str, payload: str):
+        """
+        :param route: TNC2 header
+        :param payload: decoded payload
+        :return: first matching Rule, None if no rule matches
+        """
+        best = min(
+            self.first("call", route[:route.find(">")]),
+            self.first("route", route),
+            self.first("payload", payload),
+            self.exact["type"].get(payload[:1], NOT_FOUND),
+        )
+        if best == NOT_FOUND:
+            return None
+        self.hits[best] += 1
+        return self.rules[best]
+
+    def summary(self) -> str:
+        """
+        :return: rules with hits, one per line
+        """
+        return "\n".join(
+            f"{hits:7d} {rule.line:12} {rule.action} {rule.field} {rule.op} {rule.value}"
+            for rule, hits in zip(self.rules, self.hits) if hits
+        ) or "No rule hits"
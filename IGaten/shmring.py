@@ -0,0 +1,147 @@
+"""
+    Shared memory ring buffer from the ingest process to a child process
+    that does terminal output and logging (--render-process).
+    One writer, one reader. The writer never blocks: a record that does
+    not fit is dropped and counted as overrun.
+
+    Layout: header (write position, read position, closed flag), then
+    `size` bytes of records. Positions count bytes from the start and
+    only grow; each is stored by one side only (8 byte aligned).
+    Record: level, lengths of its text fields, then the UTF-8 fields.
+"""
+import time
+import struct
+from multiprocessing import shared_memory
+
+HEADER = struct.Struct("<QQQ")  # write pos, read pos, closed
+POS = struct.Struct("<Q")
+REC = struct.Struct("<BHHH")  # log level, length of the 3 fields
+MAX_FIELD = 0xffff  # bytes per field, longer fields are truncated
+
+
+class ShmRing:
+    """
+    Ring buffer of records with three text fields in shared memory
+    """
+
+    def __init__(self, size: int = 1 << 20, name: str = None):
+        """
+        :param size: bytes for records, creates a new buffer
+        :param name: name of an existing buffer to attach to (reader)
+        """
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=HEADER.size + size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0, 0)
+            self.owner = True
+        else:
+            # a child process started by multiprocessing shares the resource
+            # tracker of the writer, which unlinks the memory in release()
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+        self.size = self.shm.size - HEADER.size  # may be rounded up to pages
+        self.records = 0  # records written
+        self.overruns = 0  # records dropped, ring full
+
+    def put(self, level: int, *fields) -> bool:
+        """
+        Writer: appends one record, never blocks
+        :param level: log level
+        :param fields: three strings
+        :return: False if dropped (overrun)
+        """
+        data = [f.encode("utf-8", "replace")[:MAX_FIELD] for f in fields]
+        rec = REC.pack(level, *(len(d) for d in data)) + b"".join(data)
+        wpos, rpos, _ = HEADER.unpack_from(self.buf, 0)
+        if len(rec) > self.size - (wpos - rpos):
+            self.overruns += 1
+            return False
+        start = wpos % self.size
+        first = min(len(rec), self.size - start)
+        base = HEADER.size
+        self.buf[base + start:base + start + first] = rec[:first]
+        if first < len(rec):  # wraps around
+            self.buf[base:base + len(rec) - first] = rec[first:]
+        POS.pack_into(self.buf, 0, wpos + len(rec))  # publish
+        self.records += 1
+        return True
+
+    def read(self, pos: int, length: int) -> bytes:
+        start = pos % self.size
+        base = HEADER.size
+        if start + length <= self.size:
+            return bytes(self.buf[base + start:base + start + length])
+        first = self.size - start
+        return bytes(self.buf[base + start:base + self.size]) + \
+            bytes(self.buf[base:base + length - first])
+
+    def get(self) -> list:
+        """
+        Reader: takes all published records
+        :return: [(level, field, field, field)]
+        """
+        wpos, rpos, _ = HEADER.unpack_from(self.buf, 0)
+        records = []
+        while rpos < wpos:
+            level, *lengths = REC.unpack(self.read(rpos, REC.size))
+            data = self.read(rpos + REC.size, sum(lengths))
+            fields, start = [], 0
+            for length in lengths:
+                fields.append(data[start:start + length].decode("utf-8", "replace"))
+                start += length
+            records.append((level, *fields))
+            rpos += REC.size + sum(lengths)
+        POS.pack_into(self.buf, POS.size, rpos)  # free the space
+        return records
+
+    @property
+    def closed(self) -> bool:
+        return HEADER.unpack_from(self.buf, 0)[2] != 0
+
+    def consume(self, handle, poll: float = 0.02, alive=None):
+        """
+        Reader loop: calls handle(records) until the writer closed
+        the ring and all records are read, or the writer is gone
+        :param handle: handle(list of records)
+        :param poll: s to sleep when the ring is empty
+        :param alive: alive() -> False when the writer process ended without closing
+        """
+        while True:
+            closed = self.closed  # before get(), so nothing is missed
+            records = self.get()
+            if records:
+                handle(records)
+            elif closed or alive is not None and not alive():
+                return
+            else:
+                time.sleep(poll)
+
+    def pending(self) -> int:
+        """
+        :return: bytes written but not yet read
+        """
+        wpos, rpos, _ = HEADER.unpack_from(self.buf, 0)
+        return wpos - rpos
+
+    def close(self):
+        """
+        Writer: marks the ring closed, the reader stops when drained
+        """
+        POS.pack_into(self.buf, 2 * POS.size, 1)
+
+    def release(self):
+        """
+        Frees the shared memory, the writer also removes it
+        """
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def summary(self) -> str:
+        """
+        :return: records written and overruns
+        """
+        return f"{self.records} records, {self.overruns} overruns, " \
+               f"{self.pending()} bytes pending in {self.size // 1024} kB"
@@ -0,0 +1,301 @@
+"""
+    Yaesu radio simulator
+    Opens a pseudo terminal and writes frames in the two line format of
+    the FTM-400 / FT1D serial output at a given rate, so Ygate can run
+    unmodified with SERIAL set to the printed PTY name:
+
+        python -m IGaten.simulator --rate 50 --mix pos=50,mice=30,bad=20
+
+    Frame kinds (--mix, relative weights):
+        pos   position with or without time stamp
+        mice  Mic-E
+        msg   message, bulletin, query or third party
+        wx    weather report
+        bad   invalid bytes in routing or payload
+        sync  out of sync (payload line without header, broken header)
+"""
+import os
+import sys
+import tty
+import time
+import fcntl
+import random
+import argparse
+
+MIX = {"pos": 40, "mice": 25, "msg": 10, "wx": 10, "bad": 10, "sync": 5}
+CENTER = (14.12, 120.97)  # lat, lon of the simulated stations
+PATHS = ["WIDE1-1", "WIDE1-1,WIDE2-1", "DY1P*,WIDE2-1", "WIDE2-2", "DW1XYZ-1*,WIDE1*"]
+SYMBOLS = ["/>", "/-", "/#", "/k", "/[", "/_", "\\j", "/v"]
+
+
+def parse_mix(text: str) -> dict:
+    """
+    :param text: e.g. "pos=40,mice=20"
+    :return: {kind: weight}
+    """
+    mix = {}
+    for part in text.split(","):
+        kind, _, weight = part.partition("=")
+        if kind not in MIX or not weight.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid mix {part}, kinds: {', '.join(MIX)}")
+        mix[kind] = int(weight)
+    return mix
+
+
+def mic_e(lat: float, lon: float) -> tuple:
+    """
+    Mic-E encoding, north and east only
+    :param lat: latitude in degrees
+    :param lon: longitude in degrees
+    :return: destination call, info field bytes without symbol
+    """
+    l_deg, l_min = int(lat), (lat - int(lat)) * 60
+    digits = f"{l_deg:02d}{int(l_min):02d}{int(round((l_min % 1) * 100)) % 100:02d}"
+    offset = lon >= 100 or lon < 10
+    dest = "".join(
+        chr(ord("P") + int(d)) if i < 4 or (i == 4 and offset) else d
+        for i, d in enumerate(digits)
+    )
+    deg = int(lon)
+    mins = (lon - deg) * 60
+    if deg < 10:
+        d_byte = deg + 90
+    elif deg < 100:
+        d_byte = deg
+    elif deg < 110:
+        d_byte = deg - 100 + 80
+    else:
+        d_byte = deg - 100
+    m_byte = int(mins) + 60 if int(mins) < 10 else int(mins)
+    info = bytes([d_byte + 28, m_byte + 28, int(round((mins % 1) * 100)) % 100 + 28])
+    return dest, info
+
+
+class FrameGenerator:
+    """
+    Deterministic random Yaesu frames
+    """
+
+    def __init__(self, mix: dict = None, seed: int = None, stations: int = 200):
+        """
+        :param mix: {kind: weight}, default MIX
+        :param seed: random seed
+        :param stations: number of different calls
+        """
+        self.rnd = random.Random(seed)
+        mix = mix or MIX
+        self.kinds = [k for k in mix if mix[k] > 0]
+        self.weights = [mix[k] for k in self.kinds]
+        rnd = self.rnd
+        self.calls = [
+            f"{rnd.choice(['DU', 'DW', 'DV', 'DY', '4F'])}{rnd.randint(1, 9)}"
+            f"{''.join(rnd.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ') for _ in range(rnd.randint(1, 3)))}"
+            f"{rnd.choice(['', '', '-1', '-5', '-7', '-9', '-10', '-13'])}"
+            for _ in range(stations)
+        ]
+        self.count = dict.fromkeys(MIX, 0)  # frames per kind
+
+    def header(self, call: str, dest: str, path: str = None) -> bytes:
+        path = self.rnd.choice(PATHS) if path is None else path
+        return f"{call}>{dest},{path} [{time.strftime('%m/%d/%y %H:%M:%S')}] <UI>:\r\n".encode()
+
+    def position(self) -> tuple:
+        """
+        :return: random latitude, longitude near CENTER
+        """
+        return (CENTER[0] + self.rnd.uniform(-0.5, 0.5),
+                CENTER[1] + self.rnd.uniform(-0.5, 0.5))
+
+    def pos_text(self) -> str:
+        lat, lon = self.position()
+        symbol = self.rnd.choice(SYMBOLS)
+        return f"{int(lat):02d}{(lat % 1) * 60:05.2f}N{symbol[0]}" \
+               f"{int(lon):03d}{(lon % 1) * 60:05.2f}E{symbol[1]}"
+
+    def frame(self) -> bytes:
+        """
+        :return: one frame (header and payload line, or one broken line)
+        """
+        rnd = self.rnd
+        kind = rnd.choices(self.kinds, self.weights)[0]
+        self.count[kind] += 1
+        call = rnd.choice(self.calls)
+        if kind == "pos":
+            if rnd.random() < 0.5:
+                pld = f"!{self.pos_text()}PHG2360 digi"
+            else:
+                pld = f"@{time.strftime('%d%H%Mz')}{self.pos_text()}/A=000{rnd.randint(100, 999)}"
+            return self.header(call, rnd.choice(["APRS", "APDR15", "APWW10"])) + \
+                pld.encode() + b"\r\n"
+        if kind == "mice":
+            dest, info = mic_e(*self.position())
+            crs = rnd.randint(0, 359)
+            spd = rnd.randint(0, 99)
+            spd_crs = bytes([spd // 10 + 28, spd % 10 * 10 + crs // 100 + 28, crs % 100 + 28])
+            return self.header(call, dest) + rnd.choice(b"`'").to_bytes(1, "big") + info + \
+                spd_crs + b">/`\"4T}FTM-400 " + str(rnd.randint(1, 99)).encode() + b"_%\r\n"
+        if kind == "msg":
+            to_call = rnd.choice(self.calls)
+            pld = rnd.choice([
+                f":{to_call:9}:hello {rnd.randint(1, 999)}{{{rnd.randint(1, 99):02d}",
+                f":{to_call:9}:ack{rnd.randint(1, 99):02d}",
+                f":BLN{rnd.randint(1, 9)}     :Net tonight 2000h 145.000",
+                "?APRS?",
+                f"}}{to_call}>APWW10,TCPIP,{call}*:>status via third party",
+            ])
+            return self.header(call, "APRS") + pld.encode() + b"\r\n"
+        if kind == "wx":
+            pld = f"@{time.strftime('%d%H%Mz')}{self.pos_text()[:-1]}_" \
+                  f"{rnd.randint(0, 359):03d}/{rnd.randint(0, 30):03d}g{rnd.randint(0, 40):03d}" \
+                  f"t{rnd.randint(70, 99):03d}r000p000P000h{rnd.randint(40, 99):02d}" \
+                  f"b{rnd.randint(9950, 10150):05d}"
+            return self.header(call, "APRS") + pld.encode() + b"\r\n"
+        if kind == "bad":
+            if rnd.random() < 0.5:  # invalid bytes in routing
+                return f"{call}>AP".encode() + bytes([rnd.randint(0x80, 0xff)]) + \
+                    f"RS,WIDE1-1 [{time.strftime('%m/%d/%y %H:%M:%S')}] <UI>:\r\n".encode() + \
+                    b">noise\r\n"
+            return self.header(call, "APRS") + b">status \xb0 with \xe4 invalid " + \
+                bytes([rnd.randint(0x80, 0xff)]) + b" bytes\r\n"
+        # out of sync: payload without header or garbage header
+        if rnd.random() < 0.5:
+            return f"!{self.pos_text()} lost header\r\n".encode()
+        return b"\xff\xfe garbage " + bytes([rnd.randint(0x80, 0xff)]) + b"\r\n"
+
+
+class Simulator:
+    """
+    Pseudo terminal fed with generated frames at a fixed rate.
+    Frames are written non-blocking; when Ygate does not read fast
+    enough, frames are dropped and counted like a serial overrun.
+    """
+
+    MAX_PENDING = 65536  # bytes buffered before frames are dropped
+    DRAIN = 2.0  # s to write buffered frames at the end of run()
+
+    def __init__(self, generator: FrameGenerator, rate: float = 10.0, link: str = None):
+        """
+        :param generator: FrameGenerator
+        :param rate: frames per sec
+        :param link: optional symlink to the PTY, e.g. /tmp/ftm400
+        """
+        self.gen = generator
+        self.rate = rate
+        self.master, self.slave = os.openpty()
+        tty.setraw(self.slave)  # no echo, no CR/LF translation
+        flags = fcntl.fcntl(self.master, fcntl.F_GETFL)
+        fcntl.fcntl(self.master, fcntl.F_SETFL, flags | os.O_NONBLOCK)
+        self.port = os.ttyname(self.slave)
+        self.link = link
+        if link:
+            if os.path.islink(link):
+                os.unlink(link)
+            os.symlink(self.port, link)
+        self.pending = bytearray()
+        self.sent = 0  # frames generated and buffered
+        self.dropped = 0  # frames dropped, reader too slow
+        self.running = False
+
+    def write(self, data: bytes, frames: int):
+        """
+        Buffers frames and writes as much as the PTY takes
+        :param data: frames
+        :param frames: number of frames in data
+        """
+        if len(self.pending) > self.MAX_PENDING:
+            self.dropped += frames
+        else:
+            self.pending += data
+            self.sent += frames
+        try:
+            written = os.write(self.master, self.pending)
+            del self.pending[:written]
+        except BlockingIOError:
+            pass
+
+    def run(self, count: int = None, duration: float = None):
+        """
+        Writes frames until count frames or duration sec or stop()
+        :param count: number of frames, None: unlimited
+        :param duration: s, None: unlimited
+        """
+        self.running = True
+        start = time.monotonic()
+        total = 0
+        while self.running:
+            now = time.monotonic()
+            if duration is not None and now - start >= duration:
+                break
+            due = int((now - start) * self.rate) + 1
+            if count is not None:
+                due = min(due, count)
+            if due > total:
+                frames = [self.gen.frame() for _ in range(due - total)]
+                self.write(b"".join(frames), len(frames))
+                total = due
+            elif count is not None and total >= count:
+                break
+            elif self.pending:
+                self.write(b"", 0)
+            time.sleep(min(max(start + total / self.rate - time.monotonic(), 0.001), 0.05))
+        end = time.monotonic() + self.DRAIN
+        while self.pending and time.monotonic() < end:
+            self.write(b"", 0)
+            time.sleep(0.01)
+        self.running = False
+
+    def stop(self):
+        """
+        Stops run()
+        """
+        self.running = False
+
+    def close(self):
+        """
+        Closes the PTY and removes the link
+        """
+        if self.link and os.path.islink(self.link):
+            os.unlink(self.link)
+        os.close(self.master)
+        os.close(self.slave)
+
+    def summary(self) -> str:
+        """
+        :return: frames sent and dropped, per kind
+        """
+        kinds = ", ".join(f"{k} {n}" for k, n in self.gen.count.items() if n)
+        unsent = f", {len(self.pending)} bytes not read" if self.pending else ""
+        return f"{self.sent} frames sent, {self.dropped} dropped{unsent} ({kinds})"
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entry
+    :return: exit code
+    """
+    parser = argparse.ArgumentParser(description="Yaesu radio simulator on a PTY")
+    parser.add_argument("--rate", type=float, default=1.0, help="frames per sec")
+    parser.add_argument("--mix", type=parse_mix, default=MIX,
+                        help="relative weights, e.g. pos=40,mice=25,msg=10,wx=10,bad=10,sync=5")
+    parser.add_argument("--count", type=int, default=None, help="frames, default unlimited")
+    parser.add_argument("--duration", type=float, default=None, help="s, default unlimited")
+    parser.add_argument("--stations", type=int, default=200, help="number of calls")
+    parser.add_argument("--seed", type=int, default=None, help="random seed")
+    parser.add_argument("--link", default=None, help="symlink to the PTY, e.g. /tmp/ftm400")
+    opt = parser.parse_args(argv)
+
+    sim = Simulator(FrameGenerator(opt.mix, opt.seed, opt.stations), opt.rate, opt.link)
+    print(f"Serial port {sim.port}" + (f" ({opt.link})" if opt.link else "") +
+          f", {opt.rate:g} frames/s; set Ygate.SERIAL to it, Ctrl C to stop")
+    sys.stdout.flush()
+    try:
+        sim.run(opt.count, opt.duration)
+    except KeyboardInterrupt:
+        pass
+    print(sim.summary())
+    sim.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
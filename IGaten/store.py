@@ -0,0 +1,138 @@
+"""
+    Persistent heard stations and statistics (SQLite)
+    Updates are collected in memory and written in one transaction
+    per flush, never per packet.
+"""
+import time
+import sqlite3
+import threading
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS heard (
+    call TEXT PRIMARY KEY, first REAL, last REAL, count INTEGER
+);
+CREATE TABLE IF NOT EXISTS hourly (
+    hour INTEGER PRIMARY KEY, gated INTEGER, not_gated INTEGER, invalid INTEGER
+);
+"""
+
+
+class StatStore:
+    """
+    Heard stations and hourly gated/not gated/invalid counters
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: database file, ":memory:" for tests
+        """
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.heard = {}  # call -> [first, last, count] since last flush
+        self.last = [0, 0, 0]  # pstat counters at last flush
+        self.flushes = 0
+
+    def first_start(self, now: float = None) -> float:
+        """
+        Time stamp of the first start, stored on first use
+        :param now: time stamp to store if none yet
+        :return: time stamp
+        """
+        row = self.db.execute("SELECT value FROM meta WHERE key='first_start'").fetchone()
+        if row:
+            return float(row[0])
+        now = time.time() if now is None else now
+        with self.db:
+            self.db.execute("INSERT INTO meta VALUES ('first_start', ?)", (repr(now),))
+        return now
+
+    def load(self, pstat: list, calls: int = -1) -> list:
+        """
+        Adds the stored totals to the pstat counters
+        :param pstat: Ygate.pstat
+        :param calls: max. number of calls, the most recent ones; -1 all
+        :return: stored heard calls, least recent first as heard
+        """
+        row = self.db.execute(
+            "SELECT TOTAL(gated), TOTAL(not_gated), TOTAL(invalid) FROM hourly"
+        ).fetchone()
+        with self.lock:
+            self.last = [int(total) for total in row]
+            for i in range(3):
+                pstat[i] += self.last[i]
+        return [r[0] for r in self.db.execute(
+            "SELECT call FROM (SELECT call, last FROM heard ORDER BY last DESC LIMIT ?) "
+            "ORDER BY last", (calls,)
+        )]
+
+    def sink(self, pkt):
+        """
+        Packet sink for Ygate.add_sink(), remembers heard stations
+        :param pkt: Packet, ignored without a valid call
+        """
+        if not pkt.call or pkt.msg == "Invalid routing":
+            return
+        with self.lock:  # flush() swaps self.heard
+            entry = self.heard.get(pkt.call)
+            if entry is None:
+                self.heard[pkt.call] = [pkt.time, pkt.time, 1]
+            else:
+                entry[1] = pkt.time
+                entry[2] += 1
+
+    def flush(self, pstat: list, now: float = None):
+        """
+        Writes heard stations and counter increments since the last flush
+        to the current hour in one transaction
+        :param pstat: Ygate.pstat
+        :param now: time stamp (default time.time())
+        """
+        now = time.time() if now is None else now
+        with self.lock:
+            heard, self.heard = self.heard, {}
+            cur = pstat[:3]  # one snapshot, the main thread keeps counting
+            delta = [cur[i] - self.last[i] for i in range(3)]
+            self.last = cur
+            with self.db:
+                if any(delta):
+                    self.db.execute(
+                        "INSERT INTO hourly VALUES (?, ?, ?, ?) ON CONFLICT(hour) DO UPDATE SET "
+                        "gated=gated+excluded.gated, not_gated=not_gated+excluded.not_gated, "
+                        "invalid=invalid+excluded.invalid",
+                        (int(now // 3600), *delta)
+                    )
+                self.db.executemany(
+                    "INSERT INTO heard VALUES (?, ?, ?, ?) ON CONFLICT(call) DO UPDATE SET "
+                    "last=excluded.last, count=count+excluded.count",
+                    ((call, *entry) for call, entry in heard.items())
+                )
+            self.flushes += 1
+
+    def stations(self, num: int = 20) -> list:
+        """
+        :param num: number of stations
+        :return: (call, first, last, count) most recently heard first
+        """
+        return self.db.execute(
+            "SELECT call, first, last, count FROM heard ORDER BY last DESC LIMIT ?", (num,)
+        ).fetchall()
+
+    def hours(self, since: float) -> list:
+        """
+        :param since: time stamp
+        :return: (hour start time stamp, gated, not gated, invalid) since
+        """
+        return [
+            (r[0] * 3600, r[1], r[2], r[3]) for r in self.db.execute(
+                "SELECT * FROM hourly WHERE hour >= ? ORDER BY hour", (int(since // 3600),)
+            )
+        ]
+
+    def close(self):
+        """
+        Closes the database
+        """
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,122 @@
+"""
+    Flood protection for the uplink
+    Token bucket per source station plus a global bucket
+"""
+import time
+from collections import OrderedDict
+
+
+class Bucket:
+    """
+    Token bucket of one station, one per heard station
+    """
+    __slots__ = ("tokens", "last", "packets", "throttled")
+
+    def __init__(self, tokens: float, last: float):
+        self.tokens = tokens
+        self.last = last  # time of last refill
+        self.packets = 0
+        self.throttled = 0
+
+
+class TokenBuckets:
+    """
+    Per station token buckets with a global ceiling. The table keeps
+    the MAX_STATIONS most recently heard stations, the least recently
+    heard one is evicted.
+    """
+
+    def __init__(
+            self,
+            rate: float = 0.2,
+            burst: float = 10.,
+            g_rate: float = 10.,
+            g_burst: float = 50.,
+            max_stations: int = 2000,
+            clock=time.monotonic
+    ):
+        """
+        :param rate: tokens per second per station
+        :param burst: bucket size per station
+        :param g_rate: tokens per second for all stations
+        :param g_burst: global bucket size
+        :param max_stations: stations kept in the table
+        :param clock: time source in seconds
+        """
+        self.rate = rate
+        self.burst = burst
+        self.g_rate = g_rate
+        self.g_burst = g_burst
+        self.max_stations = max_stations
+        self.clock = clock
+        self.g_tokens = g_burst
+        self.g_last = clock()
+        self.buckets = OrderedDict()  # call -> Bucket
+        self.throttled = 0  # station limit
+        self.g_throttled = 0  # global limit
+
+    def allow(self, call: str) -> str:
+        """
+        Takes a token for call from its bucket and the global bucket
+        :param call: source call sign
+        :return: "" if allowed, "station" or "global" if throttled
+        """
+        now = self.clock()
+        bucket = self.buckets.get(call)
+        if bucket is None:
+            bucket = Bucket(self.burst, now)
+            self.buckets[call] = bucket
+            if len(self.buckets) > self.max_stations:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(call)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.last) * self.rate)
+            bucket.last = now
+        bucket.packets += 1
+        self.g_tokens = min(self.g_burst, self.g_tokens + (now - self.g_last) * self.g_rate)
+        self.g_last = now
+        if bucket.tokens < 1.:
+            bucket.throttled += 1
+            self.throttled += 1
+            return "station"
+        if self.g_tokens < 1.:
+            bucket.throttled += 1
+            self.g_throttled += 1
+            return "global"
+        bucket.tokens -= 1.
+        self.g_tokens -= 1.
+        return ""
+
+    def filter(self, pkt) -> str:
+        """
+        Packet filter for Ygate.add_filter()
+        :param pkt: Packet
+        :return: reason if throttled, "" otherwise
+        """
+        limit = self.allow(pkt.call)
+        if limit == "station":
+            return "Flood, not gated"
+        if limit == "global":
+            return "Uplink limit, not gated"
+        return ""
+
+    def top(self, num: int = 5) -> list:
+        """
+        Stations in the table with most packets
+        :param num: number of stations
+        :return: list of (call, packets, throttled)
+        """
+        return sorted(
+            ((call, b.packets, b.throttled) for call, b in self.buckets.items()),
+            key=lambda t: (t[1], t[2]), reverse=True
+        )[:num]
+
+    def summary(self) -> str:
+        """
+        :return: one line with throttle counts and top talkers
+        """
+        top = ", ".join(f"{c} {n}/{t}" for c, n, t in self.top())
+        return (
+            f"Throttled: {self.throttled} station, {self.g_throttled} global; "
+            f"top talkers (pkts/throttled): {top}"
+        )
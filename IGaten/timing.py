@@ -0,0 +1,105 @@
+"""
+    Per stage timing and on demand profiling of the packet loop
+"""
+import io
+import time
+import pstats
+import cProfile
+import logging
+from collections import deque
+
+
+class StageTimer:
+    """
+    Rolling durations of the stages of one loop iteration.
+    mark() starts an iteration, stop(stage) records the time
+    since the previous mark or stop, one perf_counter call each.
+    """
+
+    WINDOW = 1000  # samples kept per stage
+
+    def __init__(self, stages: tuple):
+        """
+        :param stages: stage names in display order
+        """
+        self.stages = stages
+        self.samples = {stage: deque(maxlen=self.WINDOW) for stage in stages}
+        self.last = time.perf_counter()
+
+    def mark(self):
+        """
+        Starts timing a new iteration
+        """
+        self.last = time.perf_counter()
+
+    def stop(self, stage: str):
+        """
+        Records the duration of stage and starts the next one
+        :param stage: stage name
+        """
+        now = time.perf_counter()
+        self.samples[stage].append(now - self.last)
+        self.last = now
+
+    def summary(self) -> dict:
+        """
+        :return: {stage: (samples, min, median, p99)} in seconds
+        """
+        result = {}
+        for stage in self.stages:
+            smp = sorted(self.samples[stage])
+            if smp:
+                result[stage] = (
+                    len(smp), smp[0], smp[len(smp) // 2],
+                    smp[min(len(smp) - 1, int(len(smp) * 0.99))]
+                )
+        return result
+
+    def report(self) -> str:
+        """
+        :return: summary as text table, times in ms
+        """
+        lines = [f"{'stage':8} {'n':>6} {'min':>9} {'median':>9} {'p99':>9}"]
+        for stage, (num, t_min, t_med, t_99) in self.summary().items():
+            lines.append(
+                f"{stage:8} {num:6d} {t_min * 1e3:9.3f} "
+                f"{t_med * 1e3:9.3f} {t_99 * 1e3:9.3f}"
+            )
+        return "\n".join(lines)
+
+
+class Profiler:
+    """
+    cProfile session switched on and off at run time
+    """
+
+    PROF_FILE = "ygate.prof"
+    TOP = 25  # functions in the logged report
+
+    def __init__(self):
+        self.prof = None
+
+    @property
+    def active(self) -> bool:
+        """
+        :return: True while profiling
+        """
+        return self.prof is not None
+
+    def toggle(self) -> str:
+        """
+        Starts a profile, or stops it and writes the results
+        to PROF_FILE and the log
+        :return: status message
+        """
+        if self.prof is None:
+            self.prof = cProfile.Profile()
+            self.prof.enable()
+            return "Profiling started"
+        self.prof.disable()
+        self.prof.dump_stats(self.PROF_FILE)
+        out = io.StringIO()
+        pstats.Stats(self.prof, stream=out).sort_stats("cumulative").print_stats(self.TOP)
+        logging.info("Profile:\n%s", out.getvalue())
+        self.prof = None
+        return f"Profiling stopped, written to {self.PROF_FILE}"
@@ -0,0 +1,148 @@
+"""
+    Stall watchdog
+    Components (serial reader, uplink writer, timers) send heartbeats;
+    a component without heartbeat for longer than its budget is stalled.
+    The watchdog then calls its recover function, or, if there is none
+    or it keeps stalling, logs a diagnostic with the stack of the stuck
+    thread and exits with STALL_EXIT so a supervisor can restart the IGate.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+import traceback
+
+STALL_EXIT = 70  # exit code after an unrecoverable stall (EX_SOFTWARE)
+
+
+class Component:
+    """
+    Watched component
+    """
+
+    def __init__(self, budget: float, recover, now: float):
+        self.budget = budget  # s allowed between heartbeats
+        self.recover = recover  # recover() -> True if recovered, None: exit
+        self.last = now  # time of last heartbeat
+        self.thread = None  # ident of the thread of the last heartbeat
+        self.stalls = 0  # stalls in a row
+        self.recovered = 0  # recoveries in total
+
+
+class Watchdog:
+    """
+    Checks the heartbeats of the registered components every CHECK sec
+    """
+
+    MAX_RECOVER = 3  # stalls in a row before giving up
+
+    def __init__(self, check: float = 10.0, clock=time.monotonic, exit_func=os._exit):
+        """
+        :param check: s between checks
+        :param clock: time source in seconds
+        :param exit_func: called with STALL_EXIT
+        """
+        self.check_every = check
+        self.clock = clock
+        self.exit_func = exit_func
+        self.components = {}  # name -> Component
+        self.running = False
+        self.event = threading.Event()  # set by stop()
+
+    def register(self, name: str, budget: float, recover=None):
+        """
+        :param name: component name, used with beat()
+        :param budget: s allowed between heartbeats
+        :param recover: recover() -> True if recovered, None: exit on stall
+        """
+        self.components[name] = Component(budget, recover, self.clock())
+
+    def beat(self, name: str):
+        """
+        Heartbeat of a component, cheap enough for every loop
+        :param name: component name
+        """
+        comp = self.components.get(name)
+        if comp is not None:
+            comp.last = self.clock()
+            comp.thread = threading.get_ident()
+
+    def start(self):
+        """
+        Starts the watchdog thread
+        """
+        self.running = True
+        threading.Thread(target=self.run, name="watchdog", daemon=True).start()
+
+    def stop(self):
+        """
+        Stops the watchdog thread
+        """
+        self.running = False
+        self.event.set()
+
+    def run(self):
+        """
+        Watchdog thread
+        """
+        while self.running and not self.event.wait(self.check_every):
+            self.check()
+
+    def diagnostic(self, name: str, age: float) -> str:
+        """
+        :param name: stalled component
+        :param age: s since its last heartbeat
+        :return: message with the stack of the component's thread
+        """
+        comp = self.components[name]
+        txt = f"Watchdog: {name} stalled, no heartbeat for {age:.0f} s " \
+              f"(budget {comp.budget:.0f} s)"
+        frame = sys._current_frames().get(comp.thread) if comp.thread else None
+        if frame is not None:
+            txt += "\n" + "".join(traceback.format_stack(frame)).rstrip()
+        return txt
+
+    def check(self) -> list:
+        """
+        Recovers stalled components or exits
+        :return: names of stalled components
+        """
+        now = self.clock()
+        stalled = []
+        for name, comp in list(self.components.items()):
+            age = now - comp.last
+            if age <= comp.budget:
+                comp.stalls = 0
+                continue
+            stalled.append(name)
+            comp.stalls += 1
+            diag = self.diagnostic(name, age)
+            if comp.recover is not None and comp.stalls <= self.MAX_RECOVER:
+                logging.error("%s\nRecovering %s", diag, name)
+                try:
+                    ok = comp.recover()
+                except Exception as err:  # recovery must not kill the watchdog
+                    logging.error("Watchdog: recovering %s failed: %s", name, err)
+                    ok = False
+                if ok:
+                    comp.recovered += 1
+                    comp.last = now  # grace period of one budget
+                    continue
+            logging.critical("%s\nExiting with code %d", diag, STALL_EXIT)
+            sys.stderr.write(f"{diag}\nExiting with code {STALL_EXIT}\n")
+            sys.stderr.flush()
+            self.exit_func(STALL_EXIT)
+            return stalled
+        return stalled
+
+    def summary(self) -> str:
+        """
+        :return: one line per component with age of the last heartbeat
+        """
+        now = self.clock()
+        return "\n".join(
+            f"{name:8} last beat {now - comp.last:7.1f} s ago, budget {comp.budget:.0f} s, "
+            f"recovered {comp.recovered}"
+            for name, comp in self.components.items()
+        )
@@ -23,9 +23,20 @@ import time
 import math
 import textwrap
 import logging
+import argparse
+import functools
 from collections import namedtuple
 import serial
-import requests
+from .aprsis import LineStream, IsStats, server_lag
+from .capture import CaptureWriter
+from .timing import StageTimer, Profiler
+from .fanout import FanoutServer
+from .kiss import FEND, kiss_unescape, decode_ax25
+from .throttle import TokenBuckets
+from .rules import Rules
+from .rolling import RollingStats
+from .watchdog import Watchdog
+from .outbound import Outbound
 
 Col = namedtuple(
     'color',
@@ -67,6 +78,34 @@ APRS_DATA_TYPE = {  # data types for received payload
     "{": "USER"   # 7B User-Defined APRS packet format
 }
 
+# Received RF frame as passed to filters and sinks
+Packet = namedtuple(
+    "Packet",
+    ["time",  # time stamp time.time()
+     "call",  # source call sign with SSID
+     "routing",  # TNC2 header without ":", e.g. "DU1KG-1>APRS,WIDE1-1"
+     "payload",  # payload, non ascii bytes shown as \xnn
+     "raw",  # payload bytes as received
+     "data_type",  # APRS data type, see APRS_DATA_TYPE
+     "gated",  # True if sent to APRS-IS
+     "msg"]  # reason if not gated
+)
+
+# not gated reasons of packets that left the outbound queue unsent
+UPLINK_FAIL = {
+    "failed": "No network/internet, not gated",
+    "dropped": "Uplink queue full, not gated",
+    "expired": "Uplink queue timeout, not gated",
+    "stopped": "Gate stopped, not gated",
+}
+
+ANSI = re.compile(r"\033\[[\d;]*m")
+CALL = re.compile(r"\d?[A-Z]{1,2}\d{1,4}[A-Z]{1,4}")  # normal call sign
+ALIAS = re.compile(r"([A-Z\d]{4,7})(-\d{1,2})?")  # alias or special call
+FULL_CALL = re.compile(
+    r":?((\d?[A-Z]{1,2}\d{1,4}[A-Z]{1,4})-?\d{0,2}) {0,6}[>:]?"
+)  # ":CALL-NN  : or CALL-NN>
+
 # Message types for MIC-E encoded frames
 MSG_TYP = {"std": 0, "cst": 1}
 MSG_ID = {
@@ -181,13 +220,25 @@ def decode_ascii(b_str) -> tuple:
     return inv_byt, str_dec
 
 
-def is_internet(url: str = "http://www.google.com/", timeout: int = 30) -> bool:
+def is_internet(url: str = "http://www.google.com/", timeout: int = 30, lean: bool = False) -> bool:
     """
     Is there an internet connection
     :param url: String pointing to a URL
     :param timeout: How long we wait in seconds
+    :param lean: only connect to the web server, without loading requests
     :return: true when internet available
     """
+    if lean:
+        host, _, port = url.split("/")[2].partition(":")
+        try:
+            socket.create_connection(
+                (host, int(port) if port else 443 if url.startswith("https") else 80), timeout
+            ).close()
+            return True
+        except OSError as err:
+            logging.warning("Internet connection failed: %s", err)
+            return False
+    import requests  # about 15 MB, only needed here
     try:
         req = requests.get(url, timeout=timeout)
         # HTTP errors are not raised by default, this statement does that
@@ -204,6 +255,24 @@ def is_internet(url: str = "http://www.google.com/", timeout: int = 30) -> bool:
         return False
 
 
+def rss_mb() -> float:
+    """
+    :return: resident memory of this process in MB (peak where
+             /proc is missing), 0. if unknown
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1048576
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return 0.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1048576 if sys.platform == "darwin" else 1024)
+
+
 def cnv_ch(o_chr: chr) -> chr:
     """
     Character decoding for MIC-E destination field
@@ -320,16 +389,121 @@ def mic_e_decode(route: str, m_i: bytes) -> str:
     return decoded
 
 
+def wrap_text(text: str) -> str:
+    """
+    Wraps text, continuation lines indented
+    :param text: input string
+    :return: wrapped string
+    """
+    lines = textwrap.wrap(text, WRAP)
+    return "\n".join(lines[:1] + [16 * " " + line for line in lines[1:]])
+
+
+def parse_options(argv: list = None) -> argparse.Namespace:
+    """
+    Parses the command line once at start up
+    :param argv: arguments, default sys.argv[1:]
+    :return: options
+    """
+    parser = argparse.ArgumentParser(prog="IGaten", description="Yaesu APRS IGate")
+    parser.add_argument(
+        "-d", dest="mic_e", action="store_true", help="show decoded Mic-E info"
+    )
+    parser.add_argument(
+        "-i", dest="show_is", action="store_true", help="show frames received from APRS-IS"
+    )
+    parser.add_argument(
+        "--kiss", action="store_true",
+        help="serial port is a KISS TNC (AX.25) instead of Yaesu text output"
+    )
+    parser.add_argument(
+        "--fanout", metavar="PORT", type=int, default=0,
+        help="serve received frames to local APRS-IS clients on TCP PORT"
+    )
+    parser.add_argument(
+        "--dashboard", metavar="PORT", type=int, default=0,
+        help="serve a live web dashboard on HTTP PORT"
+    )
+    parser.add_argument(
+        "--cluster", metavar="NODE", default="",
+        help="coordinate gating with other IGates, NODE is a unique name"
+    )
+    parser.add_argument(
+        "--cluster-port", metavar="PORT", type=int, default=14590,
+        help="UDP port for --cluster"
+    )
+    parser.add_argument(
+        "--peers", metavar="HOST:PORT,...", type=peer_list, default=None,
+        help="unicast cluster peers instead of multicast"
+    )
+    parser.add_argument(
+        "--render-process", action="store_true",
+        help="print and log received frames in a child process"
+    )
+    parser.add_argument(
+        "--lean", action="store_true",
+        help="low memory profile for small boards, see RSS_BUDGET"
+    )
+    return parser.parse_args(argv)
+
+
+def peer_list(text: str) -> list:
+    """
+    :param text: comma separated HOST:PORT
+    :return: list of (host, port)
+    """
+    peers = []
+    for peer in text.split(","):
+        host, _, port = peer.strip().rpartition(":")
+        if not host or not port.isdigit():
+            raise argparse.ArgumentTypeError(f"invalid peer {peer}")
+        peers.append((host, int(port)))
+    return peers
+
+
 def print_wrap(text: str):
     """
     Prints test wrapped and indented
     :param text: input string
     :return:
     """
-    lines = textwrap.wrap(text, WRAP)
-    print(lines.pop(0))
-    for line in lines:
-        print(textwrap.indent(line, 16 * " "))
+    print(wrap_text(text))
+
+
+def render_records(records: list):
+    """
+    Prints and logs frame records from the ingest process
+    :param records: [(log level, terminal text, log message, Mic-E info)]
+    """
+    for level, text, log, mic_e in records:
+        if text:
+            print_wrap(text)
+        if mic_e:
+            print(16 * " " + mic_e)
+        if log:
+            logging.log(level, "%s", log)
+            if mic_e:
+                logging.info("       %s", mic_e)
+    sys.stdout.flush()
+
+
+def render_process(name: str, log_file: str):
+    """
+    Child process of --render-process, runs until the ring is closed
+    or the parent is gone (killed, SIGTERM)
+    :param name: shared memory name of the ShmRing
+    :param log_file: log file of the IGate
+    """
+    import multiprocessing
+    from .shmring import ShmRing
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent handles Ctrl C
+    logging.basicConfig(filename=log_file, level=logging.INFO, format='%(asctime)s %(message)s')
+    parent = multiprocessing.parent_process()
+    ring = ShmRing(name=name)
+    try:
+        ring.consume(render_records, alive=parent.is_alive if parent else None)
+    finally:
+        ring.release()
 
 
 class Ygate:
@@ -341,6 +515,8 @@ class Ygate:
     RANGE = 150  # Range filter for APRS-IS in km
     SERIAL = "/dev/ttyUSB0"
     BAUD = 9600
+    SERIAL_TIMEOUT = 5.0  # s, serial reads return to the loop at least this often
+    SOCKET_TIMEOUT = 60.0  # s for APRS-IS connect, login, send and receive
     BCNTXT = "IGate RF-IS 144.1 - 73"
     STATUS_TXT = "IGate is up - RF-IS for FTM-400: https://github.com/9V1KG/Igate-n"
     HOST = "rotate.aprs2.net"
@@ -349,8 +525,27 @@ class Ygate:
     BEACON = 1200.0  # beacon every 20 min
     FORMAT = "ascii"  # APRS uses ASCII
     VERS = "APZ031"  # Software experimental vers 0.31.0
-    SPECIAL_CALLS = ["USNAP1", "PSAT", "PCSAT", "AISAT"]
+    RULES_FILE = None  # site gating rules, see rules.py, evaluated before the built-in rules
     LOG_FILE = "ygate.log"
+    LAG_WARN = 30.0  # warn when APRS-IS stream is more than LAG_WARN s behind
+    CAPTURE_FILE = None  # binary capture of raw serial frames, None: off
+    FANOUT_HOST = ""  # interface for --fanout, "" all, "127.0.0.1" local only
+    DASHBOARD_HOST = ""  # interface for --dashboard
+    STATION_RATE = 0.2  # flood protection: packets/s per station, 0: off
+    STATION_BURST = 10  # packets per station in a burst
+    UPLINK_RATE = 10.0  # packets/s for all stations
+    UPLINK_BURST = 50  # packets for all stations in a burst
+    MAX_STATIONS = 2000  # stations tracked for flood protection
+    STORE_FILE = None  # SQLite file for heard stations and statistics, None: off
+    STORE_FLUSH = 60.0  # write to STORE_FILE every STORE_FLUSH sec
+    WATCHDOG_CHECK = 10.0  # s between watchdog checks, 0: off
+    WATCHDOG_SERIAL = 120.0  # s without serial read loop progress: exit
+    WATCHDOG_UPLINK = 300.0  # s without uplink progress: reconnect
+    WATCHDOG_SLACK = 120.0  # s a beacon or status timer may be late: restart it
+    CLUSTER_GROUP = "239.77.71.1"  # multicast group for --cluster without --peers
+    RENDER_RING = 1 << 20  # bytes of the --render-process ring buffer
+    RSS_BUDGET = 32.0  # MB resident memory with --lean, exceeding it is logged
+    LEAN_CALLS = 1000  # unique calls kept with --lean, the oldest is dropped
 
     def __init__(
             self,
@@ -360,6 +555,7 @@ class Ygate:
             latitude: tuple = (14, 7.09, "N"),
             longitude: tuple = (120, 58.07, "E"),
             altitude: tuple = (0.0, "m"),
+            options: argparse.Namespace = None,
     ):
         """
         :param user:   Your call sign
@@ -368,6 +564,7 @@ class Ygate:
         :param latitude:   Latitude
         :param longitude:  Longitude
         :param altitude:   Altitude in ft or m, 0. if no altitude
+        :param options:    Parsed command line, see parse_options()
         """
         User = namedtuple("User", ["my_call", "ssid", "secret", "pos"])
 
@@ -385,6 +582,7 @@ class Ygate:
         pstat[3] list of unique calls
         """
         self.pstat = [0, 0, 0, []]
+        self.drops = {}  # not gated count per reason
 
         logging.basicConfig(  # logging
             filename=self.LOG_FILE,
@@ -396,22 +594,120 @@ class Ygate:
         self.msg = ""  # Status messages
         self.ser = None
         self.sck = None
-        self.sock_file = None
+        self.is_stream = None  # line stream of APRS-IS connection
+        self.is_stat = IsStats()  # frames received from APRS-IS
+        self.capture = None  # CaptureWriter if CAPTURE_FILE is set
+        self.timer = StageTimer(("read", "decode", "classify", "gate", "render", "log"))
+        self.profiler = Profiler()  # toggled with SIGUSR1
+        self.opt = options if options is not None else parse_options([])
+        self.is_ui = re.compile(r" \[.*\] <UI.*>:")  # Yaesu header
+        self.filters = []  # called before gating, see add_filter()
+        self.sinks = []  # called for each frame, see add_sink()
+        self.fanout = None  # FanoutServer with --fanout
+        self.store = None  # StatStore if STORE_FILE is set
+        self.cluster = None  # Cluster with --cluster
+        self.dashboard = None  # Dashboard with --dashboard
+        self.render = None  # ShmRing to the child process with --render-process
+        self.render_proc = None
+        self.render_summary = ""  # ring statistics after stop_render()
+        self.usr1_pending = False  # set by SIGUSR1, see usr1_dump()
+        self.exit_pending = False  # set by Ctrl C, the read loop exits
+        self.watchdog = Watchdog(  # heartbeats, see start_watchdog()
+            self.WATCHDOG_CHECK, exit_func=self.stall_exit
+        )
+        self.outbound = Outbound(  # queue to APRS-IS, see uplink()
+            self.uplink, beat=functools.partial(self.watchdog.beat, "uplink"),
+            done=self.uplink_done
+        )
+        self.timers = {}  # pending timer per function, see schedule()
+        self.con_lock = threading.Lock()  # serializes reconnects
+        self.stopped = False  # no more timers after stop_timers()
+        self.rules = self.load_rules()  # gating rules, see check_routing()
+        self.rolling = RollingStats(  # frames per data type and top stations
+            sorted(set(APRS_DATA_TYPE.values())) + ["BLN ", "NONE", "INV "]
+        )
+        self.add_sink(self.rolling.sink)
+        self.throttle = None  # flood protection
+        if self.STATION_RATE > 0:
+            self.throttle = TokenBuckets(
+                self.STATION_RATE, self.STATION_BURST,
+                self.UPLINK_RATE, self.UPLINK_BURST, self.MAX_STATIONS
+            )
+            self.add_filter(self.throttle.filter)
+
+    def load_rules(self) -> Rules:
+        """
+        Compiles RULES_FILE and the built-in rules
+        :return: Rules
+        """
+        text = ""
+        if self.RULES_FILE:
+            with open(self.RULES_FILE, encoding="utf-8") as inp:
+                text = inp.read()
+        return Rules(text, APRS_DATA_TYPE, self.RULES_FILE or "rules")
+
+    def add_filter(self, p_filter):
+        """
+        Registers a filter for frames that passed check_routing()
+        p_filter(packet) returns a reason (e.g. "Flood, not gated")
+        to stop gating, "" or None to gate
+        :param p_filter: callable taking a Packet
+        """
+        self.filters.append(p_filter)
 
+    def remove_filter(self, p_filter):
+        """
+        :param p_filter: filter registered with add_filter()
+        """
+        self.filters.remove(p_filter)
+
+    def add_sink(self, sink):
+        """
+        Registers a sink, sink(packet) is called once for every received
+        frame after gating. Frames queued for APRS-IS are passed when sent
+        or not sent, from the uplink writer thread, frames held by the
+        cluster from the cluster thread. Packets are only built while at
+        least one filter or sink is registered.
+        :param sink: callable taking a Packet
+        """
+        self.sinks.append(sink)
+
+    def remove_sink(self, sink):
+        """
+        :param sink: sink registered with add_sink()
+        """
+        self.sinks.remove(sink)
 
     def signal_handler(self, interupt_signal, frame):
         """
-        Exit program with ctrl c and print statistics
+        Ctrl C: requests the exit from the read loop, closing in the
+        handler could wait for a lock held by the interrupted loop;
+        a second Ctrl C exits at once
         :param interupt_signal:
         :param frame:
         :return:
         """
+        if self.exit_pending:
+            os._exit(1)
+        self.exit_pending = True
+        cancel = getattr(self.ser, "cancel_read", None)
+        if cancel:  # wake up a waiting read
+            cancel()
+
+    def exit_pgm(self):
+        """
+        Exit program after Ctrl C and print statistics; runs in the read loop
+        """
         print("\r\nCtrl+C, exiting.")
         self.ser.close()
         self.close_pgm()
 
 
     def close_pgm(self):
+        self.watchdog.stop()  # closing must not count as a stall
+        self.outbound.stop()  # frames still queued are counted not gated
+        if self.render:
+            self.stop_render()
         print(
             "{:d}".format(self.pstat[0] + self.pstat[1]
                           + self.pstat[2])
@@ -422,11 +718,54 @@ class Ygate:
         print("List of unique call sign heard:")
         print(self.pstat[3])
         logging.info(self.pstat)
+        print(self.drop_summary())
+        logging.info(self.drop_summary())
+        print(self.outbound.summary())
+        logging.info("Outbound:\n%s", self.outbound.summary())
+        print(self.rolling.summary())
+        logging.info("Rolling:\n%s", self.rolling.summary())
+        memory = self.memory_check()
+        print(memory)
+        logging.info(memory)
+        if self.render_summary:
+            print(self.render_summary)
+            logging.info("[REND] %s", self.render_summary)
+        if self.store:
+            self.store.flush(self.pstat)
+            self.store.close()
+        if self.capture:
+            self.capture.close()
+            print(f"{self.capture.records} frames captured to {self.CAPTURE_FILE}")
+        if self.fanout:
+            print(self.fanout.summary())
+            logging.info("[FAN ] %s", self.fanout.summary())
+            self.fanout.stop()
+        if self.cluster:
+            print(self.cluster.summary(self.pstat[3]))
+            logging.info("[CLU ] %s", self.cluster.summary(self.pstat[3]))
+            self.cluster.stop()
+        if self.dashboard:
+            print(self.dashboard.summary())
+            logging.info("[WEB ] %s", self.dashboard.summary())
+            self.dashboard.stop()
+        if self.is_stat.lines > 0:
+            print(self.is_stat.summary())
+            logging.info("[IS  ] %s", self.is_stat.summary())
         # os._exit is used to exit the program
         # immediately, because threats are running
         os._exit(0)
 
 
+    def drop_summary(self) -> str:
+        """
+        :return: not gated packets per reason and flood protection top talkers
+        """
+        drops = ", ".join(f"{k}: {v}" for k, v in sorted(self.drops.items()))
+        txt = f"Not gated: {drops if drops else 'none'}"
+        if self.throttle:
+            txt += f"\n{self.throttle.summary()}"
+        return f"{txt}\nRule hits:\n{self.rules.summary()}"
+
     def is_routing(self, p_str: str) -> bool:
         """
         Check whether p_str is a valid routing packet, add unique call signs to list
@@ -434,29 +773,47 @@ class Ygate:
         :return: true if valid p_str starts with a valid call sign
         """
         # check for normal calls
-        val_call = re.match(r"\d?[A-Z]{1,2}\d{1,4}[A-Z]{1,4}", p_str)
-        if val_call:
-            if val_call.group() not in self.pstat[3]:
-                self.pstat[3].append(val_call.group())
-            return True
-        # check for possible aliases/special calls
-        val_call = re.match(r"([A-Z\d]{4,7})(-\d{1,2})?", p_str)
-        if val_call and val_call.group(1) in self.SPECIAL_CALLS:
-            if val_call.group() not in self.pstat[3]:
-                self.pstat[3].append(val_call.group())
-            return True
-        return False
+        val_call = CALL.match(p_str)
+        if not val_call:
+            # check for possible aliases/special calls
+            val_call = ALIAS.match(p_str)
+            if not val_call or val_call.group(1) not in self.rules.special:
+                return False
+        call = val_call.group()
+        if call not in self.pstat[3]:
+            self.pstat[3].append(sys.intern(call))  # one copy per call
+            if self.opt.lean and len(self.pstat[3]) > self.LEAN_CALLS:
+                del self.pstat[3][0]
+        return True
 
     @property
     def aprs_con(self) -> bool:
         """
-        Connect to APRS-IS server
+        Connect to APRS-IS server, one thread at a time
+        :return: True or False depending on the success.
+        """
+        with self.con_lock:
+            try:
+                return self.connect_aprs()
+            except OSError as msg:  # connection lost during login
+                print(f"{time.strftime('%H:%M:%S')} {COL.red}APRS-IS login failed.{COL.end} {msg}")
+                return False
+
+    def connect_aprs(self) -> bool:
+        """
+        Opens a new connection and logs in to APRS-IS server
         :return: True or False depending on the success.
         """
         l_time = time.strftime("%H:%M:%S")
         if self.sck is None or not isinstance(self.sck, classmethod):
+            if self.sck is not None:  # do not leak the previous connection
+                try:
+                    self.sck.shutdown(socket.SHUT_RDWR)  # wakes up aprsis_rx
+                except OSError:
+                    pass
+                self.sck.close()
             self.sck = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # open socket
-            self.sck.settimeout(None)
+            self.sck.settimeout(self.SOCKET_TIMEOUT)
         try:
             self.sck.connect((self.HOST, self.PORT))
         except (OSError, TimeoutError) as msg:
@@ -466,8 +823,8 @@ class Ygate:
             return False
         self.sck.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
         self.sck.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 512)  # buffer size
-        self.sock_file = self.sck.makefile(mode="r")
-        login = self.sock_file.readline().strip()  # 1st response line
+        stream = LineStream(self.sck)
+        login = stream.readline().decode(self.FORMAT, "replace")  # 1st response line
         print(f"{l_time} {COL.green}{login}{COL.end}")
         time.sleep(1.0)
         # Login to APRS Server
@@ -476,14 +833,11 @@ class Ygate:
                   f"vers 9V1KG-ygate 0.9 filter m/{self.RANGE}\r\n", "utf-8")
         )
         # if second line contains "unverified", login was not successful
-        if self.sock_file:
-            login = self.sock_file.readline()  # 2nd response line
-        else:
-            self.sock_file = self.sck.makefile(mode="r")
-            login = self.sock_file.readline()  # 2nd response line
+        login = stream.readline().decode(self.FORMAT, "replace")  # 2nd response line
         if login.find("# logresp") >= 0 and login.find(" verified") > 0:
             print(f"{l_time} {COL.green}{login.strip()}{COL.end}")
             logging.info("%s", login.strip())
+            self.is_stream = stream  # hand over to aprsis_rx
             return True
         print(
             f"{l_time} {COL.red}Login not successful. "
@@ -491,133 +845,322 @@ class Ygate:
         )
         return False
 
-    def send_aprs(self, aprs_string: str) -> bool:
+    def send_aprs(self, aprs_string: str, cls: str = "reply") -> bool:
         """
-        Send aprs data to APRS-IS, used for beacon and bulletin
+        Queue aprs data for APRS-IS, used for beacon, bulletin and replies
         aprs_string must end with '\n'!
         :param aprs_string:
+        :param cls: outbound class "reply", "status" or "beacon"
+        :return: False if an older item of cls had to be dropped
+        """
+        return self.outbound.put(cls, bytes(aprs_string, self.FORMAT))
+
+    def uplink(self, cls: str, data: bytes) -> bool:
+        """
+        Sends data to APRS-IS, runs in the outbound writer thread
+        Tries to re-establish a lost connection once
+        :param cls: outbound class
+        :param data: bytes to be sent
         :return: Boolean indicating Success or failure
         """
-        dt_id = aprs_string.split(":")
-        dt_id = APRS_DATA_TYPE[dt_id[1][0] if len(dt_id[1]) > 0 else ":"]
         l_time = time.strftime("%H:%M:%S")
-        if is_internet():
-            try:
-                self.sck.sendall(bytes(aprs_string, self.FORMAT))
-                logging.debug("[%s] %s", dt_id, aprs_string.strip())
-                print_wrap(f"{l_time} [{dt_id}] {COL.blue}{aprs_string.strip()}{COL.end}")
-                return True
-            except (TimeoutError, BrokenPipeError, OSError) as msg:
-                err = msg.strerror
-        else:
-            err = "No internet"
-        logging.debug(err)
-        print_wrap(
-            f"{l_time} {COL.yellow}{err} Trying to re-establish connection ...{COL.end}"
+        try:
+            self.sck.sendall(data)
+        except (TimeoutError, BrokenPipeError, OSError, AttributeError) as msg:
+            err = getattr(msg, "strerror", None) or str(msg)
+            if not is_internet(lean=self.opt.lean):
+                err = "No internet"
+            logging.debug(err)
+            print_wrap(
+                f"{l_time} {COL.yellow}{err} Trying to re-establish connection ...{COL.end}"
+            )
+            if not self.aprs_con:
+                logging.warning("[    ] Not sent: %s", data.strip())
+                print_wrap(
+                    f"{l_time} {COL.yellow}Not sent: {COL.end}{decode_ascii(data)[1]}"
+                )
+                return False
+            self.sck.sendall(data)
+        if cls != "gated":
+            aprs_string = data.decode(self.FORMAT, "replace").strip()
+            dt_id = aprs_string.split(":")
+            dt_id = APRS_DATA_TYPE.get(dt_id[1][:1] if len(dt_id) > 1 else ":", "NONE")
+            logging.debug("[%s] %s", dt_id, aprs_string)
+            print_wrap(f"{l_time} [{dt_id}] {COL.blue}{aprs_string}{COL.end}")
+        return True
+
+    def schedule(self, interval: float, func):
+        """
+        Starts a timer thread calling func after interval sec,
+        replacing the timer of func; a pending one is cancelled,
+        so a restarted chain does not run twice
+        :param interval: delay in sec
+        :param func: method to be called
+        """
+        if self.stopped:
+            return
+        old = self.timers.get(func.__name__)
+        if old:
+            old.cancel()  # no effect if it already runs func
+        timer = threading.Timer(interval, func)
+        timer.daemon = True
+        self.timers[func.__name__] = timer
+        timer.start()
+
+    def stop_timers(self):
+        """
+        Cancels beacon and status timers, stops the watchdog
+        """
+        self.stopped = True
+        self.watchdog.stop()
+        for timer in self.timers.values():
+            timer.cancel()
+
+    def open_store(self):
+        """
+        Opens STORE_FILE, restores statistics and heard calls
+        and starts the periodic flush
+        """
+        from .store import StatStore
+        self.store = StatStore(self.STORE_FILE)
+        self.start_datetime = datetime.datetime.fromtimestamp(
+            self.store.first_start(self.start_datetime.timestamp())
         )
-        time.sleep(2.0)
-        if self.aprs_con:
-            self.sck.sendall(bytes(aprs_string, self.FORMAT))
-            logging.debug("[%s] %s", dt_id, aprs_string.strip())
-            print_wrap(f"{l_time} [{dt_id}] {COL.blue}{aprs_string.strip()}{COL.end}")
-            return True
-        logging.warning("[    ] Not sent: %s", aprs_string.strip())
-        print_wrap(
-            f"{l_time} {COL.yellow}Not sent: {COL.end}{aprs_string.strip()}"
+        for call in self.store.load(self.pstat, self.LEAN_CALLS if self.opt.lean else -1):
+            self.is_routing(call)  # adds to pstat[3]
+        self.add_sink(self.store.sink)
+        self.schedule(self.STORE_FLUSH, self.store_flush)
+        print(
+            " " * 9 + f"Statistics from {self.STORE_FILE}: "
+            f"{sum(self.pstat[:3])} packets, {len(self.pstat[3])} calls "
+            f"since {str(self.start_datetime).split('.')[0]}"
         )
-        return False
+
+    def store_flush(self):
+        """
+        thread that writes statistics every STORE_FLUSH sec to STORE_FILE
+        """
+        import sqlite3  # loaded with StatStore
+        self.schedule(self.STORE_FLUSH, self.store_flush)
+        try:
+            self.store.flush(self.pstat)
+        except sqlite3.Error as err:
+            logging.error("Statistics not stored: %s", err)
+
+    def open_cluster(self):
+        """
+        Joins the IGate cluster, the cluster filter runs after all others
+        """
+        from .cluster import Cluster
+        try:
+            self.cluster = Cluster(
+                self.opt.cluster, self.opt.cluster_port, self.opt.peers, self.CLUSTER_GROUP
+            )
+        except OSError as err:
+            print(" " * 9 + f"{COL.red}Cluster: {err}{COL.end}")
+            sys.exit(1)
+        self.add_filter(self.cluster.filter)
+        self.add_sink(self.cluster.sink)
+        self.cluster.start(self.cluster_release, self.cluster_discard)
+        dest = ", ".join(f"{host}:{port}" for host, port in self.cluster.dest)
+        print(" " * 9 + f"Cluster node {self.opt.cluster} to {dest}")
+
+    def cluster_release(self, pkt: Packet):
+        """
+        Gates a frame held by the cluster that no other node claimed,
+        counted and passed to the sinks by uplink_done(); runs in the cluster thread
+        :param pkt: Packet
+        """
+        routing = f"{pkt.routing},qAO,{self.user.my_call}-{self.user.ssid}:"
+        self.outbound.put("gated", bytes(routing, self.FORMAT) + pkt.raw, pkt)
+        localtime = time.strftime("%H:%M:%S")
+        print_wrap(f"{localtime} [CLU ] {COL.green}Released:{COL.end} {routing}{pkt.payload}")
+        logging.info("[CLU ] Released: %s%s", routing, pkt.payload)
+
+    def cluster_discard(self, pkt: Packet):
+        """
+        Counts a held frame that another node gated as not gated,
+        runs in the cluster thread
+        :param pkt: Packet
+        """
+        reason = self.cluster.DUPE_MSG
+        self.pstat[1] += 1
+        self.drops[reason] = self.drops.get(reason, 0) + 1
+        logging.info("[CLU ] %s: %s:%s", reason, pkt.routing, pkt.payload)
+        self.to_sinks(pkt._replace(msg=reason))
+
+    def dashboard_stats(self) -> dict:
+        """
+        :return: counters shown on the dashboard
+        """
+        time_on = datetime.datetime.now() - self.start_datetime
+        return {
+            "gated": self.pstat[0], "not_gated": self.pstat[1], "invalid": self.pstat[2],
+            "calls": len(self.pstat[3]),
+            "rate": self.rolling.bulletin("1 min", types=5),
+            "aprsis": self.is_stat.summary() if self.is_stat.lines else "",
+            "up": f"{time_on.days} days {round(time_on.seconds / 3600, 1)} h",
+        }
+
+    def memory_check(self) -> str:
+        """
+        Reports resident memory, with --lean a warning above RSS_BUDGET
+        :return: memory line for the statistics
+        """
+        rss = rss_mb()
+        txt = f"Memory: RSS {rss:.1f} MB"
+        if self.opt.lean:
+            txt += f", budget {self.RSS_BUDGET:.0f} MB"
+            if rss > self.RSS_BUDGET:
+                localtime = time.strftime("%H:%M:%S")
+                print(f"{localtime} {COL.yellow}{txt} exceeded{COL.end}")
+                logging.warning("%s exceeded", txt)
+        return txt
 
     def send_my_position(self):
         """
         thread that sends position every BEACON sec to APRS IS
         """
+        self.watchdog.beat("beacon")
         pos_c = compress_position(self.user.pos[0], self.user.pos[1], self.user.pos[2])
         position_string = f"{self.user.my_call}-{self.user.ssid}" \
                           f">{self.VERS},TCPIP*:={pos_c}{self.BCNTXT}\n"
-        threading.Timer(self.BEACON, self.send_my_position).start()
-        self.send_aprs(position_string)
+        self.schedule(self.BEACON, self.send_my_position)
+        self.send_aprs(position_string, "beacon")
 
     def send_status(self):
         """
         thread that sends a bulletin every HOURLY sec to APRS IS
         """
+        self.watchdog.beat("status")
+        logging.info(self.memory_check())
         if self.pstat[0] > 0:
             # send statistics via bulletin
+            # short enough for an APRS status, the details go to the log
             time_on = datetime.datetime.now() - self.start_datetime
-            p_tot = self.pstat[0] + self.pstat[1] + self.pstat[2]
-            n_calls = len(self.pstat[3])
+            counts, calls = self.pstat[:3], self.pstat[3]
+            if self.cluster:  # cluster wide
+                counts, calls = self.cluster.merged(self.pstat[3])
+                logging.info("[CLU ] %s", self.cluster.summary(self.pstat[3]))
             status_txt = f"IGate up {time_on.days} days " \
                 f"{round(time_on.seconds/3600,1)} h " \
-                f"{p_tot} rcvd, {self.pstat[0]} gtd, " \
-                f"{n_calls} unique calls"
+                f"{sum(counts)} rcvd, {counts[0]} gtd, " \
+                f"{len(calls)} unique calls"
+            logging.info("[STAT] %s", self.rolling.bulletin())
         else:
             status_txt = self.STATUS_TXT
         status = f"{self.user.my_call}-{self.user.ssid}>{self.VERS}," \
                    f"TCPIP*:>{status_txt}\r\n"
-        threading.Timer(self.HOURLY, self.send_status).start()
-        self.send_aprs(status)
+        self.schedule(self.HOURLY, self.send_status)
+        self.send_aprs(status, "status")
 
     def aprsis_rx(self):
         """
-        Receives and prints packets from APRS server
+        Thread that receives and prints packets from APRS server
         (command line option -i)
+        Drains the socket in bulk, classifies each frame by data type
+        and keeps lag metrics in self.is_stat
         :return:
         """
-        try:  # receive from APRS-IS test function
-            rcvd = self.sock_file.readline().strip()
-            if len(rcvd) > 0 and rcvd.find("# aprs") == -1:
-                print(" " * 9 + f"[IS  ] {rcvd}")
-            time.sleep(0.2)
-        except UnicodeDecodeError:
-            pass
+        lag_warned = 0.0
+        while True:
+            stream = self.is_stream
+            try:
+                n_byt = stream.fill() if stream else 0
+            except OSError:
+                n_byt = 0
+            if n_byt == 0:  # not connected, wait for reconnect
+                time.sleep(1.0)
+                continue
+            recvd = time.time()
+            self.is_stat.bytes += n_byt
+            lines = stream.pop_lines()
+            self.is_stat.max_chunk = max(self.is_stat.max_chunk, len(lines))
+            l_time = time.strftime("%H:%M:%S")
+            out = []
+            for line in lines:
+                if line[:1] == b"#":  # server comment or keep alive
+                    lag = server_lag(line, recvd)
+                    if lag is not None:
+                        self.is_stat.server_lag = lag
+                    continue
+                n_inv, frame = decode_ascii(line)
+                self.is_stat.invalid += 1 if n_inv > 0 else 0
+                d_type = APRS_DATA_TYPE.get(frame[frame.find(":") + 1:][:1], "NONE")
+                self.is_stat.count(d_type)
+                logging.debug("[IS  ] %s", frame)
+                out.append(wrap_text(f"{l_time} [IS  ] [{d_type}] {frame}"))
+            if out:
+                print("\n".join(out))
+            self.is_stat.proc_lag = time.time() - recvd
+            self.is_stat.max_lag = max(self.is_stat.max_lag, self.is_stat.proc_lag)
+            lag = self.is_stat.server_lag + self.is_stat.proc_lag
+            if lag > self.LAG_WARN and recvd - lag_warned > 60.0:
+                lag_warned = recvd
+                print(f"{l_time} {COL.yellow}APRS-IS stream {round(lag, 1)} s behind{COL.end}")
+                logging.warning("[IS  ] Stream %s s behind", round(lag, 1))
 
     def check_routing(self, route: str, payld: str) -> bool:
         """
-        Check whether the packet should be routed to the internet
+        Check whether the packet should be routed to the internet,
+        the first matching rule of RULES_FILE and the built-in rules decides
         :param route: routing
         :param payld: payload
         :return: true if ok for routing false otherwise
         """
         if len(route) == 0:
             self.msg = "No Payload, not gated"
-        elif re.search(r",TCP", route):
-            # drop packets sourced from internet
-            self.msg = "TCP not gated"
-        elif re.search(r"^}.*,TCP.*:", payld):
-            # drop packets sourced from internet in third party packets
-            self.msg = "TCP not gated"
-        elif re.match(r"\?", payld):
-            # drop aprs queries
-            self.msg = "Query, not gated"
-        elif "RFONLY" in route:
-            self.msg = "RFONLY, not gated"
-        elif "NOGATE" in route:
-            self.msg = "NOGATE, not gated"
         else:
-            return True
+            rule = self.rules.match(route, payld)
+            if rule is None or rule.action == "pass":
+                return True
+            self.msg = rule.msg
         self.pstat[1] += 1
+        self.drops[self.msg] = self.drops.get(self.msg, 0) + 1
         return False
 
-    def do_gating(self, packet: bytes) -> bool:
+    def do_gating(self, packet: bytes, pkt: Packet = None) -> bool:
         """
-        gate packet to aprs server
+        gate packet to aprs server via the outbound queue,
+        it is counted as gated in uplink_done() once sent
         :param packet: the bytes to be sent
-        :return:
+        :param pkt: Packet for the sinks, passed on by uplink_done()
+        :return: True, packet queued for the uplink
         """
-        try:
-            self.sck.sendall(packet)
-            self.pstat[0] += 1
-            self.msg = ""
-            return True
-        except (TimeoutError, BrokenPipeError, OSError):
-            if self.aprs_con:
-                self.sck.sendall(packet)
-                self.pstat[0] += 1
-                self.msg = ""
-                return True
+        if not self.outbound.running:  # no connection to APRS-IS
             self.msg = "No network/internet, not gated"
             self.pstat[1] += 1
+            self.drops[self.msg] = self.drops.get(self.msg, 0) + 1
             return False
+        self.outbound.put("gated", packet, pkt)
+        self.msg = ""
+        return True
+
+    def uplink_done(self, cls: str, data: bytes, result: str, pkt: Packet = None):
+        """
+        Counts a gated packet as gated when sent, otherwise as not gated
+        with the reason, and passes it to the sinks; runs in the outbound
+        writer thread
+        :param cls: outbound class
+        :param data: bytes
+        :param result: "sent", "failed", "dropped", "expired" or "stopped"
+        :param pkt: Packet given to do_gating(), None without sinks
+        """
+        if self.cluster and result in ("sent", "failed"):
+            self.cluster.set_uplink(result == "sent")
+        if cls != "gated":
+            return
+        if result == "sent":
+            self.pstat[0] += 1
+            reason = ""
+        else:
+            reason = UPLINK_FAIL[result]
+            self.pstat[1] += 1
+            self.drops[reason] = self.drops.get(reason, 0) + 1
+            if result != "failed":  # failed sends are logged by uplink()
+                logging.warning("[OUT ] %s: %s", reason, data.strip())
+        if pkt:
+            self.to_sinks(pkt._replace(gated=not reason, msg=reason))
 
     def open_serial(self) -> bool:
         """
@@ -626,7 +1169,7 @@ class Ygate:
         """
         try:
             # open first usb serial port
-            self.ser = serial.Serial(self.SERIAL, self.BAUD)
+            self.ser = serial.Serial(self.SERIAL, self.BAUD, timeout=self.SERIAL_TIMEOUT)
             print(" " * 9 + f"Serial port {self.ser.name} opened")
             return True
         except (serial.SerialException, serial.SerialTimeoutException) as err:
@@ -677,9 +1220,7 @@ class Ygate:
         :param pay_ld: payload
         :return: message id
         """
-        full_call = re.compile(
-            r":?((\d?[A-Z]{1,2}\d{1,4}[A-Z]{1,4})-?\d{0,2}) {0,6}[>:]?"
-        )  # ":CALL-NN  : or CALL-NN>
+        full_call = FULL_CALL
         try:
             d_type = APRS_DATA_TYPE[pay_ld[0]]
         except (KeyError, IndexError):
@@ -716,9 +1257,44 @@ class Ygate:
         loc_time = time.strftime("%H:%M:%S")
         if not self.open_serial():
             sys.exit(1)
-        if is_internet():  # check internet connection
+        if self.CAPTURE_FILE:
+            self.capture = CaptureWriter(self.CAPTURE_FILE)
+            print(" " * 9 + f"Capturing raw frames to {self.CAPTURE_FILE}")
+        if self.STORE_FILE:
+            self.open_store()
+        if self.opt.fanout:
+            try:
+                self.fanout = FanoutServer(
+                    self.opt.fanout, f"{self.user.my_call}-{self.user.ssid}", self.FANOUT_HOST
+                )
+            except OSError as err:
+                print(" " * 9 + f"{COL.red}Fan-out server: {err}{COL.end}")
+                sys.exit(1)
+            self.fanout.start()
+            self.add_sink(self.fanout.sink)
+            print(" " * 9 + f"Fan-out server on port {self.fanout.port}")
+        if self.opt.dashboard:
+            from .dashboard import Dashboard
+            try:
+                self.dashboard = Dashboard(
+                    self.opt.dashboard, f"{self.user.my_call}-{self.user.ssid}",
+                    self.dashboard_stats, self.DASHBOARD_HOST
+                )
+            except OSError as err:
+                print(" " * 9 + f"{COL.red}Dashboard: {err}{COL.end}")
+                sys.exit(1)
+            self.dashboard.start()
+            self.add_sink(self.dashboard.sink)
+            print(" " * 9 + f"Dashboard on http port {self.dashboard.port}")
+        if self.opt.cluster:
+            self.open_cluster()
+        if self.opt.render_process:
+            self.start_render()
+        if is_internet(lean=self.opt.lean):  # check internet connection
             print(f"{loc_time} Logging in to {self.HOST}")
             if self.aprs_con:
+                self.outbound.start()
+                self.start_watchdog()
                 self.send_status()
                 time.sleep(5.)  # wait 5 sec before sending beacon
                 self.send_my_position()
@@ -737,79 +1313,334 @@ class Ygate:
                 self.ser.close()
             sys.exit(1)
 
+    def start_render(self):
+        """
+        Starts the child process that prints and logs received frames
+        """
+        import multiprocessing
+        from .shmring import ShmRing
+        self.render = ShmRing(self.RENDER_RING)
+        self.render_proc = multiprocessing.get_context("spawn").Process(
+            target=render_process, args=(self.render.name, self.LOG_FILE),
+            name="render", daemon=True
+        )
+        self.render_proc.start()
+        print(" " * 9 + f"Rendering and logging in process {self.render_proc.pid}")
+
+    def stop_render(self, timeout: float = 5.0):
+        """
+        Lets the child process print the remaining frames and stops it
+        :param timeout: s to wait for the child
+        """
+        ring, self.render = self.render, None  # frames are printed here again
+        ring.close()
+        self.render_proc.join(timeout)
+        if self.render_proc.is_alive():
+            self.render_proc.terminate()
+        self.render_summary = f"Render process: {ring.summary()}"
+        ring.release()
+
+    def start_watchdog(self):
+        """
+        Registers serial reader, uplink writer and timers with the watchdog
+        """
+        if self.WATCHDOG_CHECK <= 0:
+            return
+        wdg = self.watchdog
+        wdg.register("serial", self.WATCHDOG_SERIAL)  # no recovery, exit
+        wdg.register("uplink", self.WATCHDOG_UPLINK, self.recover_uplink)
+        wdg.register("status", self.HOURLY + self.WATCHDOG_SLACK,
+                     functools.partial(self.recover_timer, self.send_status))
+        wdg.register("beacon", self.BEACON + self.WATCHDOG_SLACK + 5.,
+                     functools.partial(self.recover_timer, self.send_my_position))
+        wdg.start()
+
+    def stall_exit(self, code: int):
+        """
+        Exits after an unrecoverable stall, the render process
+        prints the remaining frames and ends
+        :param code: exit code
+        """
+        if self.render:
+            self.render.close()
+        os._exit(code)
+
+    def recover_uplink(self) -> bool:
+        """
+        Shuts down the APRS-IS socket, a send or login hanging on it fails
+        and the writer reconnects
+        :return: True
+        """
+        print(f"{time.strftime('%H:%M:%S')} {COL.red}Uplink stalled, reconnecting{COL.end}")
+        if self.sck is not None:
+            try:
+                self.sck.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        return True
+
+    def recover_timer(self, func) -> bool:
+        """
+        Restarts a timer chain that did not run in time
+        :param func: send_status or send_my_position
+        :return: True
+        """
+        print(f"{time.strftime('%H:%M:%S')} {COL.red}Timer {func.__name__} late, "
+              f"restarting{COL.end}")
+        self.schedule(0., func)
+        return True
+
+    def usr1_handler(self, usr_signal, frame):
+        """
+        SIGUSR1: requests the statistics dump from the read loop,
+        printing in the handler could interrupt a print of the loop
+        :param usr_signal:
+        :param frame:
+        :return:
+        """
+        self.usr1_pending = True
+
+    def usr1_dump(self):
+        """
+        Prints and logs stage timing and statistics, starts or stops
+        profiling; runs in the read loop after SIGUSR1
+        """
+        self.usr1_pending = False
+        report = self.timer.report()
+        print(report)
+        logging.info("Stage timing (ms):\n%s", report)
+        print(self.drop_summary())
+        logging.info(self.drop_summary())
+        print(self.outbound.summary())
+        logging.info("Outbound:\n%s", self.outbound.summary())
+        if self.cluster:
+            print(self.cluster.summary(self.pstat[3]))
+            logging.info("[CLU ] %s", self.cluster.summary(self.pstat[3]))
+        print(self.rolling.summary())
+        logging.info("Rolling:\n%s", self.rolling.summary())
+        memory = self.memory_check()
+        print(memory)
+        logging.info(memory)
+        if self.is_stat.lines > 0:
+            print(self.is_stat.summary())
+            logging.info("[IS  ] %s", self.is_stat.summary())
+        if self.render:
+            print(f"Render process: {self.render.summary()}")
+            logging.info("[REND] %s", self.render.summary())
+        if self.watchdog.components:
+            print(self.watchdog.summary())
+            logging.info("Watchdog:\n%s", self.watchdog.summary())
+        msg = self.profiler.toggle()
+        print(f"{time.strftime('%H:%M:%S')} {COL.cyan}{msg}{COL.end}")
+
+    def read_serial(self, expected: bytes = b"\n") -> bytes:
+        """
+        Reads from serial up to and including expected; a read returning
+        after SERIAL_TIMEOUT without it is continued after a heartbeat
+        :param expected: end of line or frame
+        :return: bytes read
+        """
+        data = self.ser.read_until(expected)
+        while not data.endswith(expected) and not self.exit_pending:
+            self.watchdog.beat("serial")
+            if self.usr1_pending:  # idle channel, do not wait for a frame
+                self.usr1_dump()
+            part = self.ser.read_until(expected)
+            if not part and data:  # the line was not completed in time
+                break
+            data += part
+        return data
+
+    def read_yaesu(self) -> tuple:
+        """
+        Reads one frame in Yaesu text format from serial:
+        "CALL>DEST,PATH [date time] <UI...>:" line and payload line
+        :return: invalid bytes in routing, routing, payload bytes
+        """
+        b_p1 = self.read_serial()  # 1st line routing
+        self.timer.mark()  # waiting for the 1st line is not read time
+        n_inv, routing = decode_ascii(b_p1)
+        m_ui = self.is_ui.search(routing)
+        if m_ui:
+            b_p2 = self.read_serial()  # 2nd line payload bytes
+            routing = routing[:m_ui.start()]
+            if self.capture:
+                self.capture.write(b_p1 + b_p2)
+        else:  # out of sync, disregard payload
+            b_p2 = b"\r\n"
+            if self.capture:
+                self.capture.write(b_p1)
+        return n_inv, routing, b_p2
+
+    def read_kiss(self) -> tuple:
+        """
+        Reads KISS frames from serial until an AX.25 UI frame is found
+        :return: invalid call signs in routing, routing, payload bytes
+        """
+        while not self.exit_pending:
+            data = self.read_serial(FEND)
+            self.watchdog.beat("serial")  # also for frames that are not returned
+            self.timer.mark()
+            frame = kiss_unescape(data[:-1] if data.endswith(FEND) else data)
+            if len(frame) < 2 or frame[0] & 0x0F != 0:
+                continue  # empty or not a data frame
+            try:
+                decoded = decode_ax25(frame[1:])
+            except ValueError as err:
+                logging.warning("[KISS] %s: %s", err, frame.hex())
+                self.pstat[2] += 1
+                continue
+            if self.capture:
+                self.capture.write(
+                    FEND + data, call=decoded[1][:decoded[1].find(">")] if decoded else ""
+                )
+            if decoded:
+                return decoded
+        return 0, "", b""
+
+    def process_frame(self, n_inv: int, routing: str, b_p2: bytes):
+        """
+        Classifies, gates, displays and logs one received frame
+        and passes it to filters and sinks
+        :param n_inv: number of invalid bytes in routing
+        :param routing: TNC2 header without ":" or out of sync text
+        :param b_p2: payload bytes
+        """
+        timer = self.timer
+        localtime = time.strftime("%H:%M:%S")
+        payload = decode_ascii(b_p2)[1]  # non ascii chars will be shown as\xnn
+        mic_e = mic_e_decode(routing, b_p2) if self.opt.mic_e else ""
+        timer.stop("decode")
+        data_type = self.get_data_type(routing, payload)
+        timer.stop("classify")
+
+        pkt = None
+        if self.filters or self.sinks:
+            p_route, p_payload = routing, payload
+            if "\033" in routing or "\033" in payload:  # highlighted invalid bytes
+                p_route, p_payload = ANSI.sub("", routing), ANSI.sub("", payload)
+            pkt = Packet(
+                time.time(), sys.intern(p_route[:p_route.find(">")]), p_route, p_payload, b_p2,
+                ANSI.sub("", data_type) if "\033" in data_type else data_type,
+                False, ""
+            )
+        text = ""  # terminal output
+        log = ()  # log level, format, arguments
+        if n_inv > 0:  # invalid ascii char in routing
+            text = f"{localtime} [INV ] " \
+                   f"{COL.yellow}Invalid routing: {COL.end} {routing}{payload}"
+            log = (logging.WARNING, "[INV ] Invalid routing: %s%s", routing, payload)
+            self.msg = "Invalid routing"
+            self.pstat[2] += 1
+        elif self.is_routing(routing):
+            # routing starts with a valid call sign"
+            if self.check_routing(routing, payload) and self.filter_ok(pkt):
+                # can be routed, append ",qAO,Call:"
+                routing = f"{routing},qAO,{self.user.my_call}-{self.user.ssid}:"
+                packet = bytes(routing, self.FORMAT) + b_p2  # byte string
+                if self.do_gating(packet, pkt):
+                    text = f"{localtime} [{data_type}] {routing}{payload}"
+                    log = (logging.INFO, "[%s] %s%s", data_type, routing, payload)
+                    pkt = None  # to the sinks when sent, see uplink_done()
+                else:
+                    routing = routing[:routing.find(",qAO,")]
+                    log = (logging.WARNING, "[%s] %s: %s%s",
+                           data_type, self.msg, routing, payload)
+                    text = f"{localtime} [{data_type}] " \
+                           f"{COL.yellow}{self.msg}{COL.end}: {routing}{payload}"
+            else:  # no routing to internet
+                log = (logging.INFO, "[%s] %s: %s%s", data_type, self.msg, routing, payload)
+                text = f"{localtime} [{data_type}] " \
+                       f"{COL.yellow}{self.msg}{COL.end}: {routing}{payload}"
+        elif len(routing) > 0:  # no invalid char in routing, but not to be routed
+            log = (logging.WARNING, "[%s] Invalid routing: %s%s", data_type, routing, payload)
+            text = f"{localtime} [{data_type}] {COL.yellow}" \
+                   f"Invalid routing:{COL.end} {routing}{payload}"
+            self.msg = "Invalid routing"
+            self.pstat[2] += 1
+        else:  # blank line, nothing to gate or to pass to the sinks
+            self.msg = "No routing"
+        timer.stop("gate")
+
+        if self.render:  # --render-process: the child prints and logs
+            self.render.put(log[0] if log else 0, text, log[1] % log[2:] if log else "", mic_e)
+            timer.stop("render")
+            timer.stop("log")
+        else:
+            if text:
+                print_wrap(text)
+            if mic_e:
+                print(16 * " " + mic_e)
+            timer.stop("render")
+            logging.debug("[FTM ] %s %s", routing, payload)
+            if log:
+                logging.log(*log)
+            if mic_e:
+                logging.info("       %s", mic_e)
+            timer.stop("log")
+        if pkt and self.sinks and routing and not (
+                self.cluster and self.msg.startswith(self.cluster.HELD)):
+            self.to_sinks(pkt._replace(msg=self.msg))  # held: when released or discarded
+
+    def to_sinks(self, pkt: Packet):
+        """
+        Passes a packet to all sinks
+        :param pkt: Packet
+        """
+        for sink in self.sinks:
+            try:
+                sink(pkt)
+            except Exception as err:  # a sink must not stop the gateway
+                logging.error("Sink %s failed: %s", sink, err)
+
+    def filter_ok(self, pkt: Packet) -> bool:
+        """
+        Runs the registered filters
+        :param pkt: packet, None if no filter is registered
+        :return: True if no filter rejects the packet
+        """
+        for p_filter in self.filters:
+            reason = p_filter(pkt)
+            if reason:
+                self.msg = reason
+                if self.cluster and reason.startswith(self.cluster.HELD):
+                    return False  # counted when released or discarded
+                self.pstat[1] += 1
+                self.drops[reason] = self.drops.get(reason, 0) + 1
+                return False
+        return True
+
     def start(self):
         """
         Runs in a loop until terminated with Ctrl C
         :return: nil
         """
         signal.signal(signal.SIGINT, self.signal_handler)
+        if hasattr(signal, "SIGUSR1"):  # not on Windows
+            signal.signal(signal.SIGUSR1, self.usr1_handler)
         self.start_up()
-        is_ui = re.compile(r" \[.*\] <UI.*>:")
+        if self.opt.show_is:  # -i as cmd line argument
+            threading.Thread(target=self.aprsis_rx, daemon=True).start()
 
         while True:
-            if "-i" in str(sys.argv):  # -i as cmd line argument
-                self.aprsis_rx()
-            localtime = time.strftime("%H:%M:%S")
+            self.watchdog.beat("serial")
+            self.timer.mark()
             try:  # in case, serial is disconnected
-                a_p1 = decode_ascii(self.ser.read_until())  # 1st line routing
-                if is_ui.search(a_p1[1]):
-                    b_p2 = self.ser.read_until()  # 2nd line payload bytes
-                else:  # out of sync, disregard payload
-                    b_p2 = b"\r\n"
-                a_p2 = decode_ascii(b_p2)
+                frame = self.read_kiss() if self.opt.kiss else self.read_yaesu()
             except serial.serialutil.SerialException:
+                localtime = time.strftime("%H:%M:%S")
                 print(f"{localtime} {COL.red}Serial read error{COL.end}")
                 logging.error("Serial interface connection error")
                 self.close_pgm()  #exit program
                 break
-            routing = a_p1[1]
-            payload = a_p2[1]  # non ascii chars will be shown as\xnn
-            logging.debug("[FTM ] %s %s", a_p1[1], a_p2[1])
-            data_type = self.get_data_type(routing, payload)
-            mic_e = mic_e_decode(routing, b_p2)  # mic-e decoding
-
-            if a_p1[0] > 0:  # invalid ascii char in routing
-                print_wrap(
-                    f"{localtime} [INV ] "
-                    f"{COL.yellow}Invalid routing: {COL.end} {routing}{payload}"
-                )
-                logging.warning("[INV ] Invalid routing: %s%s", routing, payload)
-                self.pstat[2] += 1
-            elif self.is_routing(routing):
-                # routing starts with a valid call sign"
-                if self.check_routing(routing, payload):  # can be routed
-                    routing = is_ui.sub(
-                        f",qAO,{self.user.my_call}-{self.user.ssid}:", routing
-                    )  # replace "[...]<...>" with ",qAO,Call:"
-                    packet = bytes(routing, self.FORMAT) + b_p2  # byte string
-                    if self.do_gating(packet):
-                        print_wrap(f"{localtime} [{data_type}] {routing}{payload}")
-                        logging.info("[%s] %s%s", data_type, routing, payload)
-                    else:
-                        routing = is_ui.sub("", routing)
-                        logging.warning("[%s] %s: %s%s", data_type, self.msg, routing, payload)
-                        print_wrap(
-                            f"{localtime} [{data_type}] {COL.yellow}{self.msg}{COL.end}: "
-                            f"{routing}{payload}"
-                        )
-                else:  # no routing to internet
-                    routing = is_ui.sub("", routing)
-                    logging.info("[%s] %s: %s%s", data_type, self.msg, routing, payload)
-                    print_wrap(
-                        f"{localtime} [{data_type}] {COL.yellow}{self.msg}{COL.end}: {routing}{payload}"
-                    )
-            elif len(routing) > 0:  # no invalid char in routing, but not to be routed
-                routing = is_ui.sub("", routing)
-                logging.warning("[%s] Invalid routing: %s%s", data_type, routing, payload)
-                print_wrap(
-                    f"{localtime} [{data_type}] {COL.yellow}"
-                    f"Invalid routing:{COL.end} {routing}{payload}")
-                self.pstat[2] += 1
-            if "-d" in str(sys.argv) and len(mic_e) > 0:
-                print(16 * " " + mic_e)
-                logging.info("       %s", mic_e)
-
+            if self.exit_pending:
+                self.exit_pgm()
+                break
+            self.timer.stop("read")
+            self.process_frame(*frame)
+            if self.usr1_pending:
+                self.usr1_dump()
 
 if __name__ == "__main__":
-    YGATE = Ygate()
+    YGATE = Ygate(options=parse_options())
     YGATE.start()
@@ -0,0 +1,234 @@
+"""
+Microbenchmarks for the packet path functions
+
+    python -m tests.benchmark                  # run, write benchmark.json
+    python -m tests.benchmark --save-baseline  # store results as baseline
+    python -m tests.benchmark --check          # fail if slower than baseline
+
+Each benchmark runs over a corpus of clean, noisy (invalid bytes),
+Mic-E and message frames and reports the best time per call in us.
+Timings depend on the machine, so the baseline is not committed: without
+a baseline file, --check stores the median of BASELINE_RUNS runs as the
+baseline and later checks compare against it. The baseline names the CPU
+and Python version it was recorded on, a check elsewhere warns.
+"""
+import os
+import sys
+import json
+import time
+import timeit
+import statistics
+import logging
+import argparse
+import platform
+import IGaten
+from IGaten.ygate import Ygate, APRS_DATA_TYPE
+from IGaten.rules import Rules
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+OUTPUT = "benchmark.json"
+TOLERANCE = 0.25  # allowed slow down against baseline
+BASELINE_RUNS = 5  # a baseline is the median of runs, not a lucky fast one
+
+CORPUS = {
+    "clean": [
+        ("DY1P>APWW10,WIDE1-1,WIDE2-1", b"!1407.09N/12058.07E#PHG2360 RF-IS-RF digi\r\n"),
+        ("DU1KG-9>APDR15,DY1P*,WIDE2-1", b"=1408.01N/12101.02E>090/005/A=000100\r\n"),
+        ("DW2XYZ-13>APRS,WIDE2-2",
+         b"@191022z1408.01N/12101.02E_090/005g010t082r000p000P000h80b10120\r\n"),
+        ("DU3TW>APZ031,TCPIP*", b">IGate is up - RF-IS\r\n"),
+        ("PSAT>APRS,ARISS", b";OBJECT   *191022z1408.01N/12101.02E-object\r\n"),
+    ],
+    "noisy": [
+        ("DY1P>APWW10,WIDE1-1", b"!1407.09N/12058.07E# \xb0\xef digi \xff\r\n"),
+        ("DU1KG-1>APRS,RFONLY", b">status \xb0 text with invalid \xe4 bytes\r\n"),
+        ("4X1ABC>APRS,NOGATE", b"\x80\x81\x82 garbage payload\r\n"),
+        ("garbage line", b"\r\n"),
+    ],
+    "mice": [
+        ("DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1",
+         b'`0V l \x1c-/`":-}435.350MHz DU1KG home 73 Klaus_%\r\n'),
+        ("DU1KG-7>Q4PWQ0,WIDE1-1", b"'0V l\x1c\x1c-/>\r\n"),
+        ("DW1ABC-9>S32U6T,WIDE1-1,WIDE2-1", b"`(_fn\"Oj/]Mobile 146.520MHz=\r\n"),
+    ],
+    "msg": [
+        ("DU1KG-7>APDR15,WIDE1-1", b":DU1KG-10 :hello igate{01\r\n"),
+        ("DY1P>APWW10,WIDE2-1", b":BLN1     :Net tonight 2000h 145.000\r\n"),
+        ("DU3TW>APRS,WIDE1-1", b":DW4TIM   :ack12\r\n"),
+        ("DY1P>APRS,WIDE1-1",
+         b"}DW4TIM>APWW10,TCPIP,DY1P*:@124210h1309.14N/12345.27E,APRSIS32\r\n"),
+        ("DU1KG-5>APRS,WIDE1-1", b"?APRS?\r\n"),
+    ],
+}
+
+
+def corpus() -> list:
+    """
+    :return: all frames as (routing, payload bytes, payload str)
+    """
+    return [
+        (route, pld, IGaten.decode_ascii(pld)[1])
+        for frames in CORPUS.values() for route, pld in frames
+    ]
+
+
+def benchmarks() -> dict:
+    """
+    :return: {name: (function running once over the corpus, calls per run)}
+    """
+    frames = corpus()
+    mice = [(r, p) for r, p in CORPUS["mice"]]
+    ygate = Ygate()
+    ygate_1k = Ygate()  # with 1000 site rules
+    ygate_1k.rules = Rules("\n".join(
+        f"drop call prefix DX{n:03d}\n"
+        f"drop payload contains SPAM{n:03d}\n"
+        f"drop route match ,XX{n:03d}[0-9]*"
+        for n in range(334)
+    ), APRS_DATA_TYPE)
+    pos = ((14, 7.09, "N"), (120, 58.07, "E"), (150., "m"))
+    b91 = [IGaten.b91_encode(v) for v in range(1000, 68000000, 6800000)]
+
+    def f_decode():
+        for _, pld, _ in frames:
+            IGaten.decode_ascii(pld)
+
+    def f_mic_e():
+        for route, pld in mice:
+            IGaten.mic_e_decode(route, pld)
+
+    def f_is_routing():
+        for route, _, _ in frames:
+            ygate.is_routing(route)
+
+    def f_check_routing():
+        for route, _, pld in frames:
+            ygate.check_routing(route, pld)
+
+    def f_check_routing_1k():
+        for route, _, pld in frames:
+            ygate_1k.check_routing(route, pld)
+
+    def f_data_type():
+        for route, _, pld in frames:
+            ygate.get_data_type(route, pld)
+
+    def f_b91_encode():
+        for val in range(1000, 68000000, 6800000):
+            IGaten.b91_encode(val)
+
+    def f_b91_decode():
+        for val in b91:
+            IGaten.b91_decode(val)
+
+    def f_compress():
+        IGaten.compress_position(*pos)
+
+    return {
+        "decode_ascii": (f_decode, len(frames)),
+        "mic_e_decode": (f_mic_e, len(mice)),
+        "is_routing": (f_is_routing, len(frames)),
+        "check_routing": (f_check_routing, len(frames)),
+        "check_routing_1k": (f_check_routing_1k, len(frames)),
+        "get_data_type": (f_data_type, len(frames)),
+        "b91_encode": (f_b91_encode, len(b91)),
+        "b91_decode": (f_b91_decode, len(b91)),
+        "compress_position": (f_compress, 1),
+    }
+
+
+def cpu_name() -> str:
+    """
+    :return: CPU model, the processor type if unknown
+    """
+    try:
+        with open("/proc/cpuinfo") as inp:
+            for line in inp:
+                if line.startswith("model name"):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def run(number: int = 2000, repeat: int = 5) -> dict:
+    """
+    Runs all benchmarks
+    :param number: corpus passes per measurement
+    :param repeat: measurements, the best one is used
+    :return: {name: us per call}
+    """
+    results = {}
+    for name, (func, calls) in benchmarks().items():
+        best = min(timeit.repeat(func, number=number, repeat=repeat))
+        results[name] = round(best / number / calls * 1e6, 4)
+    return results
+
+
+def check(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list:
+    """
+    :param results: {name: us per call}
+    :param baseline: {name: us per call}
+    :param tolerance: allowed slow down, 0.25 = 25 %
+    :return: list of (name, baseline, result) slower than allowed
+    """
+    return [
+        (name, baseline[name], res) for name, res in results.items()
+        if name in baseline and res > baseline[name] * (1. + tolerance)
+    ]
+
+
+def main(argv: list = None) -> int:
+    """
+    Command line entry
+    :return: exit code, 1 if --check found a regression
+    """
+    parser = argparse.ArgumentParser(description="Ygate packet path benchmarks")
+    parser.add_argument("--number", type=int, default=2000, help="passes per measurement")
+    parser.add_argument("--output", default=OUTPUT, help="results as JSON")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline JSON")
+    parser.add_argument("--save-baseline", action="store_true", help="store results as baseline")
+    parser.add_argument("--check", action="store_true", help="fail on regression")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    opt = parser.parse_args(argv)
+
+    new_baseline = opt.save_baseline or opt.check and not os.path.exists(opt.baseline)
+    logging.disable(logging.CRITICAL)
+    try:
+        runs = [run(opt.number) for _ in range(BASELINE_RUNS if new_baseline else 1)]
+        results = {name: statistics.median(r[name] for r in runs) for name in runs[0]}
+    finally:
+        logging.disable(logging.NOTSET)
+    report = {
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpu": cpu_name(),
+        "unit": "us/call",
+        "results": results,
+    }
+    with open(opt.output, "w") as out:
+        json.dump(report, out, indent=2)
+    for name, res in results.items():
+        print(f"{name:18} {res:10.3f} us")
+    if new_baseline:  # --check without a baseline file saves one
+        with open(opt.baseline, "w") as out:
+            json.dump(report, out, indent=2)
+        print(f"Baseline written to {opt.baseline}")
+    if opt.check:
+        if new_baseline:
+            return 0
+        with open(opt.baseline) as inp:
+            base_report = json.load(inp)
+        if any(base_report.get(key) != report[key] for key in ("cpu", "python")):
+            print(f"Baseline from {base_report.get('cpu')} Python {base_report['python']}, "
+                  f"save a baseline on this machine for a meaningful check")
+        slow = check(results, base_report["results"], opt.tolerance)
+        for name, base, res in slow:
+            print(f"REGRESSION {name}: {base:.3f} -> {res:.3f} us")
+        return 1 if slow else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
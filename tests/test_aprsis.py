@@ -0,0 +1,47 @@
+"""
+Unit tests for the APRS-IS inbound stream
+"""
+import socket
+import datetime
+from unittest import TestCase
+from IGaten.aprsis import LineStream, IsStats, server_lag
+
+
+class TestAprsIs(TestCase):
+    def setUp(self) -> None:
+        self.srv, self.cli = socket.socketpair()
+        self.stream = LineStream(self.cli)
+
+    def tearDown(self) -> None:
+        self.srv.close()
+        self.cli.close()
+
+    def test_fill_splits_lines(self):
+        self.srv.sendall(b"# aprsc 2.1\r\nDU1KG-1>APRS:!1407.09N/12058.07E#\r\nDU1K")
+        self.assertGreater(self.stream.fill(), 0)
+        self.assertEqual(
+            self.stream.pop_lines(),
+            [b"# aprsc 2.1", b"DU1KG-1>APRS:!1407.09N/12058.07E#"]
+        )
+        self.assertEqual(self.stream.pop_lines(), [])
+        self.srv.sendall(b"G-2>APRS:>status\n")
+        self.assertEqual(self.stream.readline(), b"DU1KG-2>APRS:>status")
+
+    def test_readline_closed(self):
+        self.srv.close()
+        self.assertEqual(self.stream.readline(), b"")
+
+    def test_server_lag(self):
+        now = datetime.datetime(2026, 10, 19, 10, 22, 41, tzinfo=datetime.timezone.utc)
+        line = b"# aprsc 2.1.10-gd72a17b 19 Oct 2026 10:22:31 GMT T2TEST 1.2.3.4:14580"
+        self.assertEqual(server_lag(line, now.timestamp()), 10.0)
+        self.assertIsNone(server_lag(b"# logresp DU1KG-10 verified"))
+
+    def test_is_stats(self):
+        stat = IsStats()
+        stat.count("POS ")
+        stat.count("POS ")
+        stat.count("MSG ")
+        self.assertEqual(stat.lines, 3)
+        self.assertEqual(stat.types, {"POS ": 2, "MSG ": 1})
+        self.assertIn("POS:2", stat.summary())
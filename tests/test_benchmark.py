@@ -0,0 +1,47 @@
+"""
+Checks that the microbenchmarks run and detect regressions
+"""
+import os
+import json
+import tempfile
+from unittest import TestCase
+from tests import benchmark
+
+
+class TestBenchmark(TestCase):
+    def test_run_and_check(self):
+        tmp = tempfile.mkdtemp()
+        out = os.path.join(tmp, "bench.json")
+        base = os.path.join(tmp, "base.json")
+        self.assertEqual(benchmark.main(
+            ["--number", "2", "--output", out, "--baseline", base, "--save-baseline"]
+        ), 0)
+        with open(out) as inp:
+            results = json.load(inp)["results"]
+        self.assertEqual(set(results), set(benchmark.benchmarks()))
+        self.assertTrue(all(v > 0 for v in results.values()))
+        self.assertEqual(benchmark.check(results, results), [])
+        slower = dict(results, decode_ascii=results["decode_ascii"] * 2)
+        self.assertEqual(
+            benchmark.check(slower, results),
+            [("decode_ascii", results["decode_ascii"], slower["decode_ascii"])]
+        )
+        os.remove(out)
+        os.remove(base)
+        os.rmdir(tmp)
+
+    def test_check_without_baseline_saves_it(self):
+        tmp = tempfile.mkdtemp()
+        out = os.path.join(tmp, "bench.json")
+        base = os.path.join(tmp, "base.json")
+        args = ["--number", "2", "--output", out, "--baseline", base, "--check"]
+        self.assertEqual(benchmark.main(args), 0)
+        self.assertTrue(os.path.exists(base))
+        self.assertIn(benchmark.main(args + ["--tolerance", "100"]), (0, 1))
+        for name in (out, base):
+            os.remove(name)
+        os.rmdir(tmp)
+
+    def test_corpus_mic_e(self):
+        decoded = [benchmark.IGaten.mic_e_decode(r, p) for r, p in benchmark.CORPUS["mice"]]
+        self.assertTrue(decoded[0].startswith("Pos:"))
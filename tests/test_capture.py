@@ -0,0 +1,66 @@
+"""
+Unit tests for the binary capture file
+"""
+import os
+import tempfile
+from unittest import TestCase
+from IGaten.capture import CaptureWriter, CaptureReader
+
+FRAMES = [
+    b"DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1 [04/30/20 10:00:00] <UI>:\r\n"
+    b'`0V l \x1c-/`":-}435.350MHz DU1KG home 73 Klaus_%\r\n',
+    b"DY1P>APWW10,WIDE2-1 [04/30/20 10:00:01] <UI R>:\r\n"
+    b"!1407.09N/12058.07E# invalid \xb0 byte\r\n",
+    b"out of sync line\r\n",
+]
+
+
+class TestCapture(TestCase):
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp(suffix=".ycap")
+        os.close(fd)
+        os.remove(self.path)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def write(self, n_frames: int, t_0: float = 1000.0, close: bool = True):
+        cap = CaptureWriter(self.path)
+        cap.INDEX_EVERY = 7
+        for i in range(n_frames):
+            cap.write(FRAMES[i % len(FRAMES)], t_0 + i)
+        if close:
+            cap.close()
+        else:
+            cap.file.close()
+
+    def test_lossless_roundtrip(self):
+        self.write(30)
+        rdr = CaptureReader(self.path)
+        frames = list(rdr.frames())
+        self.assertEqual(len(frames), 30)
+        self.assertEqual(frames[1], (1001.0, FRAMES[1]))
+        self.assertEqual(len(rdr.blocks), 5)
+        rdr.close()
+
+    def test_time_range_and_call(self):
+        self.write(30)
+        rdr = CaptureReader(self.path)
+        self.assertEqual([t for t, _ in rdr.frames(1010.0, 1012.0)], [1010., 1011., 1012.])
+        frames = list(rdr.frames(call="dy1p"))
+        self.assertEqual(len(frames), 10)
+        self.assertTrue(all(f == FRAMES[1] for _, f in frames))
+        self.assertEqual(list(rdr.frames(call="DU1KG")), [])
+        rdr.close()
+
+    def test_unclean_close_and_append(self):
+        self.write(10, close=False)  # last 3 frames not indexed
+        rdr = CaptureReader(self.path)
+        self.assertEqual(len(rdr), 10)
+        rdr.close()
+        self.write(5, t_0=2000.0)
+        rdr = CaptureReader(self.path)
+        self.assertEqual(len(rdr), 15)
+        self.assertEqual(len(rdr.tail), 0)
+        self.assertEqual(len(list(rdr.frames(start=2000.0))), 5)
+        rdr.close()
@@ -0,0 +1,185 @@
+"""
+Unit tests for the IGate cluster mode
+"""
+import io
+import time
+import socket
+import contextlib
+import multiprocessing
+from unittest import TestCase
+from IGaten.cluster import Cluster, digest
+from IGaten.ygate import Packet, Ygate, parse_options
+
+
+def free_ports(num: int) -> list:
+    socks = [socket.socket(socket.AF_INET, socket.SOCK_DGRAM) for _ in range(num)]
+    for sck in socks:
+        sck.bind(("127.0.0.1", 0))
+    ports = [sck.getsockname()[1] for sck in socks]
+    for sck in socks:
+        sck.close()
+    return ports
+
+
+def frame(num: int) -> Packet:
+    return Packet(0., f"DU{num % 10}ABC", f"DU{num % 10}ABC>APRS,WIDE1-1",
+                  f"!pos {num}", f"!pos {num}\r\n".encode(), "POS ", False, "")
+
+
+def wait_for(cond, timeout: float = 5.0) -> bool:
+    end = time.time() + timeout
+    while time.time() < end:
+        if cond():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def node_main(name: str, port: int, peers: list, frames: int, start: float, result):
+    """
+    One cluster node in its own process, all nodes hear the same frames
+    at the same time
+    """
+    gated = []
+    node = Cluster(name, port, peers)
+    node.STATE = 0.2
+    node.start(lambda pkt: gated.append(pkt.payload))
+    wait_for(lambda: len(node.live_nodes()) == len(peers) + 1)
+    time.sleep(max(0., start - time.time()))
+    for num in range(frames):
+        pkt = frame(num)
+        if not node.filter(pkt):
+            gated.append(pkt.payload)
+        time.sleep(0.05)
+    time.sleep(4 * node.HOLD)
+    node.stop()
+    result.put((name, gated))
+
+
+class TestCluster(TestCase):
+    def setUp(self) -> None:
+        port_a, port_b = free_ports(2)
+        self.node_a = Cluster("A", port_a, [("127.0.0.1", port_b)])
+        self.node_b = Cluster("B", port_b, [("127.0.0.1", port_a)])
+        for node in (self.node_a, self.node_b):
+            node.STATE = 0.1
+        self.released = []
+        self.node_a.start(self.released.append)
+        self.node_b.start(self.released.append)
+        self.assertTrue(wait_for(lambda: self.node_b.live_nodes() == ["A", "B"]))
+
+    def tearDown(self) -> None:
+        self.node_a.stop()
+        self.node_b.stop()
+
+    def test_digest(self):
+        pkt = frame(1)
+        self.assertEqual(len(digest(pkt)), 8)
+        # path is not part of the APRS-IS dupe check
+        self.assertEqual(digest(pkt), digest(pkt._replace(routing="DU1ABC>APRS,DY1P*")))
+        self.assertNotEqual(digest(pkt), digest(frame(2)))
+
+    def test_first_node_gates_second_drops(self):
+        pkt = frame(1)
+        # both nodes hear the frame at the same time
+        self.assertEqual(self.node_b.filter(pkt), "Cluster hold 0.3 s")
+        self.assertEqual(self.node_a.filter(pkt), "")
+        time.sleep(2 * self.node_b.HOLD)
+        self.assertEqual(self.released, [])
+        self.assertEqual(self.node_b.stat["dupes"], 1)
+        # digipeated copy heard later by the second node
+        self.assertEqual(self.node_b.filter(pkt), "Cluster dupe, not gated")
+
+    def test_held_frame_released(self):
+        pkt = frame(2)
+        self.assertTrue(self.node_b.filter(pkt).startswith("Cluster hold"))
+        self.assertTrue(wait_for(lambda: self.released == [pkt]))
+        self.assertTrue(wait_for(lambda: self.node_a.claimed(digest(pkt))))
+        self.assertEqual(self.node_a.filter(pkt), "Cluster dupe, not gated")
+
+    def test_uplink_down_leaves_ranking(self):
+        ygate = Ygate()
+        ygate.cluster = self.node_a
+        ygate.uplink_done("beacon", b"b", "failed")
+        self.assertFalse(self.node_a.uplink_ok)
+        pkt = frame(4)
+        self.assertEqual(self.node_a.filter(pkt), "")  # tries, but does not claim
+        self.assertFalse(self.node_a.claimed(digest(pkt)))
+        self.assertTrue(wait_for(lambda: self.node_b.live_nodes() == ["B"]))
+        self.assertEqual(self.node_b.filter(pkt), "")  # B gates at once
+        ygate.uplink_done("gated", b"g", "sent")
+        self.assertTrue(wait_for(lambda: self.node_b.live_nodes() == ["A", "B"]))
+
+    def test_merged_state(self):
+        self.node_a.sink(frame(1)._replace(gated=True))
+        self.node_b.sink(frame(2))
+        self.node_b.sink(frame(3)._replace(msg="Invalid routing"))
+        self.assertTrue(wait_for(lambda: self.node_a.merged()[0] == [1, 1, 1]))
+        # own calls come from Ygate.pstat[3]
+        counts, calls = self.node_a.merged(["DU1ABC", "DU9XYZ"])
+        self.assertEqual(calls, {"DU1ABC", "DU2ABC", "DU9XYZ"})
+        self.assertIn("nodes A, B", self.node_a.summary())
+
+    def test_ignores_garbage(self):
+        self.node_a.handle(b"")
+        self.node_a.handle(b"XX\x00\x00")
+        self.node_a.handle(b"YGS\x01Cnot json")
+        self.assertEqual(self.node_a.merged()[0], [0, 0, 0])
+
+    def test_ygate_counts_held_frames(self):
+        ygate = Ygate()
+        ygate.remove_filter(ygate.throttle.filter)
+        ygate.cluster = self.node_b
+        ygate.add_filter(self.node_b.filter)
+        ygate.add_sink(self.node_b.sink)
+        pkts = []
+        ygate.add_sink(pkts.append)
+        self.node_b.release = ygate.cluster_release
+        self.node_b.discard = ygate.cluster_discard
+        ygate.outbound.send = lambda cls, data: True
+        ygate.outbound.start()
+        with contextlib.redirect_stdout(io.StringIO()):
+            ygate.process_frame(0, "DU2ABC>APRS,WIDE1-1", b"!pos 2\r\n")
+            self.assertEqual((ygate.pstat[:3], ygate.drops), ([0, 0, 0], {}))  # held
+            self.assertEqual(pkts, [])
+            self.assertTrue(wait_for(lambda: ygate.pstat[0] == 1))  # released and sent
+            self.assertEqual(self.node_a.filter(frame(3)), "")  # claimed by A first
+            ygate.process_frame(0, "DU3ABC>APRS,WIDE1-1", b"!pos 3\r\n")
+            self.assertTrue(wait_for(lambda: ygate.pstat[1] == 1))
+        ygate.outbound.stop()
+        self.assertEqual(ygate.pstat[:3], [1, 1, 0])
+        self.assertEqual(ygate.drops, {"Cluster dupe, not gated": 1})
+        self.assertEqual(self.node_b.counts, [1, 1, 0])
+        self.assertEqual([(p.call, p.gated, p.msg) for p in pkts],
+                         [("DU2ABC", True, ""), ("DU3ABC", False, "Cluster dupe, not gated")])
+
+    def test_options(self):
+        opt = parse_options(["--cluster", "gw1", "--peers", "10.0.0.2:14590,host:1"])
+        self.assertEqual(opt.cluster, "gw1")
+        self.assertEqual(opt.peers, [("10.0.0.2", 14590), ("host", 1)])
+        with self.assertRaises(SystemExit):
+            parse_options(["--peers", "nohost"])
+
+
+class TestClusterProcesses(TestCase):
+    def test_one_uplink_per_frame(self):
+        names = ["gw1", "gw2", "gw3"]
+        ports = free_ports(len(names))
+        result = multiprocessing.Queue()
+        start = time.time() + 1.5
+        frames = 10
+        procs = [
+            multiprocessing.Process(target=node_main, args=(
+                name, port,
+                [("127.0.0.1", p) for p in ports if p != port],
+                frames, start, result
+            )) for name, port in zip(names, ports)
+        ]
+        for proc in procs:
+            proc.start()
+        gated = dict(result.get(timeout=20) for _ in procs)
+        for proc in procs:
+            proc.join(5)
+        uplinks = sorted(p for payloads in gated.values() for p in payloads)
+        self.assertEqual(uplinks, sorted(frame(n).payload for n in range(frames)))
+        self.assertEqual(len(gated["gw1"]), frames)  # first ranked node
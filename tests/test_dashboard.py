@@ -0,0 +1,123 @@
+"""
+Unit tests for the live web dashboard
+"""
+import io
+import json
+import socket
+import contextlib
+import urllib.request
+from unittest import TestCase
+from IGaten.dashboard import Dashboard
+from IGaten.ygate import Packet, Ygate, decode_ascii
+
+
+def frame(num: int, gated: bool = True) -> Packet:
+    return Packet(1e9 + num, f"DU{num}ABC", f"DU{num}ABC>APRS,WIDE1-1", f"!pos {num}\r\n",
+                  f"!pos {num}\r\n".encode(), "POS ", gated, "" if gated else "Flood")
+
+
+def read_event(sck: socket.socket, buf: bytearray) -> tuple:
+    """
+    :return: event name and data of the next event, skipping comments
+    """
+    while True:
+        while b"\n\n" not in buf or buf.startswith(b"HTTP/") and b"\r\n\r\n" not in buf:
+            chunk = sck.recv(65536)
+            if not chunk:
+                raise EOFError
+            buf.extend(chunk)
+        if buf.startswith(b"HTTP/"):  # response header
+            buf[:] = buf[buf.index(b"\r\n\r\n") + 4:]
+            continue
+        end = buf.index(b"\n\n")
+        block, buf[:] = bytes(buf[:end]), buf[end + 2:]
+        lines = dict(
+            line.split(b": ", 1) for line in block.split(b"\n") if not line.startswith(b":")
+        )
+        if lines:
+            return lines[b"event"].decode(), json.loads(lines[b"data"])
+
+
+class TestDashboard(TestCase):
+    def setUp(self) -> None:
+        self.counts = {"gated": 0, "not_gated": 0, "invalid": 0, "calls": 0, "up": "0 h"}
+        self.dash = Dashboard(0, "MYCALL-10", lambda: dict(self.counts), "127.0.0.1")
+        self.dash.TICK = 0.05
+        self.dash.start()
+        self.url = f"http://127.0.0.1:{self.dash.port}"
+
+    def tearDown(self) -> None:
+        self.dash.stop()
+
+    def viewer(self) -> tuple:
+        sck = socket.create_connection(("127.0.0.1", self.dash.port), timeout=5)
+        sck.sendall(b"GET /events HTTP/1.1\r\nHost: x\r\n\r\n")
+        return sck, bytearray()
+
+    def test_page_and_state(self):
+        with urllib.request.urlopen(self.url + "/", timeout=5) as rsp:
+            page = rsp.read()
+        self.assertIn(b"EventSource", page)
+        self.assertNotIn(b"innerHTML", page)  # calls from RF are inserted as text only
+        self.dash.sink(frame(1))
+        self.dash.render()
+        with urllib.request.urlopen(self.url + "/state.json", timeout=5) as rsp:
+            state = json.load(rsp)
+        self.assertEqual(state["stats"]["call"], "MYCALL-10")
+        self.assertEqual(state["frames"][0][1], "DU1ABC")
+        self.assertEqual(state["stats"]["heard"][0][0], "DU1ABC")
+
+    def test_events_shared_by_viewers(self):
+        self.dash.sink(frame(1))
+        self.dash.render()
+        viewers = [self.viewer() for _ in range(3)]
+        for sck, buf in viewers:
+            self.assertEqual(read_event(sck, buf), ("reset", 1))
+            self.assertEqual(read_event(sck, buf)[1][0][1], "DU1ABC")
+            self.assertEqual(read_event(sck, buf)[0], "stats")
+        self.dash.sink(frame(2, gated=False))
+        self.counts["gated"] = 1
+        for sck, buf in viewers:
+            event, frames = read_event(sck, buf)
+            self.assertEqual(event, "frames")
+            self.assertEqual([f[1] for f in frames], ["DU2ABC"])
+            self.assertEqual(frames[0][3:5], [False, "Flood"])
+            event, stats = read_event(sck, buf)
+            self.assertEqual(stats["gated"], 1)
+            self.assertEqual(stats["viewers"], 3)
+            sck.close()
+
+    def test_bounded(self):
+        self.dash.stop()
+        self.dash.running = False
+        for num in range(self.dash.RING + self.dash.MAX_STATIONS + 10):
+            self.dash.sink(frame(num))
+        self.assertEqual(len(self.dash.ring), self.dash.RING)
+        self.assertEqual(len(self.dash.heard), self.dash.MAX_STATIONS)
+        self.dash.render()
+        self.assertEqual(len(json.loads(self.dash.state)["stats"]["heard"]), self.dash.TOP)
+
+    def test_too_many_viewers(self):
+        self.dash.MAX_VIEWERS = 0
+        with self.assertRaises(urllib.error.HTTPError) as err:
+            urllib.request.urlopen(self.url + "/events", timeout=5)
+        self.assertEqual(err.exception.code, 503)
+
+    def test_ygate_stats(self):
+        ygate = Ygate()
+        stats = ygate.dashboard_stats()
+        self.assertEqual(stats["gated"], 0)
+        self.assertTrue(stats["up"].startswith("0 days"))
+        self.assertEqual(stats["aprsis"], "")
+        ygate.is_stat.count("POS ")
+        self.assertIn("1 IS frames", ygate.dashboard_stats()["aprsis"])
+
+    def test_no_ansi_in_frames(self):
+        ygate = Ygate()
+        pkts = []
+        ygate.add_sink(pkts.append)
+        with contextlib.redirect_stdout(io.StringIO()):
+            ygate.process_frame(*decode_ascii(b"DU\xffKG>APRS"), b">st\xfeatus\r\n")
+        text = Dashboard.frame(pkts[0])[-1]
+        self.assertNotIn("\033", text)
+        self.assertEqual(text, "DU\\xffKG>APRS:>st\\xfeatus")
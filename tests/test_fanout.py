@@ -0,0 +1,75 @@
+"""
+Unit tests for the local fan-out server
+"""
+import socket
+import time
+from unittest import TestCase
+from IGaten.fanout import FanoutServer
+from IGaten.ygate import Packet
+
+
+def read_lines(sck: socket.socket, num: int, timeout: float = 5.0) -> list:
+    sck.settimeout(timeout)
+    data = b""
+    while data.count(b"\r\n") < num:
+        chunk = sck.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+    return data.split(b"\r\n")[:num]
+
+
+class TestFanout(TestCase):
+    def setUp(self) -> None:
+        self.srv = FanoutServer(0, "MYCALL-10", "127.0.0.1")
+        self.srv.start()
+
+    def tearDown(self) -> None:
+        self.srv.stop()
+
+    def connect(self) -> socket.socket:
+        sck = socket.create_connection(("127.0.0.1", self.srv.port))
+        self.assertEqual(read_lines(sck, 1), [b"# Ygate-n fan-out"])
+        for _ in range(100):
+            if len(self.srv.clients) > 0:
+                break
+            time.sleep(0.01)
+        return sck
+
+    def test_login_and_broadcast(self):
+        cli1 = self.connect()
+        cli2 = self.connect()
+        cli1.sendall(b"user DU1KG pass -1 vers test 1.0\r\n")
+        self.assertEqual(read_lines(cli1, 1), [b"# logresp DU1KG unverified, server YGATE"])
+        pkt = Packet(0., "DU1KG-1", "DU1KG-1>APRS,WIDE1-1", "!pos", b"!pos\xb0\r\n",
+                     "POS ", True, "")
+        self.srv.sink(pkt._replace(gated=False, msg="NOGATE not gated"))
+        self.srv.sink(pkt._replace(call="", routing="", raw=b"\r\n"))
+        self.srv.sink(pkt)
+        self.srv.sink(pkt._replace(msg="Invalid routing"))
+        line = b"DU1KG-1>APRS,WIDE1-1,qAO,MYCALL-10:!pos\xb0"
+        self.assertEqual(read_lines(cli1, 1), [line])
+        self.assertEqual(read_lines(cli2, 1), [line])
+        self.srv.ALL = True
+        self.srv.sink(pkt._replace(gated=False, payload=">flood", raw=b">flood\r\n"))
+        self.assertEqual(read_lines(cli1, 1), [b"DU1KG-1>APRS,WIDE1-1,qAO,MYCALL-10:>flood"])
+        cli1.close()
+        cli2.close()
+
+    def test_slow_client_does_not_block(self):
+        self.srv.MAX_QUEUE = 10
+        self.srv.MAX_DROPS = 50
+        slow = self.connect()
+        slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+        line = b"X" * 1000 + b"\r\n"
+        start = time.time()
+        for _ in range(5000):
+            self.srv.broadcast(line)
+        self.assertLess(time.time() - start, 2.0)
+        for _ in range(200):
+            if not self.srv.clients:
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.srv.clients, {})
+        self.assertEqual(self.srv.disconnected, 1)
+        slow.close()
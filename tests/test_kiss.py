@@ -0,0 +1,83 @@
+"""
+Unit tests for KISS/AX.25 input
+"""
+from unittest import TestCase
+import IGaten
+from IGaten.ygate import Ygate
+from IGaten.kiss import kiss_escape, kiss_unescape, encode_address, decode_ax25
+
+MICE = b'`0V l \x1c-/`":-}435.350MHz DU1KG home 73 Klaus_%'
+
+
+def ui_frame(src: str, dest: str, path: list, payload: bytes, rep: int = 0) -> bytes:
+    addrs = [encode_address(dest), encode_address(src, last=not path)]
+    for i, digi in enumerate(path):
+        addrs.append(encode_address(digi, last=i == len(path) - 1, rep=i < rep))
+    return b"".join(addrs) + b"\x03\xf0" + payload
+
+
+class FakeSerial:
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def read_until(self, expected=b"\n"):
+        end = self.data.find(expected)
+        end = len(self.data) if end < 0 else end + len(expected)
+        out, self.data = self.data[:end], self.data[end:]
+        return out
+
+
+class TestKiss(TestCase):
+    def test_escape(self):
+        data = b"\x00a\xc0b\xdbc"
+        frame = kiss_escape(data)
+        self.assertEqual(frame, b"\xc0\x00a\xdb\xdcb\xdb\xddc\xc0")
+        self.assertEqual(kiss_unescape(frame[1:-1]), data)
+
+    def test_decode_ax25(self):
+        frame = ui_frame("DU1KG-1", "Q4PWQ0", ["DY1P", "WIDE1", "WIDE2-1"], MICE, rep=2)
+        self.assertEqual(
+            decode_ax25(frame),
+            (0, "DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1", MICE + b"\r\n")
+        )
+        self.assertEqual(
+            decode_ax25(ui_frame("DY1P", "APRS", [], b"!pos\rjunk")),
+            (0, "DY1P>APRS", b"!pos\r\n")
+        )
+        self.assertEqual(decode_ax25(ui_frame("dy1p", "APRS", [], b"!"))[0], 1)
+        self.assertIsNone(decode_ax25(frame.replace(b"\x03\xf0", b"\x13\xcf")))
+        with self.assertRaises(ValueError):
+            decode_ax25(frame[:10])
+
+    def test_same_gating_as_yaesu(self):
+        frame = ui_frame("DU1KG-1", "Q4PWQ0", ["DY1P", "WIDE1", "WIDE2-1"], MICE, rep=2)
+        ygate = Ygate(options=IGaten.parse_options(["--kiss"]))
+        ygate.ser = FakeSerial(
+            b"\xc0\xc0\x06\x01\xc0" + b"\xc0\x00" + b"\x00\xc0"
+            + kiss_escape(b"\x00" + frame)
+        )
+        kiss = ygate.read_kiss()
+        self.assertEqual(ygate.pstat[2], 1)  # truncated frame
+        ygate.ser = FakeSerial(
+            b"DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1 [04/30/20 10:00:00] <UI>:\r\n"
+            + MICE + b"\r\n"
+        )
+        self.assertEqual(kiss, ygate.read_yaesu())
+        sent = []
+        ygate.do_gating = lambda packet, pkt=None: sent.append(packet) or True
+        ygate.process_frame(*kiss)
+        self.assertEqual(
+            sent, [b"DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1,qAO,MYCALL-10:" + MICE + b"\r\n"]
+        )
+
+    def test_beat_per_frame(self):
+        netrom = ui_frame("DY1P", "APRS", [], b"x").replace(b"\x03\xf0", b"\x03\xcf")
+        ygate = Ygate(options=IGaten.parse_options(["--kiss"]))
+        ygate.ser = FakeSerial(
+            kiss_escape(b"\x00" + netrom) * 3 + b"\xc0\x06\x01\xc0"
+            + kiss_escape(b"\x00" + ui_frame("DU1KG-1", "APRS", [], b">status"))
+        )
+        beats = []
+        ygate.watchdog.beat = beats.append
+        self.assertEqual(ygate.read_kiss()[1], "DU1KG-1>APRS")
+        self.assertGreaterEqual(beats.count("serial"), 5)  # skipped frames beat too
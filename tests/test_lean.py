@@ -0,0 +1,94 @@
+"""
+Unit tests for the low memory profile (--lean)
+"""
+import os
+import sys
+import socket
+import subprocess
+from unittest import TestCase
+import IGaten
+from IGaten.ygate import Ygate, is_internet, rss_mb
+from IGaten.throttle import TokenBuckets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SOAK = """
+import os, sys, tempfile, contextlib
+from IGaten.ygate import Ygate, parse_options, rss_mb
+from IGaten.simulator import FrameGenerator
+
+Ygate.LOG_FILE = os.path.join(tempfile.mkdtemp(), "ygate.log")
+ygate = Ygate(options=parse_options(["--lean"]))
+gen = FrameGenerator(seed=1, stations=3000)
+
+
+class Ser:
+    lines = []
+
+    def read_until(self, expected=b"\\n"):
+        if not self.lines:
+            self.lines = gen.frame().splitlines(keepends=True)[::-1]
+        return self.lines.pop()
+
+
+ygate.ser = Ser()
+with open(os.devnull, "w") as null, contextlib.redirect_stdout(null):
+    for num in range(20000):
+        ygate.process_frame(*ygate.read_yaesu())
+        if num == 5000:
+            warm = rss_mb()
+print(warm, rss_mb(), len(ygate.pstat[3]))
+os.remove(Ygate.LOG_FILE)
+"""
+
+
+def run_python(code: str) -> str:
+    return subprocess.run(
+        [sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONPATH=ROOT), timeout=120
+    ).stdout
+
+
+class TestLean(TestCase):
+    def test_no_heavy_imports(self):
+        loaded = run_python(
+            "import sys, IGaten; print(' '.join(m for m in "
+            "('requests', 'sqlite3', 'http.server', 'multiprocessing') if m in sys.modules))"
+        )
+        self.assertEqual(loaded.strip(), "")
+
+    def test_is_internet_lean(self):
+        server = socket.socket()
+        server.bind(("127.0.0.1", 0))
+        server.listen(1)
+        port = server.getsockname()[1]
+        self.assertTrue(is_internet(f"http://127.0.0.1:{port}/", 2, lean=True))
+        server.close()
+        self.assertFalse(is_internet(f"http://127.0.0.1:{port}/", 2, lean=True))
+
+    def test_bounded_calls(self):
+        ygate = Ygate(options=IGaten.parse_options(["--lean"]))
+        ygate.LEAN_CALLS = 3
+        for num in range(5):
+            self.assertTrue(ygate.is_routing(f"DU{num}KG>APRS"))
+        self.assertEqual(ygate.pstat[3], ["DU2KG", "DU3KG", "DU4KG"])
+
+    def test_interned_calls(self):
+        ygate = Ygate()
+        calls = []
+        ygate.add_sink(lambda pkt: calls.append(pkt.call))
+        for _ in range(2):
+            ygate.process_frame(0, "".join(["DU1KG", "-1>APRS"]), b">status\r\n")
+        self.assertIs(calls[0], calls[1])
+
+    def test_slots(self):
+        buckets = TokenBuckets()
+        buckets.allow("DU1KG")
+        self.assertFalse(hasattr(buckets.buckets["DU1KG"], "__dict__"))
+
+    def test_rss_budget(self):
+        self.assertGreater(rss_mb(), 0.)
+        warm, end, calls = run_python(SOAK).split()
+        self.assertLess(float(end), Ygate.RSS_BUDGET)
+        self.assertLess(float(end) - float(warm), 2.)  # no growth with traffic
+        self.assertEqual(int(calls), Ygate.LEAN_CALLS)
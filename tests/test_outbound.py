@@ -0,0 +1,134 @@
+"""
+Unit tests for the outbound priority scheduler
+"""
+import io
+import time
+import threading
+import contextlib
+from unittest import TestCase
+from IGaten.outbound import Outbound, OutClass
+from IGaten.ygate import Ygate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestOutbound(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.sent = []
+        self.out = Outbound(
+            lambda cls, data: self.sent.append((cls, data)) or True,
+            {
+                "gated": OutClass(0, 3, 30., False),
+                "reply": OutClass(1, 5, 60., False),
+                "beacon": OutClass(3, 1, 600., True),
+            },
+            self.clock
+        )
+        self.out.running = True
+
+    def drain(self) -> list:
+        items = []
+        while any(self.out.depth().values()):
+            cls, _, data, _ = self.out.next_item()
+            items.append((cls, data))
+        return items
+
+    def test_priority_order(self):
+        self.out.put("beacon", b"b1")
+        self.out.put("reply", b"r1")
+        self.out.put("gated", b"g1")
+        self.out.put("gated", b"g2")
+        self.assertEqual(
+            self.drain(),
+            [("gated", b"g1"), ("gated", b"g2"), ("reply", b"r1"), ("beacon", b"b1")]
+        )
+
+    def test_beacon_replaced(self):
+        self.out.put("beacon", b"old")
+        self.out.put("beacon", b"new")
+        self.assertEqual(self.out.depth()["beacon"], 1)
+        self.assertEqual(self.drain(), [("beacon", b"new")])
+        self.assertEqual(self.out.stat["beacon"].replaced, 1)
+
+    def test_limit_and_deadline(self):
+        results = []
+        self.out.done = lambda cls, data, result, ref: results.append((data, result))
+        for i in range(5):
+            self.assertEqual(self.out.put("gated", bytes([48 + i])), i < 3)
+        self.assertEqual(self.out.stat["gated"].dropped, 2)
+        self.clock.now = 31.
+        self.out.put("reply", b"late")
+        self.assertEqual(self.drain(), [("reply", b"late")])
+        self.assertEqual(self.out.stat["gated"].expired, 3)
+        self.assertIn("expired 3", self.out.summary())
+        self.assertEqual(results, [(b"0", "dropped"), (b"1", "dropped"), (b"2", "expired"),
+                                   (b"3", "expired"), (b"4", "expired")])
+
+    def test_stop_reports_queued(self):
+        results = []
+        self.out.done = lambda cls, data, result, ref: results.append((cls, data, result))
+        self.out.put("gated", b"g1")
+        self.out.put("beacon", b"b1")
+        self.out.stop()
+        self.assertEqual(self.out.depth(), {"gated": 0, "reply": 0, "beacon": 0})
+        self.assertEqual(results, [("gated", b"g1", "stopped"), ("beacon", b"b1", "stopped")])
+
+    def test_writer_thread(self):
+        done = threading.Event()
+
+        def send(cls, data):
+            self.sent.append((cls, data))
+            if len(self.sent) == 3:
+                done.set()
+            return data != b"fail"
+
+        out = Outbound(send)
+        out.start()
+        out.put("gated", b"g1")
+        out.put("gated", b"fail")
+        out.put("beacon", b"b1")
+        self.assertTrue(done.wait(5.))
+        out.stop()
+        out.thread.join(5.)
+        self.assertEqual(out.stat["gated"].sent, 1)
+        self.assertEqual(out.stat["gated"].failed, 1)
+        self.assertEqual(out.stat["beacon"].sent, 1)
+
+
+class TestYgateUplinkCount(TestCase):
+    def test_gated_counted_when_sent(self):
+        ygate = Ygate()
+        ygate.remove_filter(ygate.throttle.filter)
+        route, pld = "DU1KG-1>APRS,WIDE1-1", b"!1407.09N/12058.07E>\r\n"
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(ygate.do_gating(b"x"))  # writer not running
+            self.assertEqual(ygate.drops, {"No network/internet, not gated": 1})
+            pkts = []
+            ygate.add_sink(pkts.append)
+            ygate.uplink = lambda cls, data: False  # uplink always fails
+            ygate.outbound.send = ygate.uplink
+            ygate.outbound.start()
+            for _ in range(5):
+                ygate.process_frame(0, route, pld)
+            for _ in range(500):
+                if sum(ygate.pstat[:2]) == 6:
+                    break
+                time.sleep(0.01)
+            ygate.outbound.stop()
+        self.assertEqual(ygate.pstat[:3], [0, 6, 0])
+        self.assertEqual(ygate.drops, {"No network/internet, not gated": 6})
+        self.assertEqual(len(pkts), 5)  # once each, when the send failed
+        self.assertEqual({(p.gated, p.msg) for p in pkts},
+                         {(False, "No network/internet, not gated")})
+        ygate.uplink_done("gated", b"y", "sent")
+        ygate.uplink_done("gated", b"z", "dropped")
+        ygate.uplink_done("beacon", b"b", "failed")  # not a gated packet
+        self.assertEqual(ygate.pstat[:2], [1, 7])
+        self.assertEqual(ygate.drops["Uplink queue full, not gated"], 1)
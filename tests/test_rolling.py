@@ -0,0 +1,132 @@
+"""
+Unit tests for the rolling window statistics
+"""
+import random
+import tracemalloc
+from unittest import TestCase
+from IGaten.rolling import BucketRing, SpaceSaving, RollingStats
+from IGaten.ygate import Packet, Ygate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestBucketRing(TestCase):
+    def test_expiry(self):
+        ring = BucketRing(60, 12, 2)
+        ring.add(0, 0.)
+        ring.add(1, 30.)
+        ring.add(1, 59.)
+        self.assertEqual(ring.totals(59.), [1, 2])
+        self.assertEqual(ring.totals(60.), [0, 2])  # first bucket left the window
+        self.assertEqual(ring.totals(94.), [0, 1])
+        self.assertEqual(ring.totals(1e6), [0, 0])  # long idle
+
+    def test_clock_backwards(self):
+        ring = BucketRing(60, 12, 1)
+        ring.add(0, 100.)
+        ring.add(0, 90.)  # counted in the current bucket
+        self.assertEqual(ring.totals(100.), [2])
+
+
+class TestSpaceSaving(TestCase):
+    def test_heavy_hitters(self):
+        rnd = random.Random(5)
+        sketch = SpaceSaving(16)
+        exact = {}
+        for _ in range(20000):
+            call = f"H{rnd.randint(0, 3)}" if rnd.random() < 0.5 else f"C{rnd.randint(0, 999)}"
+            exact[call] = exact.get(call, 0) + 1
+            sketch.add(call)
+        self.assertEqual(len(sketch.count), 16)
+        self.assertEqual(sum(sketch.count.values()), 20000)
+        self.assertEqual(sketch.min, min(sketch.count.values()))
+        for call in ("H0", "H1", "H2", "H3"):
+            self.assertIn(call, sketch.count)
+            self.assertLessEqual(sketch.count[call] - sketch.error[call], exact[call])
+            self.assertGreaterEqual(sketch.count[call], exact[call])
+
+    def test_clear(self):
+        sketch = SpaceSaving(2)
+        for call in "ABCA":
+            sketch.add(call)
+        sketch.clear()
+        sketch.add("D")
+        self.assertEqual(sketch.count, {"D": 1})
+
+
+class TestRollingStats(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.stats = RollingStats(["POS ", "MICE", "INV "], clock=self.clock)
+
+    def test_windows(self):
+        for num in range(30):
+            self.stats.add("POS " if num % 3 else "MICE", f"DU{num % 2}KG")
+            self.clock.now += 10.
+        self.assertEqual(sum(self.stats.counts("1 min").values()), 5)  # 250 .. 290 s
+        self.assertEqual(self.stats.counts("15 min"), {"POS ": 20, "MICE": 10})
+        self.stats.add("NMEA", "DU1KG")  # unknown type, station still counted
+        self.clock.now += 3600.
+        self.assertEqual(self.stats.counts("15 min"), {})
+        self.assertEqual(self.stats.counts("24 h"), {"POS ": 20, "MICE": 10})
+
+    def test_top(self):
+        for _ in range(10):
+            self.stats.add("POS ", "DU1KG")
+        self.stats.add("POS ", "DU2AB")
+        self.assertEqual(self.stats.top("1 min"), [("DU1KG", 10), ("DU2AB", 1)])
+        # previous epoch fades out over the next window
+        self.clock.now = (self.clock.now // 60 + 1) * 60 + 30.
+        self.stats.add("MICE", "DU2AB")
+        self.assertEqual(self.stats.top("1 min", 1), [("DU1KG", 5)])
+        self.clock.now += 120.
+        self.assertEqual(self.stats.top("1 min"), [])
+
+    def test_bulletin(self):
+        self.assertEqual(self.stats.bulletin(), "15 min: 0 pkts")
+        for call in ("DU1KG", "DU1KG", "DU3X"):
+            self.stats.add("MICE", call)
+        self.stats.add("INV ")
+        self.assertEqual(self.stats.bulletin(), "15 min: 4 pkts MICE 3 INV 1, top DU1KG 2")
+        self.assertIn("24 h", self.stats.summary())
+
+    def test_fixed_memory(self):
+        tracemalloc.start()
+        for num in range(2000):
+            self.stats.add("POS ", f"C{num}")
+        before = tracemalloc.get_traced_memory()[0]
+        for num in range(2000, 20000):
+            self.stats.add("POS ", f"C{num}")
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        self.assertLess(after - before, 20000)
+        for sketch in self.stats.sketches.values():
+            self.assertLessEqual(len(sketch[1].count), self.stats.CAPACITY)
+
+
+class TestYgateRolling(TestCase):
+    def test_sink_and_status(self):
+        ygate = Ygate()
+        for _ in range(3):
+            ygate.rolling.sink(Packet(ygate.rolling.clock(), "DU1KG", "DU1KG>APRS", "!pos",
+                                      b"!pos", "POS ", True, ""))
+        ygate.rolling.sink(Packet(ygate.rolling.clock(), "\\xff", "\\xff>AP", "", b"",
+                                  "NONE", False, "Invalid routing"))
+        self.assertEqual(ygate.rolling.counts("1 min"), {"POS ": 3, "INV ": 1})
+        self.assertIn("1 min: 4 pkts POS 3 INV 1, top DU1KG 3", ygate.dashboard_stats()["rate"])
+        sent = []
+        ygate.pstat[0] = 3
+        ygate.schedule = lambda interval, func: None
+        ygate.send_aprs = lambda aprs_string, cls: sent.append(aprs_string)
+        with self.assertLogs(level="INFO") as logs:
+            ygate.send_status()
+        self.assertIn("15 min: 4 pkts", "\n".join(logs.output))
+        status = sent[0][sent[0].find(":>") + 2:].rstrip()
+        self.assertNotIn("15 min", status)
+        self.assertLessEqual(len(status), 62)
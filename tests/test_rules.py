@@ -0,0 +1,143 @@
+"""
+Unit tests for the compiled gating rules
+"""
+import os
+import re
+import random
+import tempfile
+from unittest import TestCase
+from IGaten.rules import Rules, parse, split_literal, trie_regex
+from IGaten.ygate import Ygate, APRS_DATA_TYPE
+
+FRAMES = [
+    ("DU1KG-1>APRS,WIDE1-1", "!1407.09N/12058.07E#"),
+    ("DW4TIM>APWW10,TCPIP*", ">status"),
+    ("DY1P>APRS,WIDE1-1", "}DW4TIM>APWW10,TCPIP,DY1P*:@124210h1309.14N/12345.27E"),
+    ("DU1KG-5>APRS,WIDE1-1", "?APRS?"),
+    ("DU1KG-1>APRS,RFONLY", ">rf only"),
+    ("DU1KG-1>APRS,NOGATE", ">no gate"),
+    ("DU1KG-7>APDR15,WIDE1-1", ":DU1KG-10 :hello{01"),
+]
+
+
+def check_routing_chain(route: str, payld: str) -> str:
+    """
+    The hard coded chain the built-in rules replace
+    """
+    if re.search(r",TCP", route) or re.search(r"^}.*,TCP.*:", payld):
+        return "TCP not gated"
+    if re.match(r"\?", payld):
+        return "Query, not gated"
+    if "RFONLY" in route:
+        return "RFONLY, not gated"
+    if "NOGATE" in route:
+        return "NOGATE, not gated"
+    return ""
+
+
+class TestRules(TestCase):
+    def test_defaults_as_before(self):
+        rules = Rules("", APRS_DATA_TYPE)
+        for route, payld in FRAMES:
+            rule = rules.match(route, payld)
+            self.assertEqual(rule.msg if rule else "", check_routing_chain(route, payld))
+        self.assertEqual(sum(rules.hits), 5)
+        self.assertIn("PSAT", rules.special)
+
+    def test_site_rules(self):
+        rules = Rules(
+            'pass call is DW4TIM\n'
+            'drop type is WX "Weather, not gated"\n'
+            'drop call prefix DU9 "DU9 blocked"\n'
+            'drop payload contains SPAM\n'
+            'drop route match ^N0CALL\n'
+            'special ARISS\n',
+            APRS_DATA_TYPE, "site"
+        )
+        self.assertEqual(rules.match("DW4TIM>APWW10,WIDE1-1", "?APRS?").action, "pass")
+        self.assertEqual(rules.match("DU1KG>APRS", "_10090556c220s004g005t077").msg,
+                         "Weather, not gated")
+        self.assertEqual(rules.match("DU9ABC-7>APRS", ">x").msg, "DU9 blocked")
+        self.assertIsNone(rules.match("DU1ABC-7>APRS,DU9", ">x"))
+        self.assertEqual(rules.match("DU1ABC>APRS", ">buy SPAM").msg, "site:4, not gated")
+        self.assertEqual(rules.match("N0CALL>APRS", ">x").line, "site:5")
+        self.assertEqual(rules.match("DU1KG>APRS,TCPIP", "?").msg, "TCP not gated")
+        self.assertEqual(rules.special, {"ARISS", "USNAP1", "PSAT", "PCSAT", "AISAT"})
+        self.assertIn("site:2", rules.summary())
+
+    def test_pass_keeps_loop_protection(self):
+        rules = Rules("pass call is DU1KG-7\n", APRS_DATA_TYPE)
+        for route in ("DU1KG-7>APRS,TCPIP*", "DU1KG-7>APRS,NOGATE", "DU1KG-7>APRS,RFONLY"):
+            self.assertEqual(rules.match(route, ">x").action, "drop")
+        self.assertEqual(rules.match("DU1KG-7>APRS", "}X>APRS,TCPIP,DY1P*:>x").action, "drop")
+        self.assertEqual(rules.match("DU1KG-7>APRS", "?APRS?").action, "pass")
+
+    def test_first_rule_wins(self):
+        rules = Rules("drop payload contains BB one\n"
+                      "drop payload prefix A two\n"
+                      "drop payload match A+ three\n", {})
+        self.assertEqual(rules.match("X>Y", "ABB").msg, "one")
+        self.assertEqual(rules.match("X>Y", "AAC").msg, "two")
+        self.assertEqual(rules.match("X>Y", "CAA").msg, "three")
+
+    def test_syntax_errors(self):
+        for text in ["drop call", "block call is X", "drop type prefix WX",
+                     "drop call is 'X", "drop route match (x"]:
+            with self.assertRaises(ValueError):
+                parse("# comment\n" + text, "site")
+        for text in ["drop type is BLN", "drop type is FOO"]:
+            with self.assertRaisesRegex(ValueError, "invalid data type"):
+                Rules(text, APRS_DATA_TYPE)
+        with self.assertRaisesRegex(ValueError, "site:2"):
+            parse("\ndrop nofield is X", "site")
+
+    def test_combined_regex(self):
+        self.assertEqual(split_literal(",XX001[0-9]*"), (",XX001", "[0-9]*"))
+        self.assertEqual(split_literal("abc?"), ("ab", "c?"))
+        self.assertEqual(split_literal("x|y"), ("", "x|y"))
+        self.assertEqual(trie_regex([("AB", ""), ("AC", ""), ("A", "[0-9]")]),
+                         "A(?:(?:[0-9])|B|C)")
+        # same result as the single patterns
+        rnd = random.Random(1)
+        pats = [f"{rnd.choice(['', 'A', 'AB', ',X'])}{rnd.choice(['', '[0-9]+', 'C?D', '.*E'])}"
+                for _ in range(200)]
+        rules = Rules("\n".join(f"drop payload match '{p}'" for p in pats if p), {})
+        for _ in range(500):
+            text = "".join(rnd.choice("ABCDE0,X") for _ in range(6))
+            rule = rules.match("X>Y", text)
+            expect = next((p for p in pats if p and re.search(p, text)), None)
+            self.assertEqual(rule.value if rule else None, expect)
+
+    def test_backslash(self):
+        rules = Rules('drop route match ,XX\\d+ "Relay blocked"\n'
+                      'drop payload match \'\\d{3} \\w\'\n', {})
+        self.assertEqual(rules.match("A>B,XX12", ">x").value, ",XX\\d+")
+        self.assertEqual(rules.match("A>B,XX12", ">x").msg, "Relay blocked")
+        self.assertEqual(rules.match("A>B", ">123 x").line, "rules:2")
+
+    def test_groups(self):
+        rules = Rules("drop payload match (x)y\ndrop payload match (a)\\1\n", {})
+        self.assertIsNone(rules.regexes["payload"][0])
+        self.assertEqual(rules.match("A>B", ">aa").line, "rules:2")
+        self.assertEqual(rules.match("A>B", ">xy").line, "rules:1")
+        self.assertIsNone(rules.match("A>B", ">ab"))
+
+    def test_inline_flags(self):
+        rules = Rules("drop payload match (?i)spam\ndrop payload contains X\n", {})
+        self.assertEqual(rules.match("A>B", "SPAM").line, "rules:1")
+        self.assertEqual(rules.match("A>B", "X").line, "rules:2")
+
+    def test_rules_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".rules", delete=False) as out:
+            out.write("drop type is MICE \"Mic-E, not gated\"\nspecial ARISS\n")
+        try:
+            Ygate.RULES_FILE = out.name
+            ygate = Ygate()
+        finally:
+            Ygate.RULES_FILE = None
+            os.unlink(out.name)
+        self.assertFalse(ygate.check_routing("DU1KG-7>Q4PWQ0,WIDE1-1", "'0V l"))
+        self.assertEqual(ygate.msg, "Mic-E, not gated")
+        self.assertTrue(ygate.is_routing("ARISS>APRS"))
+        self.assertTrue(ygate.is_routing("PSAT>APRS"))
+        self.assertFalse(ygate.is_routing("XYZABC>APRS"))
@@ -0,0 +1,92 @@
+"""
+Unit tests for the shared memory ring buffer and --render-process
+"""
+import os
+import time
+import logging
+import tempfile
+import threading
+from unittest import TestCase
+from unittest.mock import patch
+from IGaten.shmring import ShmRing, REC
+from IGaten.ygate import Ygate, parse_options
+
+
+class TestShmRing(TestCase):
+    def setUp(self) -> None:
+        self.ring = ShmRing(256)
+        self.reader = ShmRing(name=self.ring.name)
+
+    def tearDown(self) -> None:
+        self.reader.release()
+        self.ring.release()
+
+    def test_wrap_around(self):
+        for num in range(100):  # many times around the ring
+            self.assertTrue(self.ring.put(logging.INFO, f"text {num}", "log °", ""))
+            self.assertEqual(self.reader.get(), [(logging.INFO, f"text {num}", "log °", "")])
+        self.assertEqual(self.ring.records, 100)
+        self.assertEqual(self.ring.pending(), 0)
+
+    def test_overrun(self):
+        rec = ("x" * 50, "y" * 50, "")
+        fit = 256 // (REC.size + 100)
+        for _ in range(fit + 3):
+            self.ring.put(logging.WARNING, *rec)
+        self.assertEqual(self.ring.overruns, 3)
+        self.assertEqual(len(self.reader.get()), fit)
+        self.assertTrue(self.ring.put(logging.WARNING, *rec))  # space freed
+        self.assertIn("3 overruns", self.ring.summary())
+
+    def test_consume_until_closed(self):
+        got = []
+        reader = threading.Thread(target=self.reader.consume, args=(got.extend, 0.001))
+        reader.start()
+        for num in range(10):
+            self.ring.put(0, str(num), "", "")
+        self.ring.close()
+        reader.join(5.)
+        self.assertFalse(reader.is_alive())
+        self.assertEqual([rec[1] for rec in got], [str(num) for num in range(10)])
+
+
+    def test_consume_until_writer_gone(self):
+        self.ring.put(0, "last", "", "")
+        got = []
+        self.reader.consume(got.extend, 0.001, alive=lambda: False)
+        self.assertEqual([rec[1] for rec in got], ["last"])  # read before leaving
+
+
+class TestRenderProcess(TestCase):
+    def test_child_logs_frames(self):
+        log_file = os.path.join(tempfile.mkdtemp(), "ygate.log")
+        ygate = Ygate(options=parse_options(["--render-process"]))
+        ygate.LOG_FILE = log_file
+        ygate.remove_filter(ygate.throttle.filter)
+        ygate.outbound.running = True  # queued, not sent
+        ygate.start_render()
+        start = time.perf_counter()
+        for num in range(200):
+            ygate.process_frame(0, f"DU{num % 9 + 1}KG>APRS,WIDE1-1", b"!1407.09N/12058.07E>\r\n")
+        ingest = time.perf_counter() - start
+        ygate.stop_render()
+        self.assertIsNone(ygate.render)
+        self.assertFalse(ygate.render_proc.is_alive())
+        self.assertIn("200 records, 0 overruns", ygate.render_summary)
+        with open(log_file) as log:
+            lines = [line for line in log if "[POS ]" in line]
+        self.assertEqual(len(lines), 200)
+        self.assertIn("DU1KG>APRS,WIDE1-1,qAO,MYCALL-10:!1407.09N/12058.07E>", lines[0])
+        self.assertLess(ingest, 1.0)
+        os.remove(log_file)
+        os.rmdir(os.path.dirname(log_file))
+
+    def test_stall_exit_closes_ring(self):
+        ygate = Ygate()
+        ygate.render = ShmRing(256)
+        codes = []
+        with patch("IGaten.ygate.os._exit", codes.append):
+            ygate.watchdog.exit_func(70)
+        self.assertTrue(ygate.render.closed)
+        self.assertEqual(codes, [70])
+        ygate.render.release()
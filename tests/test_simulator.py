@@ -0,0 +1,86 @@
+"""
+Unit tests for the Yaesu radio simulator
+"""
+import io
+import os
+import time
+import logging
+import tempfile
+import threading
+import contextlib
+from unittest import TestCase
+import serial
+from IGaten.simulator import FrameGenerator, Simulator, mic_e, parse_mix, main
+from IGaten.ygate import Ygate, mic_e_decode
+
+
+class TestSimulator(TestCase):
+    def test_generator(self):
+        frames = [FrameGenerator(seed=7).frame() for _ in range(2)]
+        self.assertEqual(frames[0], frames[1])
+        gen = FrameGenerator({"msg": 1, "wx": 0}, seed=7)
+        for _ in range(50):
+            self.assertIn(b"<UI>:\r\n", gen.frame())
+        self.assertEqual(gen.count["msg"], 50)
+        self.assertEqual(parse_mix("pos=1,bad=2"), {"pos": 1, "bad": 2})
+        with self.assertRaises(Exception):
+            parse_mix("fm=1")
+
+    def test_mic_e(self):
+        for lat, lon, txt in [(14.1234, 120.9756, "14 7.4'N, 120 58.54'E"),
+                              (1.5, 5.25, "1 30.0'N, 5 15.0'E"),
+                              (14.5, 105.5, "14 30.0'N, 105 30.0'E"),
+                              (35.01, 99.01, "35 0.6'N, 99 0.6'E")]:
+            dest, info = mic_e(lat, lon)
+            decoded = mic_e_decode(f"DU1KG>{dest},WIDE1-1", b"`" + info + b"\x1c\x1c\x1c>/")
+            self.assertIn(txt, decoded)
+
+    def test_ygate_reads_pty(self):
+        logging.disable(logging.CRITICAL)
+        sim = Simulator(FrameGenerator(seed=3), rate=5000.)
+        ygate = Ygate()
+        ygate.remove_filter(ygate.throttle.filter)  # no flood protection at 5000 frames/s
+        ygate.ser = serial.Serial(sim.port, 9600, timeout=1)
+        ygate.outbound.send = lambda cls, data: True  # uplink always works
+        ygate.outbound.start()
+        frames = 500
+        writer = threading.Thread(target=sim.run, args=(frames,))
+        writer.start()
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for _ in range(frames):  # one frame per read
+                    ygate.process_frame(*ygate.read_yaesu())
+            for _ in range(500):  # gated packets are counted when sent
+                if not ygate.outbound.depth()["gated"]:
+                    break
+                time.sleep(0.01)
+        finally:
+            ygate.outbound.stop()
+            writer.join(10)
+            ygate.ser.close()
+            sim.close()
+            logging.disable(logging.NOTSET)
+        self.assertEqual(sim.sent, frames)
+        self.assertEqual(sim.dropped, 0)
+        self.assertEqual(sum(ygate.pstat[:3]), frames)
+        gen = sim.gen.count
+        self.assertGreaterEqual(ygate.pstat[2], gen["sync"] // 2)  # invalid routing
+        self.assertGreater(ygate.pstat[0], gen["pos"])
+        self.assertGreater(len(ygate.pstat[3]), 50)
+
+    def test_overrun(self):
+        sim = Simulator(FrameGenerator(seed=3), rate=1e6)
+        sim.MAX_PENDING = 1024
+        sim.DRAIN = 0.1
+        sim.run(count=20000)  # nobody reads
+        self.assertGreater(sim.dropped, 0)
+        self.assertEqual(sim.sent + sim.dropped, 20000)
+        sim.close()
+
+    def test_main(self):
+        link = os.path.join(tempfile.mkdtemp(), "ftm400")
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(main(["--count", "5", "--rate", "1000", "--link", link]), 0)
+        self.assertIn("5 frames sent", out.getvalue())
+        self.assertFalse(os.path.exists(link))
+        os.rmdir(os.path.dirname(link))
@@ -0,0 +1,239 @@
+"""
+Soak tests: simulated weeks of traffic through Ygate.start()
+
+A fake serial port feeds Yaesu frames, the APRS-IS server is a local
+stub that drops the connection now and then, and the clock of the flood
+protection is simulated. Once per simulated hour memory (tracemalloc),
+thread count and open file descriptors are sampled; none of them may
+trend upward after the warm up.
+
+The default run simulates one day at 600 frames/h to keep the unit test
+run short; `make soak` simulates four weeks. Set SOAK_DAYS for other
+runs, e.g. SOAK_DAYS=90 python -m pytest tests/test_soak.py
+"""
+import os
+import io
+import random
+import socket
+import logging
+import threading
+import selectors
+import tracemalloc
+import contextlib
+from unittest import TestCase
+from unittest.mock import patch
+import serial
+import IGaten
+from IGaten.ygate import Ygate
+
+SOAK_DAYS = float(os.environ.get("SOAK_DAYS", 1))
+FRAMES_PER_HOUR = 600
+DROP_EVERY = 2500  # APRS-IS stub drops the connection every n frames
+
+PAYLOADS = [
+    b"!1407.09N/12058.07E#PHG2360 digi",
+    b'`0V l \x1c-/`":-}435.350MHz home 73_%',
+    b":DU1KG-10 :?APRSS{12",
+    b"@191022z1408.01N/12101.02E_090/005g010t082r000p000P000h80b10120",
+    b">status text with invalid \xb0 byte",
+    b"}DW4TIM>APWW10,TCPIP,DY1P*:@124210h1309.14N/12345.27E,APRSIS32",
+    b";OBJECT   *191022z1408.01N/12101.02E-object",
+]
+PATHS = ["APRS,WIDE1-1", "APDR15,DY1P*,WIDE2-1", "Q4PWQ0,WIDE1*,WIDE2-1", "APRS,TCPIP*"]
+
+
+def open_fds() -> int:
+    """
+    :return: number of open file descriptors, -1 if unknown
+    """
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return -1
+
+
+class FakeClock:
+    """
+    Simulated monotonic clock, advanced by the fake serial port
+    """
+
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class AprsIsStub:
+    """
+    Single threaded APRS-IS server: accepts logins, discards uplink
+    data and drops all connections on request
+    """
+
+    def __init__(self):
+        self.lsck = socket.socket()
+        self.lsck.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.lsck.bind(("127.0.0.1", 0))
+        self.lsck.listen(5)
+        self.port = self.lsck.getsockname()[1]
+        self.sel = selectors.DefaultSelector()
+        self.sel.register(self.lsck, selectors.EVENT_READ)
+        self.conns = []
+        self.logins = 0
+        self.received = 0
+        self.drop = threading.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while self.running:
+            if self.drop.is_set():
+                self.drop.clear()
+                for conn in self.conns:
+                    self.sel.unregister(conn)
+                    conn.close()
+                self.conns = []
+            for key, _ in self.sel.select(timeout=0.05):
+                if key.fileobj is self.lsck:
+                    conn, _ = self.lsck.accept()
+                    conn.sendall(b"# aprsc stub\r\n")
+                    self.sel.register(conn, selectors.EVENT_READ)
+                    self.conns.append(conn)
+                    continue
+                try:
+                    data = key.fileobj.recv(65536)
+                except OSError:
+                    data = b""
+                if not data:
+                    self.sel.unregister(key.fileobj)
+                    self.conns.remove(key.fileobj)
+                    key.fileobj.close()
+                elif data.startswith(b"user "):
+                    self.logins += 1
+                    key.fileobj.sendall(b"# logresp MYCALL-10 verified, server STUB\r\n"
+                                        b"DY1P>APRS,TCPIP*,qAC,T2:!1407.09N/12058.07E#\r\n")
+                else:
+                    self.received += data.count(b"\n")
+                    key.fileobj.sendall(b"DU1KG-5>APRS,TCPIP*,qAC,T2:>IS traffic\r\n")
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        for conn in self.conns:
+            conn.close()
+        self.sel.close()
+        self.lsck.close()
+
+
+class FakeSerial:
+    """
+    Yaesu serial port emitting a deterministic random mix of frames
+    """
+
+    def __init__(self, frames: int, clock: FakeClock, stub: AprsIsStub, sample):
+        self.left = frames
+        self.clock = clock
+        self.stub = stub
+        self.sample = sample
+        self.rnd = random.Random(42)
+        self.calls = [f"DU{i % 10}{chr(65 + i % 26)}{chr(65 + i // 26 % 26)}-{i % 16}"
+                      for i in range(150)]
+        self.payload = None
+        self.name = "fake"
+
+    def read_until(self, expected=b"\n"):
+        if self.payload is not None:
+            payload, self.payload = self.payload, None
+            return payload
+        if self.left == 0:
+            raise serial.serialutil.SerialException("end of soak")
+        self.left -= 1
+        self.clock.now += 3600. / FRAMES_PER_HOUR
+        if self.left % FRAMES_PER_HOUR == 0:
+            self.sample()
+        if self.left % DROP_EVERY == 0:
+            self.stub.drop.set()
+        if self.rnd.random() < 0.02:  # out of sync
+            return b"garbage line \xff\r\n"
+        self.payload = self.rnd.choice(PAYLOADS) + b"\r\n"
+        return bytes(
+            f"{self.rnd.choice(self.calls)}>{self.rnd.choice(PATHS)} "
+            f"[10/19/26 10:00:00] <UI>:\r\n", "ascii"
+        )
+
+    def close(self):
+        pass
+
+
+def exit_soak(code: int):
+    """
+    Replaces os._exit() in close_pgm()
+    """
+    raise SystemExit(code)
+
+
+class TestSoak(TestCase):
+    def setUp(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.stub = AprsIsStub()
+        self.samples = []
+
+    def tearDown(self) -> None:
+        self.stub.close()
+        logging.disable(logging.NOTSET)
+
+    def sample(self):
+        self.samples.append(
+            (tracemalloc.get_traced_memory()[0], threading.active_count(), open_fds())
+        )
+
+    def assert_no_trend(self, idx: int, name: str, tolerance: float, margin: float):
+        """
+        Compares the second half of the samples with the first
+        after a warm up of one tenth of the run
+        """
+        values = [smp[idx] for smp in self.samples[len(self.samples) // 10:]]
+        half = len(values) // 2
+        early, late = max(values[:half]), max(values[half:])
+        self.assertLessEqual(
+            late, early * (1. + tolerance) + margin,
+            f"{name} grows: {early} -> {late}"
+        )
+
+    def test_soak(self):
+        frames = int(SOAK_DAYS * 24 * FRAMES_PER_HOUR)
+        clock = FakeClock()
+        ygate = Ygate(options=IGaten.parse_options(["-i"]))
+        ygate.HOST, ygate.PORT = "127.0.0.1", self.stub.port
+        ygate.HOURLY, ygate.BEACON = 0.05, 0.02  # keep the timer chains busy
+        ygate.throttle.clock = clock
+        fake = FakeSerial(frames, clock, self.stub, self.sample)
+        sleep = IGaten.ygate.time.sleep
+
+        tracemalloc.start()
+        try:
+            # plain functions, mocks would record every call
+            with patch("IGaten.ygate.is_internet", lambda *args, **kwargs: True), \
+                    patch("IGaten.ygate.serial.Serial", lambda *args, **kwargs: fake), \
+                    patch("IGaten.ygate.time.sleep", lambda t: sleep(min(t, 0.001))), \
+                    patch("IGaten.ygate.os._exit", exit_soak), \
+                    patch("IGaten.ygate.signal.signal", lambda *args: None), \
+                    contextlib.redirect_stdout(io.StringIO()) as out:
+                out.write = lambda text: len(text)  # discard console output
+                with self.assertRaises(SystemExit):
+                    ygate.start()
+        finally:
+            ygate.stop_timers()
+            tracemalloc.stop()
+
+        self.assertEqual(sum(ygate.pstat[:3]), frames)
+        self.assertGreater(ygate.pstat[0], frames // 4)
+        self.assertGreater(self.stub.logins, frames // DROP_EVERY // 2)
+        self.assertGreater(ygate.is_stat.lines, 0)
+        self.assertLessEqual(len(ygate.pstat[3]), 150)
+        self.assertGreater(len(self.samples), 20)
+        self.assert_no_trend(0, "traced memory", 0.05, 64 * 1024)
+        self.assert_no_trend(1, "thread count", 0., 2)
+        if self.samples[0][2] >= 0:
+            self.assert_no_trend(2, "open files", 0., 2)
@@ -0,0 +1,93 @@
+"""
+Unit tests for the persistent statistics store
+"""
+import os
+import tempfile
+from unittest import TestCase
+from IGaten.ygate import Ygate, Packet, parse_options
+from IGaten.store import StatStore
+
+
+def pkt(call: str, t_s: float, msg: str = "") -> Packet:
+    return Packet(t_s, call, f"{call}>APRS", "!", b"!\r\n", "POS ", not msg, msg)
+
+
+class TestStore(TestCase):
+    def setUp(self) -> None:
+        fd, self.path = tempfile.mkstemp(suffix=".db")
+        os.close(fd)
+
+    def tearDown(self) -> None:
+        os.remove(self.path)
+
+    def test_batched_heard_and_hourly(self):
+        store = StatStore(self.path)
+        pstat = [0, 0, 0, []]
+        store.sink(pkt("DU1KG-1", 7200.))
+        store.sink(pkt("DU1KG-1", 7300.))
+        store.sink(pkt("DY1P", 7400., "TCP not gated"))
+        store.sink(pkt("junk", 7400., "Invalid routing"))
+        store.sink(pkt("", 7400., "No routing"))
+        self.assertEqual(store.stations(), [])  # nothing written before flush
+        pstat[:3] = [2, 1, 1]
+        store.flush(pstat, 7500.)
+        pstat[:3] = [5, 1, 1]
+        store.flush(pstat, 11000.)
+        self.assertEqual(
+            store.stations(), [("DY1P", 7400., 7400., 1), ("DU1KG-1", 7200., 7300., 2)]
+        )
+        self.assertEqual(store.hours(0.), [(7200, 2, 1, 1), (10800, 3, 0, 0)])
+        store.close()
+
+    def test_restore_after_restart(self):
+        store = StatStore(self.path)
+        self.assertEqual(store.first_start(1000.), 1000.)
+        store.sink(pkt("DU1KG-1", 2000.))
+        store.flush([4, 2, 1, []], 2000.)
+        store.close()
+
+        ygate = Ygate()
+        ygate.STORE_FILE = self.path
+        ygate.STORE_FLUSH = 3600.
+        ygate.pstat[0] = 1
+        ygate.open_store()
+        ygate.stop_timers()
+        self.assertEqual(ygate.pstat, [5, 2, 1, ["DU1KG"]])
+        self.assertEqual(ygate.start_datetime.timestamp(), 1000.)
+        ygate.store.flush(ygate.pstat, 2000.)
+        self.assertEqual(ygate.store.hours(0.), [(0, 5, 2, 1)])
+        ygate.store.close()
+
+    def test_restore_newest_calls_lean(self):
+        store = StatStore(self.path)
+        for num in range(5):
+            store.sink(pkt(f"DU{num}KG", 2000. + num))
+        store.flush([5, 0, 0, []], 2000.)
+        store.close()
+
+        ygate = Ygate(options=parse_options(["--lean"]))
+        ygate.STORE_FILE = self.path
+        ygate.LEAN_CALLS = 3
+        ygate.open_store()
+        ygate.stop_timers()
+        self.assertEqual(ygate.pstat[3], ["DU2KG", "DU3KG", "DU4KG"])
+        ygate.is_routing("DU5KG>APRS")  # the least recent call goes first
+        self.assertEqual(ygate.pstat[3], ["DU3KG", "DU4KG", "DU5KG"])
+        ygate.store.close()
+
+    def test_flush_snapshot(self):
+        store = StatStore(self.path)
+
+        class Counting(list):
+            """pstat that is incremented between two reads"""
+            def __getitem__(self, item):
+                value = list.__getitem__(self, item)
+                self[0] = list.__getitem__(self, 0) + 1
+                return value
+
+        pstat = Counting([0, 0, 0, []])
+        for hour in range(3):
+            store.flush(pstat, hour * 3600.)
+        gated = sum(row[1] for row in store.hours(0.))
+        self.assertEqual(gated, store.last[0])  # every increment stored once
+        store.close()
@@ -0,0 +1,49 @@
+"""
+Unit tests for uplink flood protection
+"""
+from unittest import TestCase
+import IGaten
+from IGaten.ygate import Ygate
+from IGaten.throttle import TokenBuckets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestThrottle(TestCase):
+    def setUp(self) -> None:
+        self.clock = FakeClock()
+        self.tb = TokenBuckets(1., 3., 5., 8., 4, self.clock)
+
+    def test_station_bucket(self):
+        self.assertEqual([self.tb.allow("DU1KG") for _ in range(4)], ["", "", "", "station"])
+        self.assertEqual(self.tb.allow("DY1P"), "")
+        self.clock.now = 1.
+        self.assertEqual(self.tb.allow("DU1KG"), "")
+        self.assertEqual(self.tb.allow("DU1KG"), "station")
+        self.assertEqual(self.tb.top(1), [("DU1KG", 6, 2)])
+
+    def test_global_bucket(self):
+        res = [self.tb.allow(call) for call in ("A1A", "B1B", "C1C") for _ in range(3)]
+        self.assertEqual(res.count("global"), 1)
+        self.assertEqual(self.tb.g_throttled, 1)
+
+    def test_bounded_table(self):
+        for i in range(10):
+            self.tb.allow(f"DU{i}KG")
+        self.assertEqual(len(self.tb.buckets), 4)
+        self.assertEqual(list(self.tb.buckets)[0], "DU6KG")
+
+    def test_ygate_drop_reason(self):
+        ygate = Ygate(options=IGaten.parse_options([]))
+        ygate.do_gating = lambda packet, pkt=None: True
+        for _ in range(ygate.STATION_BURST + 3):
+            ygate.process_frame(0, "DU1KG-1>APRS,WIDE1-1", b"!1407.09N/12058.07E#\r\n")
+        self.assertEqual(ygate.drops, {"Flood, not gated": 3})
+        self.assertEqual(ygate.pstat[1], 3)
+        self.assertIn("DU1KG-1", ygate.drop_summary())
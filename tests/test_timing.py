@@ -0,0 +1,66 @@
+"""
+Unit tests for stage timing and profiling
+"""
+import io
+import os
+import signal
+import tempfile
+import contextlib
+from unittest import TestCase
+from IGaten.timing import StageTimer, Profiler
+from IGaten.ygate import Ygate
+from tests.test_watchdog import ChunkSerial
+
+
+class TestTiming(TestCase):
+    def test_stage_timer(self):
+        timer = StageTimer(("read", "decode"))
+        for _ in range(200):
+            timer.mark()
+            timer.stop("read")
+            sum(range(100))
+            timer.stop("decode")
+        summary = timer.summary()
+        self.assertEqual(list(summary), ["read", "decode"])
+        num, t_min, t_med, t_99 = summary["decode"]
+        self.assertEqual(num, 200)
+        self.assertTrue(0 <= t_min <= t_med <= t_99)
+        self.assertIn("decode", timer.report())
+
+    def test_window(self):
+        timer = StageTimer(("read",))
+        for _ in range(timer.WINDOW + 10):
+            timer.stop("read")
+        self.assertEqual(timer.summary()["read"][0], timer.WINDOW)
+
+    def test_profiler_toggle(self):
+        prof = Profiler()
+        fd, prof.PROF_FILE = tempfile.mkstemp(suffix=".prof")
+        os.close(fd)
+        self.assertEqual(prof.toggle(), "Profiling started")
+        self.assertTrue(prof.active)
+        sorted(range(1000), reverse=True)
+        self.assertIn("Profiling stopped", prof.toggle())
+        self.assertFalse(prof.active)
+        self.assertGreater(os.path.getsize(prof.PROF_FILE), 0)
+        os.remove(prof.PROF_FILE)
+
+    def test_usr1_deferred(self):
+        ygate = Ygate()
+        ygate.ser = ChunkSerial([b"", b"DU1KG>APRS\r\n"])
+        dumps = []
+        ygate.usr1_dump = lambda: dumps.append(1) or setattr(ygate, "usr1_pending", False)
+        with contextlib.redirect_stdout(io.StringIO()) as out:
+            ygate.usr1_handler(signal.SIGUSR1, None)
+        self.assertEqual(out.getvalue(), "")  # nothing printed in the handler
+        self.assertEqual(ygate.read_serial(), b"DU1KG>APRS\r\n")
+        self.assertEqual(dumps, [1])  # dumped at the read timeout
+
+    def test_sigint_deferred(self):
+        ygate = Ygate()
+        ygate.ser = ChunkSerial([b"DU1KG>AP", b"", b""])
+        with ygate.rolling.lock:  # held by the interrupted loop
+            ygate.signal_handler(signal.SIGINT, None)
+        self.assertTrue(ygate.exit_pending)
+        self.assertEqual(ygate.read_serial(), b"DU1KG>AP")  # no wait for the rest
+        self.assertEqual(ygate.read_kiss(), (0, "", b""))
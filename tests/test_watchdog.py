@@ -0,0 +1,155 @@
+"""
+Unit tests for the stall watchdog
+"""
+import socket
+import logging
+import threading
+import contextlib
+import io
+from unittest import TestCase
+from IGaten.watchdog import Watchdog, STALL_EXIT
+from IGaten.outbound import Outbound
+from IGaten.ygate import Ygate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class ChunkSerial:
+    """
+    Serial port returning the given chunks, b"" is a read timeout
+    """
+
+    def __init__(self, chunks: list):
+        self.chunks = list(chunks)
+
+    def read_until(self, expected=b"\n"):
+        return self.chunks.pop(0)
+
+
+class TestWatchdog(TestCase):
+    def setUp(self) -> None:
+        logging.disable(logging.CRITICAL)
+        self.clock = FakeClock()
+        self.exits = []
+        self.wdg = Watchdog(1.0, self.clock, self.exits.append)
+
+    def tearDown(self) -> None:
+        logging.disable(logging.NOTSET)
+
+    def test_recover(self):
+        recovered = []
+        self.wdg.register("uplink", 10., lambda: recovered.append(1) or True)
+        self.clock.now = 9.
+        self.wdg.beat("uplink")
+        self.clock.now = 18.
+        self.assertEqual(self.wdg.check(), [])
+        self.clock.now = 20.
+        self.assertEqual(self.wdg.check(), ["uplink"])
+        self.assertEqual(recovered, [1])
+        self.assertEqual(self.wdg.check(), [])  # grace period
+        self.assertEqual(self.exits, [])
+        self.assertIn("recovered 1", self.wdg.summary())
+
+    def test_exit_without_recovery(self):
+        self.wdg.register("serial", 10.)
+        self.wdg.beat("unknown")  # ignored
+        self.clock.now = 11.
+        with contextlib.redirect_stderr(io.StringIO()) as err:
+            self.assertEqual(self.wdg.check(), ["serial"])
+        self.assertEqual(self.exits, [STALL_EXIT])
+        self.assertIn("serial stalled, no heartbeat for 11 s", err.getvalue())
+
+    def test_exit_after_failed_recoveries(self):
+        self.wdg.register("status", 10., lambda: True)
+        with contextlib.redirect_stderr(io.StringIO()):
+            for _ in range(self.wdg.MAX_RECOVER + 1):
+                self.clock.now += 11.
+                self.wdg.check()
+        self.assertEqual(self.exits, [STALL_EXIT])
+
+    def test_diagnostic_has_stack(self):
+        self.wdg.register("serial", 10.)
+        hang = threading.Event()
+        beaten = threading.Event()
+
+        def stuck_reader():
+            self.wdg.beat("serial")
+            beaten.set()
+            hang.wait(5.)
+
+        thread = threading.Thread(target=stuck_reader)
+        thread.start()
+        beaten.wait(5.)
+        diag = self.wdg.diagnostic("serial", 20.)
+        hang.set()
+        thread.join()
+        self.assertIn("stuck_reader", diag)
+
+    def test_thread(self):
+        wdg = Watchdog(0.01, self.clock, self.exits.append)
+        checked = threading.Event()
+        wdg.register("beacon", 1., lambda: checked.set() or True)
+        self.clock.now = 2.
+        wdg.start()
+        self.assertTrue(checked.wait(5.))
+        wdg.stop()
+
+    def test_outbound_beats(self):
+        beats = threading.Event()
+        out = Outbound(lambda cls, data: True, beat=beats.set)
+        out.start()
+        self.assertTrue(beats.wait(5.))
+        out.stop()
+
+
+class TestYgateWatchdog(TestCase):
+    def setUp(self) -> None:
+        self.ygate = Ygate()
+        self.ygate.watchdog = Watchdog(1.0, FakeClock(), lambda code: None)
+        self.beats = []
+        self.ygate.watchdog.beat = self.beats.append
+
+    def test_read_serial_continues_after_timeout(self):
+        self.ygate.ser = ChunkSerial([b"", b"", b"DU1KG>AP", b"RS\r\n"])
+        self.assertEqual(self.ygate.read_serial(), b"DU1KG>APRS\r\n")
+        self.assertEqual(self.beats, ["serial"] * 3)
+
+    def test_read_serial_incomplete_line(self):
+        self.ygate.ser = ChunkSerial([b"DU1KG>AP", b""])
+        self.assertEqual(self.ygate.read_serial(), b"DU1KG>AP")
+
+    def test_recover_uplink(self):
+        self.ygate.sck, peer = socket.socketpair()
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(self.ygate.recover_uplink())
+        self.assertEqual(peer.recv(10), b"")  # connection shut down
+        self.ygate.sck.close()
+        peer.close()
+
+    def test_recover_timer_cancels_old(self):
+        calls = []
+
+        def send_status():
+            calls.append(1)
+
+        self.ygate.schedule(60., send_status)
+        late = self.ygate.timers["send_status"]
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertTrue(self.ygate.recover_timer(send_status))
+        self.ygate.timers["send_status"].join(5.)
+        self.assertTrue(late.finished.is_set())  # cancelled
+        self.assertEqual(calls, [1])
+        self.ygate.stop_timers()
+
+    def test_register(self):
+        self.ygate.watchdog.start = lambda: None
+        self.ygate.start_watchdog()
+        self.assertEqual(
+            set(self.ygate.watchdog.components), {"serial", "uplink", "status", "beacon"}
+        )
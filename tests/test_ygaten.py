@@ -73,3 +73,64 @@ class TestYGate(TestCase):
         pld = ":DU1KG-10 APRS 10 Watts RF-IS-RF Digipeater"
         mock_get_data_type.return_value = '\033[1;35;48mMSG \033[1;37;0m'
         self.assertEqual(self.lcl_ygate.get_data_type(pld), '\033[1;35;48mMSG \033[1;37;0m')
+
+
+class TestPipeline(TestCase):
+    ROUTE = "DU1KG-1>Q4PWQ0,DY1P,WIDE1*,WIDE2-1"
+    MICE = b'`0V l \x1c-/`":-}435.350MHz DU1KG home 73 Klaus_%\r\n'
+
+    def setUp(self) -> None:
+        self.ygate = Ygate(options=IGaten.parse_options(["-d"]))
+        self.sent = []
+        self.ygate.do_gating = self.gate
+
+    def gate(self, packet: bytes, pkt=None) -> bool:
+        """
+        Sent at once
+        """
+        self.sent.append(packet)
+        self.ygate.uplink_done("gated", packet, "sent", pkt)
+        return True
+
+    def test_parse_options(self):
+        self.assertTrue(self.ygate.opt.mic_e)
+        self.assertFalse(self.ygate.opt.show_is)
+        self.assertFalse(Ygate().opt.mic_e)
+
+    def test_sink_receives_packet(self):
+        pkts = []
+        self.ygate.add_sink(pkts.append)
+        self.ygate.process_frame(0, self.ROUTE, self.MICE)
+        self.ygate.process_frame(0, "DY1P>APWW10,TCPIP*", b"!1407.09N/12058.07E#\r\n")
+        self.assertEqual(
+            self.sent, [bytes(self.ROUTE + ",qAO,MYCALL-10:", "ascii") + self.MICE]
+        )
+        self.assertEqual(len(pkts), 2)
+        self.assertEqual(pkts[0].call, "DU1KG-1")
+        self.assertEqual(pkts[0].data_type, "MICE")
+        self.assertTrue(pkts[0].gated)
+        self.assertFalse(pkts[1].gated)
+        self.assertEqual(pkts[1].msg, "TCP not gated")
+        self.ygate.remove_sink(pkts.append)
+        self.ygate.process_frame(0, self.ROUTE, self.MICE)
+        self.assertEqual(len(pkts), 2)
+
+    def test_blank_line_not_passed_to_sinks(self):
+        pkts = []
+        self.ygate.add_sink(pkts.append)
+        self.ygate.process_frame(0, "DY1P>APWW10,TCPIP*", b"!1407.09N/12058.07E#\r\n")
+        self.ygate.process_frame(0, "", b"\r\n")
+        self.assertEqual(len(pkts), 1)
+        self.assertEqual(self.ygate.msg, "No routing")
+
+    def test_filter_blocks_gating(self):
+        self.ygate.add_filter(lambda pkt: "Blocked" if pkt.call == "DU1KG-1" else None)
+        self.ygate.process_frame(0, self.ROUTE, self.MICE)
+        self.assertEqual(self.sent, [])
+        self.assertEqual(self.ygate.msg, "Blocked")
+        self.assertEqual(self.ygate.pstat[1], 1)
+
+    def test_failing_sink_is_logged(self):
+        self.ygate.add_sink(lambda pkt: 1 / 0)
+        self.ygate.process_frame(0, self.ROUTE, self.MICE)
+        self.assertEqual(len(self.sent), 1)